@@ -0,0 +1,270 @@
+# anomaly_index.py
+"""
+Optional spike detection on the daily series of the dataset (enabled with ANOMALY_DETECTION=1),
+computed at ingestion (load_data).
+
+Posts are rolled up per day for the whole dataset and for every TOPIK and GRUP value, both as
+total volume and as the number of negative posts. Each series is scored with an EWMA z-score:
+a day is a spike when its count is ANOMALY_Z_THRESHOLD standard deviations above the EWMA of
+the previous days. The scoring is causal, so the stored rollups and EWMA state (on disk in
+ANOMALY_INDEX_DIR) let a reload re-score only the days from the first one whose counts changed.
+
+At query time lookup() returns the flagged spikes inside a date window, which go to the LLM as
+a short list instead of the full daily series.
+"""
+
+import os
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from search_index import dataset_key
+
+load_dotenv()
+
+# Opt-in like SEMANTIC_SEARCH: ingestion then writes its rollups to ANOMALY_INDEX_DIR
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "0") == "1"
+ANOMALY_INDEX_DIR = os.getenv("ANOMALY_INDEX_DIR", "anomaly_index")
+ANOMALY_SPAN = int(os.getenv("ANOMALY_SPAN", "14"))  # EWMA span in days
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.0"))
+ANOMALY_MIN_POSTS = int(os.getenv("ANOMALY_MIN_POSTS", "5"))  # Days with fewer posts are never spikes
+ANOMALY_MIN_HISTORY = int(os.getenv("ANOMALY_MIN_HISTORY", "7"))  # Days of history before a series is scored
+ANOMALY_MAX_RESULTS = int(os.getenv("ANOMALY_MAX_RESULTS", "8"))
+
+DIMENSIONS = ['TOPIK', 'GRUP']
+METRICS = ['volume', 'negatif']
+
+_SPIKE_COLUMNS = ['date', 'dimension', 'value', 'metric', 'count', 'expected', 'z']
+
+_stores = {}
+_lock = threading.Lock()
+
+
+# --- ROLLUP ---
+def _series_codes(dataframe):
+    """(series labels, [per-dimension row codes]) for the overall series and every DIMENSIONS value."""
+    labels = [("ALL", "Semua")]
+    codes = [np.zeros(len(dataframe), dtype=np.int64)]
+    for dimension in DIMENSIONS:
+        if dimension not in dataframe.columns:
+            continue
+        dim_codes, uniques = pd.factorize(dataframe[dimension], sort=True)
+        codes.append(np.where(dim_codes >= 0, dim_codes + len(labels), -1))
+        labels += [(dimension, str(u)) for u in uniques]
+    return labels, codes
+
+
+def daily_rollup(dataframe):
+    """
+    Counts matrix [series x days] (series = label x metric) and the first day, in one bincount
+    per dimension over (series, day) pairs.
+    """
+    days = dataframe['TANGGAL PUBLIKASI'].dt.normalize()
+    first_day = days.min()
+    offsets = (days - first_day).dt.days.to_numpy()
+    n_days = int(offsets.max()) + 1
+    negative = (dataframe['SENTIMEN'].astype(str).str.casefold() == 'negatif').to_numpy() \
+        if 'SENTIMEN' in dataframe.columns else np.zeros(len(dataframe), dtype=bool)
+
+    labels, codes = _series_codes(dataframe)
+    counts = np.zeros((len(labels) * len(METRICS), n_days), dtype=np.float64)
+    for row_codes in codes:
+        valid = row_codes >= 0
+        for m, rows in enumerate([valid, valid & negative]):
+            flat = (row_codes[rows] * len(METRICS) + m) * n_days + offsets[rows]
+            counts += np.bincount(flat, minlength=counts.size).reshape(counts.shape)
+    series = [(dimension, value, metric) for dimension, value in labels for metric in METRICS]
+    return series, first_day, counts
+
+
+# --- SCORING ---
+def _score(counts, mean, var, start):
+    """
+    EWMA z-scores for days >= start, continuing from the state (mean, var) after day start - 1.
+    Returns (z [series x days], expected [series x days], mean, var) with the state after every day.
+    """
+    alpha = 2.0 / (ANOMALY_SPAN + 1)
+    n_series, n_days = counts.shape
+    z = np.zeros((n_series, n_days))
+    expected = np.zeros((n_series, n_days))
+    m = mean[:, start - 1].copy() if start > 0 else counts[:, 0].copy()
+    v = var[:, start - 1].copy() if start > 0 else np.zeros(n_series)
+    for day in range(start, n_days):
+        x = counts[:, day]
+        if day >= ANOMALY_MIN_HISTORY:
+            # Floor the deviation at the Poisson noise level so quiet series do not flag every blip
+            std = np.maximum(np.sqrt(v), np.maximum(np.sqrt(m), 1.0))
+            z[:, day] = (x - m) / std
+            expected[:, day] = m
+        diff = x - m
+        m = m + alpha * diff
+        v = (1 - alpha) * (v + alpha * diff * diff)
+        mean[:, day], var[:, day] = m, v
+    return z, expected, mean, var
+
+
+def _flag(series, first_day, counts, z, expected, start):
+    hit_series, hit_days = np.nonzero(
+        (z[:, start:] >= ANOMALY_Z_THRESHOLD) & (counts[:, start:] >= ANOMALY_MIN_POSTS)
+    )
+    hit_days = hit_days + start
+    return pd.DataFrame({
+        'date': first_day + pd.to_timedelta(hit_days, unit='D'),
+        'dimension': [series[s][0] for s in hit_series],
+        'value': [series[s][1] for s in hit_series],
+        'metric': [series[s][2] for s in hit_series],
+        'count': counts[hit_series, hit_days].astype(np.int64),
+        'expected': np.round(expected[hit_series, hit_days], 1),
+        'z': np.round(z[hit_series, hit_days], 2),
+    }, columns=_SPIKE_COLUMNS)
+
+
+# --- STORAGE ---
+def _paths(path):
+    return os.path.join(path, "rollup.npz"), os.path.join(path, "meta.json")
+
+
+def _load_existing(path):
+    arrays_path, meta_path = _paths(path)
+    if not (os.path.exists(arrays_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    with np.load(arrays_path) as arrays:
+        state = {name: arrays[name] for name in ("counts", "mean", "var")}
+    spikes = pd.DataFrame(meta.pop("spikes"), columns=_SPIKE_COLUMNS)
+    spikes['date'] = pd.to_datetime(spikes['date'])
+    return meta, state, spikes
+
+
+def _save(path, meta, counts, mean, var, spikes):
+    os.makedirs(path, exist_ok=True)
+    arrays_path, meta_path = _paths(path)
+    np.savez(arrays_path + ".tmp.npz", counts=counts, mean=mean, var=var)
+    os.replace(arrays_path + ".tmp.npz", arrays_path)
+    records = spikes.assign(date=spikes['date'].dt.strftime('%Y-%m-%d')).to_dict(orient='records')
+    with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({**meta, "spikes": records}, f, default=lambda v: v.item() if isinstance(v, np.generic) else str(v))
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _reuse_from(previous, series, first_day, counts):
+    """
+    Stored EWMA state aligned to the new series, plus the first day that must be re-scored;
+    None when nothing can be reused (different start day or scoring settings).
+    """
+    if previous is None:
+        return None
+    meta, state, _ = previous
+    settings = [ANOMALY_SPAN, ANOMALY_MIN_HISTORY]
+    if meta.get("first_day") != first_day.strftime('%Y-%m-%d') or meta.get("settings") != settings:
+        return None
+    old_index = {tuple(s): i for i, s in enumerate(meta["series"])}
+    n_days = min(counts.shape[1], state["counts"].shape[1])
+    old_counts = np.zeros((len(series), n_days))
+    mean = np.zeros(counts.shape)
+    var = np.zeros(counts.shape)
+    # A series that did not exist before had zero counts, which leaves its EWMA state at zero as well
+    for i, s in enumerate(series):
+        j = old_index.get(s)
+        if j is not None:
+            old_counts[i] = state["counts"][j, :n_days]
+            mean[i, :n_days] = state["mean"][j, :n_days]
+            var[i, :n_days] = state["var"][j, :n_days]
+    if len(old_index) != sum(s in old_index for s in series):
+        return None  # A series disappeared; its old spikes cannot be told apart cheaply
+    changed = np.nonzero((old_counts != counts[:, :n_days]).any(axis=0))[0]
+    start = int(changed[0]) if len(changed) else n_days
+    return start, mean, var
+
+
+class AnomalyStore:
+    def __init__(self, spikes):
+        self.spikes = spikes.sort_values(['date', 'z'], ascending=[True, False], ignore_index=True)
+
+    def lookup(self, start, end, categories=None, limit=ANOMALY_MAX_RESULTS):
+        """
+        Spikes between start and end (inclusive), strongest first. `categories` maps a dimension
+        to the values of interest; the overall series is always included.
+        """
+        dates = self.spikes['date']
+        in_window = (dates >= pd.Timestamp(start).normalize()) & (dates <= pd.Timestamp(end).normalize())
+        spikes = self.spikes[in_window]
+        if categories is not None:
+            wanted = spikes['dimension'] == "ALL"
+            for dimension, values in categories.items():
+                wanted |= (spikes['dimension'] == dimension) & spikes['value'].isin(values)
+            spikes = spikes[wanted]
+        spikes = spikes.nlargest(limit, 'z')
+        return [
+            {**record, "date": record["date"].strftime('%Y-%m-%d')}
+            for record in spikes.to_dict(orient='records')
+        ]
+
+
+def _build(dataframe, path):
+    series, first_day, counts = daily_rollup(dataframe)
+    previous = _load_existing(path)
+    reuse = _reuse_from(previous, series, first_day, counts)
+    if reuse is None:
+        start, mean, var = 0, np.zeros(counts.shape), np.zeros(counts.shape)
+        kept = pd.DataFrame(columns=_SPIKE_COLUMNS)
+    else:
+        start, mean, var = reuse
+        spikes = previous[2]
+        kept = spikes[spikes['date'] < first_day + pd.Timedelta(days=start)]
+
+    z, expected, mean, var = _score(counts, mean, var, start)
+    spikes = pd.concat([kept, _flag(series, first_day, counts, z, expected, start)], ignore_index=True) \
+        if not kept.empty else _flag(series, first_day, counts, z, expected, start)
+    meta = {
+        "dataset_version": dataframe.attrs.get("dataset_version"),
+        "n_rows": len(dataframe),
+        "first_day": first_day.strftime('%Y-%m-%d'),
+        "settings": [ANOMALY_SPAN, ANOMALY_MIN_HISTORY],
+        "series": [list(s) for s in series],
+        "rescored_from_day": start,
+    }
+    _save(path, meta, counts, mean, var, spikes)
+    return AnomalyStore(spikes)
+
+
+def ensure_index(dataframe, path=ANOMALY_INDEX_DIR):
+    """Ingestion hook: loads the stored spikes for dataframe's version or (re)scores the changed days."""
+    if dataframe.empty:
+        return None
+    key = dataset_key(dataframe)
+    with _lock:
+        previous = _load_existing(path)
+        if previous is not None and previous[0].get("dataset_version") == dataframe.attrs.get("dataset_version") \
+                and previous[0].get("n_rows") == len(dataframe):
+            store = AnomalyStore(previous[2])
+        else:
+            store = _build(dataframe, path)
+        _stores.clear()  # Only the current dataset version is kept
+        _stores[key] = store
+        return store
+
+
+def get_index(dataframe):
+    """The spike store for the master dataset a result came from (matched by dataset version)."""
+    version = dataframe.attrs.get("dataset_version")
+    with _lock:
+        for (store_version, _), store in _stores.items():
+            if store_version == version:
+                return store
+    return None
+
+
+def detect_series(per_day, first_day):
+    """Spikes in one daily count series (e.g. a search result), with the same EWMA scoring."""
+    counts = np.asarray(per_day, dtype=np.float64)[None, :]
+    z, expected, _, _ = _score(counts, np.zeros(counts.shape), np.zeros(counts.shape), 0)
+    spikes = _flag([("RESULT", "Hasil pencarian", "volume")], pd.Timestamp(first_day), counts, z, expected, 0)
+    return [
+        {"date": d.strftime('%Y-%m-%d'), "count": int(c), "expected": float(e), "z": float(s)}
+        for d, c, e, s in zip(spikes['date'], spikes['count'], spikes['expected'], spikes['z'])
+    ]
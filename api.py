@@ -0,0 +1,355 @@
+# api.py
+"""
+Headless HTTP API over the same search and analytics engine as the Streamlit app.
+
+Run with:  uvicorn api:app --host 0.0.0.0 --port 8000
+
+The dataset is loaded once at startup and shared by every request, together with the search
+indexes and the result cache. Loading runs as a background warm-up (see warmup.py): /ready
+answers 503 until it has finished, so a load balancer only routes traffic to a warm process. Handlers are async; blocking work (search, aggregation, LLM calls)
+goes through the shared worker pool, so API clients get the same fair queuing and admission
+control as app sessions. Clients identify themselves with an optional X-Session-Id header.
+
+Endpoints:
+    GET  /health       liveness plus warm-up / dataset status (a failed warm-up is reported, not fatal)
+    GET  /ready        readiness: 200 once warm, 503 while warming up or after a failed warm-up
+    POST /classify     prompt -> search plan
+    POST /search       search plan -> matching rows (paged)
+    POST /aggregates   search plan -> structured context (the data the dashboard charts show)
+    POST /compare      two or more search plans -> aligned aggregates per side plus differences
+    POST /chat         prompt (+ history, previous plan) -> answer streamed as Server-Sent Events
+    POST /export       search plan -> all matching rows as a streamed CSV / Parquet / XLSX file
+    GET  /export       same, with the plan as a JSON query parameter (for plain download links)
+    GET  /sessions/{id}/export   rows of a saved chat session as a streamed file
+"""
+
+import os
+import json
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+import comparison
+import drilldown
+import export
+import history_service
+import near_duplicates
+import warmup
+import workers
+from utils import (
+    load_data, classify_prompt_and_extract_entities, search_data, generate_structured_context_from_data,
+    get_ai_response, get_missing_date_response, get_comparison_response
+)
+
+load_dotenv()
+
+DATA_FILE = os.getenv("DATA_FILE", "data_full.xlsx")
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "1000"))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warmup.start(DATA_FILE, load_data)
+    if not warmup.WARMUP_IN_BACKGROUND:
+        await run_in_threadpool(warmup.wait)
+    yield
+
+
+app = FastAPI(title="Chatbot AI Media Monitoring API", lifespan=lifespan)
+
+
+# --- REQUEST MODELS ---
+class SearchPlan(BaseModel):
+    strict_groups: List[List[str]] = Field(default_factory=list)
+    fallback_keywords: List[str] = Field(default_factory=list)
+    dates: List[str] = Field(default_factory=list)
+    # Drill-down filters, e.g. {"SENTIMEN": ["Negatif"], "min": {"ENGAGEMENTS": 1000}} (see drilldown.py)
+    filters: dict = Field(default_factory=dict)
+    # Fold near-duplicate reposts into one row with summed metrics (see near_duplicates.py; needs NEAR_DUPLICATES=1)
+    collapse_duplicates: bool = False
+
+
+class SearchRequest(SearchPlan):
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1)
+
+
+class ComparePlan(SearchPlan):
+    label: str = ""
+
+
+class CompareRequest(BaseModel):
+    plans: List[ComparePlan]
+
+
+class ClassifyRequest(BaseModel):
+    prompt: str
+    previous_prompt: str = ""
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+
+class ChatRequest(BaseModel):
+    prompt: str
+    history: List[Message] = Field(default_factory=list)
+    # The plan returned by the previous /chat call, needed to answer follow-ups
+    last_search: Optional[SearchPlan] = None
+
+
+# --- HELPERS ---
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return str(value)
+
+
+def _jsonable(obj):
+    return json.loads(json.dumps(obj, default=_json_default))
+
+
+def _get_df():
+    df = warmup.dataset()
+    if df is None or df.empty:
+        raise HTTPException(status_code=503, detail="Dataset belum dimuat.")
+    return df
+
+
+def _session_id(request):
+    return request.headers.get("X-Session-Id") or f"api:{request.client.host if request.client else 'unknown'}"
+
+
+async def _wait_pool(call, *args):
+    """Runs a blocking pool call off the event loop; busy / timeout become 503 / 504."""
+    try:
+        return await run_in_threadpool(call, *args)
+    except workers.WorkerBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except workers.WorkerTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+async def _run(request, fn, *args):
+    """Runs a CPU job on the shared worker pool without blocking the event loop."""
+    return await _wait_pool(workers.get_pool().run, _session_id(request), fn, *args)
+
+
+async def _run_io(request, fn, *args):
+    """Runs a blocking LLM call on the pool's I/O loop, admitted per session like CPU jobs."""
+    return await _wait_pool(workers.get_pool().run_io, _session_id(request), fn, *args)
+
+
+def _stream(request, response_stream):
+    """Admits a response stream on the pool's I/O loop; a full queue becomes 503 before any event is sent."""
+    try:
+        return workers.get_pool().stream(_session_id(request), response_stream)
+    except workers.WorkerBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _search(df, plan):
+    """search_data plus the plan's drill-down filters and repost collapsing, as one worker job."""
+    result = search_data(df, plan.strict_groups, plan.fallback_keywords, plan.dates)
+    result = drilldown.apply_filters(result, drilldown.normalize_filters(plan.filters))
+    return near_duplicates.collapse(result) if plan.collapse_duplicates else result
+
+
+async def _compare(request, df, plans):
+    """Searches every side as its own pool job (concurrently), then aggregates them in one pass."""
+    results = await _wait_pool(comparison.run_plans, workers.get_pool(), _session_id(request), search_data, df, plans)
+    return await _run(request, comparison.aligned_aggregates, results, plans)
+
+
+def _export_response(fmt, frame, positions, base_name):
+    """Streams the rows at `positions` as a download; encoding happens chunk by chunk while sending."""
+    try:
+        chunks = export.stream_export(fmt, frame, positions)
+    except export.ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(chunks, media_type=export.FORMATS[fmt][0], headers={
+        "Content-Disposition": f'attachment; filename="{export.file_name(base_name, fmt)}"',
+    })
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+
+
+# --- ENDPOINTS ---
+def _status():
+    df = warmup.dataset()
+    loaded = df is not None and not df.empty
+    state = warmup.status()
+    return {
+        "status": "ok" if state["status"] == "ready" else state["status"],
+        "rows": len(df) if loaded else 0,
+        "dataset_version": df.attrs.get("dataset_version") if loaded else None,
+        "warmup": state,
+    }
+
+
+@app.get("/health")
+async def health():
+    # Liveness only: a failed warm-up is retried in-process (see /ready), so it must not get the process killed
+    return _status()
+
+
+@app.get("/ready")
+async def ready():
+    # Load balancer readiness probe: only a fully warmed-up process takes traffic
+    warmup.start(DATA_FILE, load_data)  # Retries a failed warm-up (no-op otherwise)
+    return JSONResponse(_status(), status_code=200 if warmup.is_ready() else 503)
+
+
+@app.post("/classify")
+async def classify(body: ClassifyRequest, request: Request):
+    return _jsonable(await _run_io(request, classify_prompt_and_extract_entities, body.prompt, body.previous_prompt))
+
+
+@app.post("/search")
+async def search(body: SearchRequest, request: Request):
+    df = _get_df()
+    result = await _run(request, _search, df, body)
+    limit = min(body.limit, API_MAX_PAGE_SIZE)
+    page = result.iloc[body.offset:body.offset + limit]
+    return {
+        "total": len(result),
+        "offset": body.offset,
+        "limit": limit,
+        "rows": json.loads(page.to_json(orient="records", date_format="iso")) if not page.empty else [],
+    }
+
+
+@app.post("/aggregates")
+async def aggregates(body: SearchPlan, request: Request):
+    df = _get_df()
+    result = await _run(request, _search, df, body)
+    return _jsonable(await _run(request, generate_structured_context_from_data, result))
+
+
+@app.post("/compare")
+async def compare(body: CompareRequest, request: Request):
+    df = _get_df()
+    plans = comparison.normalize_plans([plan.model_dump() for plan in body.plans])
+    if len(plans) < 2:
+        raise HTTPException(status_code=422, detail="Perbandingan membutuhkan minimal dua rencana pencarian.")
+    aggregates = await _compare(request, df, plans)
+    return _jsonable({
+        **comparison.comparison_context(aggregates),
+        "daily_volume": aggregates["daily_volume"].to_dict(orient="index"),
+    })
+
+
+@app.post("/chat")
+async def chat(body: ChatRequest, request: Request):
+    """
+    Same flow as the chat box in app.py. Events: `plan` (the search plan to send back as
+    last_search on the next turn, plus the row count), then `token` chunks, then `done`.
+    """
+    df = _get_df()
+    previous_prompt = next((m.content for m in reversed(body.history) if m.role == "user"), "")
+    analysis = await _run_io(request, classify_prompt_and_extract_entities, body.prompt, previous_prompt)
+    dates = analysis.get("dates", [])
+    last_search = body.last_search or SearchPlan()
+
+    if analysis.get("type") == "Follow-Up" and not last_search.strict_groups and not last_search.fallback_keywords \
+            and not last_search.dates:
+        # Nothing to follow up on: treat it as a new topic, like the app does after an empty result
+        analysis = await _run_io(request, classify_prompt_and_extract_entities, body.prompt, "")
+        analysis["type"] = "New Topic"
+        dates = analysis.get("dates", [])
+
+    comparison_plans = []
+    if analysis.get("type") == "Comparison":
+        comparison_plans = comparison.resolve_plans(analysis.get("comparisons", []), last_search.model_dump(), dates)
+        if len(comparison_plans) < 2:
+            # Nothing to compare against; search it as a single topic
+            analysis["type"] = "New Topic"
+            analysis["strict_groups"] = analysis.get("strict_groups") or [g for p in comparison_plans for g in p["strict_groups"]]
+            analysis["fallback_keywords"] = analysis.get("fallback_keywords") or [k for p in comparison_plans for k in p["fallback_keywords"]]
+
+    if analysis.get("type") == "Comparison":
+        # The union of the sides, so that follow-ups after a comparison still have a topic
+        plan = SearchPlan(
+            strict_groups=[g for p in comparison_plans for g in p["strict_groups"]],
+            fallback_keywords=list(dict.fromkeys(k for p in comparison_plans for k in p["fallback_keywords"])),
+            dates=comparison_plans[0]["dates"] if len({tuple(p["dates"]) for p in comparison_plans}) == 1 else [],
+        )
+    elif analysis.get("type") == "Follow-Up":
+        plan = SearchPlan(
+            strict_groups=last_search.strict_groups, fallback_keywords=last_search.fallback_keywords,
+            dates=dates or last_search.dates,
+            filters=drilldown.merge_filters(drilldown.normalize_filters(last_search.filters), analysis.get("filters")),
+        )
+    else:
+        plan = SearchPlan(
+            strict_groups=analysis.get("strict_groups", []), fallback_keywords=analysis.get("fallback_keywords", []),
+            dates=dates
+        )
+
+    history = [m.model_dump() for m in body.history] + [{"role": "user", "content": body.prompt}]
+    if (analysis.get("type") == "New Topic" and not plan.dates) or \
+            (analysis.get("type") == "Comparison" and not all(p["dates"] for p in comparison_plans)):
+        rows = 0
+        response_stream = get_missing_date_response()
+    elif analysis.get("type") == "Comparison":
+        aggregates = await _compare(request, df, comparison_plans)
+        rows = sum(aggregates["total_posts"].values())
+        response_stream = _stream(request, get_comparison_response(body.prompt, aggregates, history=history))
+    else:
+        matched = await _run(request, _search, df, plan)
+        rows = len(matched)
+        response_stream = _stream(request, get_ai_response(body.prompt, matched, plan.model_dump(), history=history))
+
+    def events():
+        yield _sse("plan", {"type": analysis.get("type"), **plan.model_dump(), "comparisons": comparison_plans, "rows": rows})
+        try:
+            for chunk in response_stream:
+                yield _sse("token", {"text": chunk})
+        except workers.WorkerTimeoutError as e:
+            yield _sse("error", {"detail": str(e)})
+        yield _sse("done", {})
+
+    # A sync generator is iterated on Starlette's thread pool, so slow tokens never block the loop
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/export")
+async def export_search(body: SearchPlan, request: Request, format: str = Query("csv")):
+    """
+    Streams all rows of a search. CSV and Parquet start sending with the first chunk; XLSX only
+    after every row is in the workbook, so large XLSX exports take a while before the first byte.
+    """
+    df = _get_df()
+    result = await _run(request, _search, df, body)
+    return _export_response(format, *export.result_source(df, result), "hasil_pencarian")
+
+
+@app.get("/export")
+async def export_search_link(request: Request, plan: str = Query(...), format: str = Query("csv")):
+    try:
+        body = SearchPlan(**json.loads(plan))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Parameter plan tidak valid: {e}")
+    return await export_search(body, request, format)
+
+
+@app.get("/sessions/{session_id}/export")
+async def export_session(session_id: str, format: str = Query("csv")):
+    """The rows of a saved session, streamed like /export (XLSX also starts only after all rows)."""
+    df = warmup.dataset()
+    rows = await run_in_threadpool(history_service.load_session_rows, session_id, df)
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Sesi tidak ditemukan.")
+    return _export_response(format, *rows, f"sesi_{session_id}")
@@ -5,7 +5,8 @@ import pandas as pd
 import streamlit.components.v1 as components
 from utils import (
     configure_openai, load_data, classify_prompt_and_extract_entities,
-    search_data, get_ai_response, get_no_data_suggestion
+    search_data, get_ai_response, get_no_data_suggestion, get_missing_date_response,
+    stream_local_response, get_comparison_response
 )
 
 from visualizations import (
@@ -13,22 +14,38 @@ from visualizations import (
     plot_time_series, plot_followers_vs_engagement, display_top_viral_posts,
     display_data_context, display_top_performers, plot_geospatial_analysis,
     plot_performance_quadrant, display_top_followers_posts,
-    display_top_engagement_posts, plot_source_distribution # <-- ADD THIS IMPORT
+    display_top_engagement_posts, plot_source_distribution, # <-- ADD THIS IMPORT
+    display_comparison
 )
 
 from components import (
-    apply_custom_css, display_raw_data_bubbles, display_history, display_header_logo
+    apply_custom_css, display_raw_data_bubbles, display_history, display_header_logo,
+    render_streaming_response, display_performance_panel, display_export_options
 )
+import comparison
+import drilldown
+import near_duplicates
 import history_service  # ADDED: Import the new service for handling chat history files
+from metrics import span
+import profiling
+import uuid
+import warmup
+import workers
 
 # --- PAGE CONFIG & SETUP ---
 st.set_page_config(page_title="AI Social Media Dashboard", page_icon="logo_kurasi.png" ,layout="wide", initial_sidebar_state="expanded")
 
+# Opt-in profiling of this script run (?profile=1 atau PROFILE_RUNS=1)
+run_profile = profiling.start_run()
+
 # Automatically scroll to top on rerun
 components.html("<script>window.scrollTo(0, 0);</script>", height=0)
 
 apply_custom_css()
 configure_openai()
+# Process-wide warm-up (imports, dataset, indexes) starts with the first run of any session;
+# load_data() below waits for the same cache entry instead of loading the file a second time
+warmup.start(load_fn=load_data)
 df = load_data()
 
 # --- SESSION STATE INITIALIZATION ---
@@ -40,8 +57,27 @@ if "search_performed" not in st.session_state:
     st.session_state.search_performed = False
 if "last_search" not in st.session_state:
     st.session_state.last_search = {"strict_groups": [], "fallback_keywords": []}
+if "comparison" not in st.session_state:
+    st.session_state.comparison = None  # Aligned aggregates while a comparison is on screen
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())  # Identifies this session to the shared worker pool
 # REMOVED: The state for decoupled AI response is no longer needed
 
+
+def current_view():
+    """matched_data as shown and analysed: near-duplicate reposts folded into one row when enabled."""
+    data = st.session_state.matched_data
+    return near_duplicates.collapse(data) if st.session_state.get("collapse_duplicates") else data
+
+
+def with_timeout_notice(response_stream):
+    """Ends a stream that stalls past WORKER_JOB_TIMEOUT with a notice instead of a traceback."""
+    try:
+        yield from response_stream
+    except workers.WorkerTimeoutError as e:
+        yield f"\n\n{e}"
+
+
 # --- SIDEBAR ---
 with st.sidebar:
     display_header_logo()
@@ -87,7 +123,17 @@ with st.sidebar:
     </button>
     """, unsafe_allow_html=True)
 
-    display_history()
+    # Cluster repost hanya ada bila NEAR_DUPLICATES=1
+    if near_duplicates.NEAR_DUPLICATES:
+        st.toggle(
+            "Gabungkan repost", key="collapse_duplicates",
+            help="Salinan berita yang sama dari beberapa sumber ditampilkan sebagai satu post dengan metrik dijumlahkan."
+        )
+
+    display_history(df)
+
+    # Panel performa hanya untuk admin (?admin=<ADMIN_TOKEN>)
+    display_performance_panel()
 
     # Tombol logout
     if st.button("🚪 Logout", use_container_width=True):
@@ -96,6 +142,7 @@ with st.sidebar:
         st.session_state["matched_data"] = pd.DataFrame()
         st.session_state["search_performed"] = False
         st.session_state["last_search"] = {"strict_groups": [], "fallback_keywords": []}
+        st.session_state["comparison"] = None
         st.rerun()
 
 
@@ -139,10 +186,13 @@ with col2:
     with st.container(height=550, border=True):
         if not st.session_state.search_performed:
             st.info("Masukan pertanyaan Anda di kolom chat untuk memulai.")
+        elif st.session_state.comparison:
+            with span("render.comparison"):
+                display_comparison(st.session_state.comparison)
         elif st.session_state.matched_data.empty:
             st.warning("Tidak ada data yang ditemukan untuk kriteria pencarian Anda.")
         else:
-            data_for_viz = st.session_state.matched_data.copy()
+            data_for_viz = current_view().copy()
 
             display_data_context(data_for_viz, st.session_state.last_search)
 
@@ -151,7 +201,7 @@ with col2:
                             "Performance","Top Performers", "Geospatial"
                             ])
  
-            with tabs[0]: # Summary
+            with tabs[0], span("render.summary"): # Summary
                 display_summary_metrics(data_for_viz)
                 st.markdown("---") 
 
@@ -163,21 +213,21 @@ with col2:
                 display_top_followers_posts(data_for_viz)
             
             
-            with tabs[1]: # Sentiment
+            with tabs[1], span("render.sentiment"): # Sentiment
                 plot_sentiment_distribution(data_for_viz)
-            with tabs[2]: # Engagement
+            with tabs[2], span("render.engagement"): # Engagement
                 plot_engagement_by_category(data_for_viz, category='TOPIK')
                 plot_engagement_by_category(data_for_viz, category='GRUP')
-            with tabs[3]: # Trends
+            with tabs[3], span("render.trends"): # Trends
                 plot_time_series(data_for_viz)
                 plot_source_distribution(data_for_viz) 
-            with tabs[4]: # Performance
+            with tabs[4], span("render.performance"): # Performance
                 plot_followers_vs_engagement(data_for_viz)
                 st.markdown("---") # Add a separator
                 plot_performance_quadrant(data_for_viz)
-            with tabs[5]: # Top Performers
+            with tabs[5], span("render.top_performers"): # Top Performers
                 display_top_performers(data_for_viz)
-            with tabs[6]: # Geospatial
+            with tabs[6], span("render.geospatial"): # Geospatial
                 plot_geospatial_analysis(data_for_viz)
 
 # --- COLUMN 3: RAW DATA ---
@@ -187,58 +237,108 @@ with col3:
         "<i class='bi bi-table'></i> Data Konten</h3>",
         unsafe_allow_html=True
     )
-    with st.container(height=550, border=True):
-        display_raw_data_bubbles(st.session_state.matched_data)
+    with st.container(height=550, border=True), span("render.raw_data"):
+        display_raw_data_bubbles(
+            st.session_state.matched_data, st.session_state.last_search,
+            collapse=st.session_state.get("collapse_duplicates", False)
+        )
+    display_export_options(
+        df, st.session_state.matched_data, st.session_state.last_search,
+        collapse=st.session_state.get("collapse_duplicates", False)
+    )
 
 # --- CHAT INPUT & SEQUENTIAL PROCESSING ---
 if prompt := st.chat_input("Ask about the data..."):
     # Add user message to state
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-    # All processing happens sequentially here
+    # Heavy work runs on the shared worker pool; this script thread only waits for the results
+    pool = workers.get_pool()
+    session_id = st.session_state.session_id
+    prompt_type = None
     response_stream = None
     with st.spinner("Analyzing prompt and generating response..."):
-        # STEP 1: Analyze prompt and search for data
-        user_messages = [msg["content"] for msg in st.session_state.messages if msg["role"] == "user"]
-        previous_prompt = user_messages[-2] if len(user_messages) > 1 else ""
-        analysis = classify_prompt_and_extract_entities(prompt, previous_prompt)
-
-        prompt_type = analysis.get("type")
-        dates = analysis.get("dates", [])
-
-        if st.session_state.matched_data.empty and len(st.session_state.messages) > 2:
-            prompt_type = "New Topic"
-            analysis = classify_prompt_and_extract_entities(prompt, "")
-
-        if prompt_type == "New Topic" and not dates:
-            st.session_state.search_performed = False
-            st.session_state.matched_data = pd.DataFrame()
-            strict_groups = analysis.get("strict_groups", [])
-            fallback_keywords = analysis.get("fallback_keywords", [])
-            st.session_state.last_search = {"strict_groups": strict_groups, "fallback_keywords": fallback_keywords}
-
-            def missing_date_response():
-                response_text = "Tentu, saya bisa carikan datanya. Mohon informasikan tanggal atau rentang tanggal spesifik yang Anda inginkan."
-                for word in response_text.split():
-                    import time
-                    yield word + " "
-                    time.sleep(0.05)
-            response_stream = missing_date_response()
-        else:
-            if prompt_type == "New Topic":
+        try:
+            # STEP 1: Analyze prompt and search for data
+            user_messages = [msg["content"] for msg in st.session_state.messages if msg["role"] == "user"]
+            previous_prompt = user_messages[-2] if len(user_messages) > 1 else ""
+            analysis = pool.run_io(session_id, classify_prompt_and_extract_entities, prompt, previous_prompt)
+
+            prompt_type = analysis.get("type")
+            dates = analysis.get("dates", [])
+
+            comparison_plans = []
+            if prompt_type == "Comparison":
+                comparison_plans = comparison.resolve_plans(analysis.get("comparisons", []), st.session_state.last_search, dates)
+                if len(comparison_plans) < 2:
+                    prompt_type = "New Topic"  # Nothing to compare against; search it as a single topic
+                    analysis["strict_groups"] = analysis.get("strict_groups") or [g for p in comparison_plans for g in p["strict_groups"]]
+                    analysis["fallback_keywords"] = analysis.get("fallback_keywords") or [k for p in comparison_plans for k in p["fallback_keywords"]]
+
+            if prompt_type != "Comparison" and st.session_state.matched_data.empty and len(st.session_state.messages) > 2:
+                prompt_type = "New Topic"
+                analysis = pool.run_io(session_id, classify_prompt_and_extract_entities, prompt, "")
+
+            if prompt_type == "Comparison" and not all(plan["dates"] for plan in comparison_plans):
+                st.session_state.search_performed = False
+                st.session_state.comparison = None
+                st.session_state.matched_data = pd.DataFrame()
+                response_stream = get_missing_date_response()
+            elif prompt_type == "Comparison":
+                # Every side is a separate worker job, so the searches run concurrently
+                results = comparison.run_plans(pool, session_id, search_data, df, comparison_plans)
+                st.session_state.comparison = pool.run(session_id, comparison.aligned_aggregates, results, comparison_plans)
+                st.session_state.matched_data = comparison.combine_results(results, comparison_plans)
+                st.session_state.last_search = {
+                    "strict_groups": [g for plan in comparison_plans for g in plan["strict_groups"]],
+                    "fallback_keywords": list(dict.fromkeys(k for plan in comparison_plans for k in plan["fallback_keywords"])),
+                    "dates": comparison_plans[0]["dates"] if len({tuple(p["dates"]) for p in comparison_plans}) == 1 else [],
+                    "comparisons": comparison_plans,
+                }
+                st.session_state.search_performed = True
+                response_stream = pool.stream(session_id, get_comparison_response(prompt, st.session_state.comparison))
+            elif prompt_type == "New Topic" and not dates:
+                st.session_state.search_performed = False
+                st.session_state.matched_data = pd.DataFrame()
+                st.session_state.comparison = None
                 strict_groups = analysis.get("strict_groups", [])
                 fallback_keywords = analysis.get("fallback_keywords", [])
-                st.session_state.last_search = {"strict_groups": strict_groups, "fallback_keywords": fallback_keywords}
-                st.session_state.matched_data = search_data(df, strict_groups, fallback_keywords, dates)
-            elif prompt_type == "Follow-Up":
-                last_search_params = st.session_state.last_search
-                if dates:
-                    st.session_state.matched_data = search_data(df, last_search_params["strict_groups"], last_search_params["fallback_keywords"], dates)
-
-            st.session_state.search_performed = True
-        
-            # STEP 2: Get AI response stream (now happens after data search)
-            response_stream = get_ai_response(prompt, st.session_state.matched_data, st.session_state.last_search)
+                st.session_state.last_search = {"strict_groups": strict_groups, "fallback_keywords": fallback_keywords, "dates": dates}
+
+                response_stream = get_missing_date_response()
+            else:
+                if prompt_type == "New Topic":
+                    strict_groups = analysis.get("strict_groups", [])
+                    fallback_keywords = analysis.get("fallback_keywords", [])
+                    st.session_state.last_search = {"strict_groups": strict_groups, "fallback_keywords": fallback_keywords, "dates": dates}
+                    st.session_state.comparison = None
+                    st.session_state.matched_data = pool.run(session_id, search_data, df, strict_groups, fallback_keywords, dates)
+                elif prompt_type == "Follow-Up":
+                    last_search_params = st.session_state.last_search
+                    # Drill-down filters accumulate over follow-ups and are applied to the (cached) search result
+                    filters = drilldown.merge_filters(last_search_params.get("filters"), analysis.get("filters"))
+                    if dates or filters != last_search_params.get("filters", {}):
+                        search_dates = dates or last_search_params.get("dates")
+                        if search_dates:
+                            base_data = pool.run(session_id, search_data, df, last_search_params["strict_groups"], last_search_params["fallback_keywords"], search_dates)
+                        else:
+                            base_data = st.session_state.matched_data  # Sessions saved before dates were recorded
+                        st.session_state.matched_data = drilldown.apply_filters(base_data, filters)
+                        st.session_state.last_search = {**last_search_params, "dates": search_dates, "filters": filters}
+                        st.session_state.comparison = None
+
+                st.session_state.search_performed = True
+            
+                # STEP 2: Get AI response stream (now happens after data search)
+                if st.session_state.comparison:
+                    # Analysis follow-ups on a comparison keep answering from the aligned aggregates
+                    response_stream = pool.stream(session_id, get_comparison_response(prompt, st.session_state.comparison))
+                else:
+                    response_stream = pool.stream(
+                        session_id, get_ai_response(prompt, current_view(), st.session_state.last_search)
+                    )
+        except (workers.WorkerBusyError, workers.WorkerTimeoutError) as e:
+            response_stream = stream_local_response(str(e))
 
     # STEP 3: Stream response to UI
     if response_stream:
@@ -249,26 +349,31 @@ if prompt := st.chat_input("Ask about the data..."):
         )
         
         placeholder = chat_container.empty()
-        full_response = ""
-        for chunk in response_stream:
-            full_response += chunk
-            response_for_html = full_response.replace("\n", "<br>")
-            placeholder.markdown(
-                f'<div class="chat-bubble chat-ai">{response_for_html}</div>',
-                unsafe_allow_html=True
-            )
+        full_response = render_streaming_response(placeholder, with_timeout_notice(response_stream))
 
         st.session_state.messages.append({"role": "assistant", "content": full_response})
 
     # STEP 4: Save history and rerun the app to finalize the display
-    if prompt_type == "New Topic" and not st.session_state.matched_data.empty:
+    if prompt_type in ("New Topic", "Comparison") and not st.session_state.matched_data.empty:
         current_session_state = {
             "messages": st.session_state.get("messages", []).copy(),
             "matched_data": st.session_state.get("matched_data", pd.DataFrame()).copy(),
             "last_search": st.session_state.get("last_search", {}).copy()
         }
-        history_service.save_chat_session(current_session_state)
-
+        try:
+            # Fire-and-forget: the rerun does not need to wait for the file write
+            pool.submit(session_id, history_service.save_chat_session, current_session_state)
+        except workers.WorkerBusyError:
+            history_service.save_chat_session(current_session_state)
+
+    profiling.finish_run(
+        run_profile, prompt=prompt, last_search=st.session_state.last_search,
+        row_count=len(st.session_state.matched_data)
+    )
     st.rerun()
 
+profiling.finish_run(
+    run_profile, last_search=st.session_state.last_search, row_count=len(st.session_state.matched_data)
+)
+
     
\ No newline at end of file
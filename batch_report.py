@@ -0,0 +1,187 @@
+# batch_report.py
+"""
+Batch briefing generator: runs a list of topics over a date range without the chat UI.
+
+Each topic goes through search_data -> generate_structured_context_from_data -> an AI summary,
+and the results are written to a report directory together with the context JSON and
+interactive charts (HTML). Topics are processed in parallel on a thread pool; the LLM calls are
+additionally limited by --llm-concurrency. Searches use the same shared indexes, alias table and
+result cache as the app.
+
+    python batch_report.py --topics-file briefing_topics.txt                 # yesterday
+    python batch_report.py Prabowo "Bahlil + energi" --start 2025-08-01 --end 2025-08-31
+
+A topic line is one keyword plan: "a + b" means both terms must appear in a post (one AND group).
+Lines starting with "#" are ignored.
+"""
+
+import os
+import re
+import json
+import logging
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import plotly.express as px
+
+from utils import load_data, search_data, generate_structured_context_from_data, get_ai_response
+from visualizations import apply_chart_style, COLOR_PALETTE, SENTIMENT_COLORS
+from workers import WORKER_THREADS
+
+SUMMARY_PROMPT = (
+    "Buat ringkasan briefing harian tentang {topic} untuk periode {period}: volume pemberitaan, "
+    "sentimen, topik dan akun yang paling menonjol, serta hal yang perlu diwaspadai."
+)
+
+
+def read_topics(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def topic_plan(topic):
+    """Keyword plan for one topic line ("a + b" -> one AND group)."""
+    terms = [t.strip() for t in topic.split("+") if t.strip()]
+    return {"strict_groups": [terms], "fallback_keywords": terms}
+
+
+def _slug(text):
+    return re.sub(r"[^0-9a-z]+", "-", text.casefold()).strip("-") or "topic"
+
+
+def unique_slugs(topics):
+    """One directory name per topic; topics with the same slug ("Setneg!", "setneg") get -2, -3, ..."""
+    slugs, taken = [], set()
+    for topic in topics:
+        base = slug = _slug(topic)
+        n = 1
+        while slug in taken:
+            n += 1
+            slug = f"{base}-{n}"
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def build_charts(context):
+    """Charts for one topic, built from the structured context (no second pass over the rows)."""
+    charts = {}
+    sentiment = context.get("sentiment_distribution") or {}
+    if sentiment:
+        fig = px.pie(names=list(sentiment), values=list(sentiment.values()), hole=0.4,
+                     color=list(sentiment), color_discrete_map=SENTIMENT_COLORS)
+        charts["sentiment"] = apply_chart_style(fig, "Public Sentiment Distribution")
+
+    trend = (context.get("daily_trends") or {}).get("trend_data") or {}
+    if trend:
+        fig = px.area(x=list(trend), y=list(trend.values()), markers=True,
+                      labels={'x': 'Tanggal', 'y': 'Jumlah Post'})
+        fig.update_traces(line=dict(color=COLOR_PALETTE[1], width=2))
+        charts["trend"] = apply_chart_style(fig, 'Tren Jumlah Post Harian')
+
+    by_topic = (context.get("engagement_analysis") or {}).get("by_topic") or {}
+    if by_topic:
+        fig = px.bar(x=list(by_topic), y=list(by_topic.values()), color=list(by_topic),
+                     color_discrete_sequence=COLOR_PALETTE, text_auto='.2%')
+        fig.update_yaxes(title='Average Engagement Rate', tickformat='.2%')
+        fig.update_xaxes(title='TOPIK')
+        charts["engagement_topik"] = apply_chart_style(fig, 'Rata-Rata Engagement Rate per TOPIK')
+    return charts
+
+
+class BriefingRunner:
+    def __init__(self, df, dates, output_dir, llm_concurrency=4, collapse_duplicates=False):
+        self.df = df
+        self.dates = dates
+        self.output_dir = output_dir
+        self.collapse_duplicates = collapse_duplicates
+        self._llm_slots = threading.BoundedSemaphore(llm_concurrency)
+
+    def summarize(self, topic, matched, plan):
+        prompt = SUMMARY_PROMPT.format(topic=topic, period=" s.d. ".join(self.dates))
+        with self._llm_slots:
+            return "".join(get_ai_response(prompt, matched, plan, history=[{"role": "user", "content": prompt}]))
+
+    def run_topic(self, topic, slug=None):
+        plan = topic_plan(topic)
+        matched = search_data(self.df, plan["strict_groups"], plan["fallback_keywords"], self.dates,
+                              collapse=self.collapse_duplicates)
+        topic_dir = os.path.join(self.output_dir, slug or _slug(topic))
+        os.makedirs(topic_dir, exist_ok=True)
+
+        entry = {"topic": topic, "rows": len(matched), "dir": os.path.basename(topic_dir), "charts": []}
+        if matched.empty:
+            entry["summary"] = "Tidak ada data untuk periode ini."
+            return entry
+
+        context = generate_structured_context_from_data(matched)
+        with open(os.path.join(topic_dir, "context.json"), 'w', encoding='utf-8') as f:
+            json.dump(context, f, indent=2, default=str)
+        for name, fig in build_charts(context).items():
+            fig.write_html(os.path.join(topic_dir, f"{name}.html"), include_plotlyjs="cdn")
+            entry["charts"].append(f"{name}.html")
+
+        entry["summary"] = self.summarize(topic, matched, plan)
+        with open(os.path.join(topic_dir, "summary.md"), 'w', encoding='utf-8') as f:
+            f.write(f"# {topic}\n\n{entry['summary']}\n")
+        return entry
+
+    def run(self, topics, workers=WORKER_THREADS):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="briefing") as executor:
+            entries = list(executor.map(self.run_topic, topics, unique_slugs(topics)))
+        self.write_index(entries)
+        return entries
+
+    def write_index(self, entries):
+        lines = [f"# Briefing {' s.d. '.join(self.dates)}", "", f"_Dibuat {datetime.now():%Y-%m-%d %H:%M}_", ""]
+        for entry in entries:
+            lines += [f"## {entry['topic']} ({entry['rows']:,} post)", "", entry["summary"], ""]
+            lines += [f"- [{chart}]({entry['dir']}/{chart})" for chart in entry["charts"]]
+            lines.append("")
+        with open(os.path.join(self.output_dir, "index.md"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+
+def main():
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    parser = argparse.ArgumentParser(description="Generate a batch briefing report for a list of topics.")
+    parser.add_argument("topics", nargs="*", help="Topics (\"a + b\" = both terms required).")
+    parser.add_argument("--topics-file", help="File with one topic per line.")
+    parser.add_argument("--start", default=yesterday, help="Start date YYYY-MM-DD (default: yesterday).")
+    parser.add_argument("--end", help="End date YYYY-MM-DD (default: same as --start).")
+    parser.add_argument("--data", default="data_full.xlsx")
+    parser.add_argument("--output", help="Report directory (default: reports/<start>_<end>).")
+    parser.add_argument("--workers", type=int, default=WORKER_THREADS, help="Topics processed in parallel.")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Maximum simultaneous LLM calls.")
+    parser.add_argument("--collapse-duplicates", action="store_true",
+                        help="Count near-duplicate reposts of one article as a single post.")
+    args = parser.parse_args()
+
+    # Streamlit calls run in "bare mode" here; silence its missing-runtime warnings
+    for name in [n for n in logging.root.manager.loggerDict if n.startswith("streamlit")] + ["streamlit"]:
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    topics = list(dict.fromkeys(list(args.topics) + (read_topics(args.topics_file) if args.topics_file else [])))
+    if not topics:
+        parser.error("no topics given")
+    end = args.end or args.start
+    dates = [args.start] if end == args.start else [args.start, end]
+    output_dir = args.output or os.path.join("reports", f"{args.start}_{end}")
+
+    df = load_data(args.data)
+    if df.empty:
+        raise SystemExit(f"Dataset {args.data} tidak dapat dimuat.")
+
+    started = datetime.now()
+    entries = BriefingRunner(df, dates, output_dir, args.llm_concurrency, args.collapse_duplicates) \
+        .run(topics, workers=args.workers)
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"[briefing] {len(entries)} topics, {sum(e['rows'] for e in entries):,} posts, "
+          f"{elapsed:.1f}s -> {os.path.join(output_dir, 'index.md')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# benchmark.py
+"""
+End-to-end benchmark for the query pipeline.
+
+Generates synthetic datasets shaped like data_full.xlsx, replays a corpus of strict / fallback /
+date-only queries through search_data -> generate_structured_context_from_data -> visualizations,
+and reports p50/p95 latency and peak memory per stage. Results can be written as JSON and compared
+against an earlier run for regression tracking:
+
+    python benchmark.py --sizes 10k,100k --output bench_new.json --compare bench_old.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import result_cache
+from utils import search_data, generate_structured_context_from_data
+from columns import ROW_ID_COLUMN
+import visualizations
+
+# --- SYNTHETIC DATA VOCABULARY (mirrors the real dataset) ---
+ENTITIES = [
+    "Prabowo", "Prabowo Subianto", "Presiden", "Bahlil", "Bahlil Lahadalia", "Menteri Keuangan Purbaya",
+    "Menkeu", "Sekretariat Negara", "Setneg", "Wakil Menteri Sekretaris Negara", "surplus keuangan",
+    "stimulus ekonomi", "IHSG", "Rupiah", "DPR", "Kepolisian",
+]
+FILLER = [
+    "menyampaikan pernyataan terkait", "hari ini membahas", "dalam rapat kerja bersama",
+    "mendapat sorotan publik soal", "menanggapi isu", "meresmikan program", "memberikan klarifikasi tentang",
+    "warganet ramai membicarakan", "berita terbaru mengenai", "kebijakan baru untuk",
+]
+TOPICS = ["Stimulus Ekonomi", "Kementerian Sekretariat Negara", "Surplus Keuangan", "Presiden", "Energi"]
+GROUPS = ["Kementerian Sekretariat Negara", "Presiden", "Kementerian Keuangan", "ESDM"]
+SOURCES = ["Tiktok", "Twitter", "Instagram", "Facebook", "Youtube", "Online News"]
+SENTIMENTS = ["Positif", "Netral", "Negatif"]
+EMOTIONS = ["Senang", "Takut", "Marah", "Sedih", "Netral"]
+LOCATIONS = ["DKI Jakarta", "Jawa Barat", "Jawa Timur", "JAMBI", "Bali", "Papua", None]
+
+SIZE_ALIASES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "5m": 5_000_000}
+
+# --- QUERY CORPUS ---
+# "strict" hits tier 1, "fallback" uses groups that never co-occur so tier 2 runs, "date" has no keywords.
+QUERY_CORPUS = [
+    {"name": "strict_single_day", "kind": "strict", "dates": ["2025-08-18"],
+     "strict_groups": [["prabowo"], ["prabowo subianto"], ["presiden"]],
+     "fallback_keywords": ["Prabowo", "Prabowo Subianto", "Presiden"]},
+    {"name": "strict_month", "kind": "strict", "dates": ["2025-08-01", "2025-08-31"],
+     "strict_groups": [["Bahlil"], ["Bahlil Lahadalia"]], "fallback_keywords": ["Bahlil", "Bahlil Lahadalia"]},
+    {"name": "strict_and_group", "kind": "strict", "dates": ["2025-09-01", "2025-09-18"],
+     "strict_groups": [["Menteri Keuangan"], ["Purbaya"]], "fallback_keywords": ["Menkeu Purbaya", "Purbaya", "Menkeu"]},
+    {"name": "fallback_month", "kind": "fallback", "dates": ["2025-05-01", "2025-05-31"],
+     "strict_groups": [["Ekonomi", "Kepolisian", "Setneg"]], "fallback_keywords": ["Keuangan", "Ekonomi"]},
+    {"name": "fallback_all_dates", "kind": "fallback", "dates": [],
+     "strict_groups": [["stimulus keuangan"]], "fallback_keywords": ["stimulus", "surplus"]},
+    {"name": "date_only_day", "kind": "date", "dates": ["2025-09-16"], "strict_groups": [], "fallback_keywords": []},
+    {"name": "date_only_range", "kind": "date", "dates": ["2025-09-01", "2025-09-18"],
+     "strict_groups": [], "fallback_keywords": []},
+]
+
+VISUALIZATION_STAGES = [
+    ("viz_summary", lambda d: (visualizations.display_summary_metrics(d),
+                               visualizations.display_top_engagement_posts(d),
+                               visualizations.display_top_viral_posts(d),
+                               visualizations.display_top_followers_posts(d))),
+    ("viz_sentiment", visualizations.plot_sentiment_distribution),
+    ("viz_engagement", lambda d: (visualizations.plot_engagement_by_category(d, category='TOPIK'),
+                                  visualizations.plot_engagement_by_category(d, category='GRUP'))),
+    ("viz_trends", lambda d: (visualizations.plot_time_series(d), visualizations.plot_source_distribution(d))),
+    ("viz_performance", lambda d: (visualizations.plot_followers_vs_engagement(d),
+                                   visualizations.plot_performance_quadrant(d))),
+    ("viz_top_performers", visualizations.display_top_performers),
+    ("viz_geospatial", visualizations.plot_geospatial_analysis),
+]
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    return SIZE_ALIASES.get(value) or int(value)
+
+
+def generate_synthetic_data(n_rows, seed=0):
+    """Builds a DataFrame with the same columns and dtypes that load_data() produces."""
+    rng = np.random.default_rng(seed)
+    pick = lambda values, size=n_rows: np.asarray(values, dtype=object)[rng.integers(0, len(values), size)]
+
+    konten = (
+        pd.Series(pick(ENTITIES)) + " " + pick(FILLER) + " " + pick(ENTITIES) + " "
+        + pd.Series(rng.integers(1, 1000, n_rows)).astype(str)
+    )
+    start = np.datetime64("2025-04-01")
+    dates = start + rng.integers(0, 183, n_rows).astype("timedelta64[D]")
+    accounts = np.char.add("akun_", rng.integers(0, max(n_rows // 20, 1), n_rows).astype(str))
+
+    followers = rng.lognormal(7, 2, n_rows).astype(np.int64)
+    likes = rng.poisson(30, n_rows)
+    comments = rng.poisson(4, n_rows)
+    retweets = rng.poisson(2, n_rows)
+    views = np.where(rng.random(n_rows) < 0.4, 0, rng.lognormal(8, 1.5, n_rows).astype(np.int64))
+    engagements = likes + comments + retweets
+
+    df = pd.DataFrame({
+        "NO": np.arange(1, n_rows + 1),
+        "TANGGAL PUBLIKASI": pd.to_datetime(dates),
+        "JAM PUBLIKASI": "12:00:00",
+        "TANGGAL TERSIMPAN": pd.to_datetime(dates),
+        "GRUP": pick(GROUPS),
+        "TOPIK": pick(TOPICS),
+        "AKUN": accounts,
+        "KONTEN": konten,
+        "SENTIMEN": pick(SENTIMENTS),
+        "EMOTION": pick(EMOTIONS),
+        "SUMBER": pick(SOURCES),
+        "URL": "https://example.com/post",
+        "FOLLOWERS": followers,
+        "LIKES": likes,
+        "COMMENTS": comments,
+        "RETWEETS": retweets,
+        "VIEWS": views,
+        "ENGAGEMENTS": engagements,
+        "IMPRESSION": 0.0,
+        "ENGAGEMENT RATE": np.divide(engagements, views, out=np.zeros(n_rows), where=views > 0) * 100,
+        "ESMR": rng.random(n_rows) * 20,
+        "VIRALITY RATE": 0.0,
+        "LOKASI": pick(LOCATIONS),
+        "JENIS AKUN": pick(["Pers", "Non Pers"]),
+    })
+    # Same numeric coercion, row IDs and version stamp as load_data()
+    for col in ['FOLLOWERS', 'ENGAGEMENTS', 'LIKES', 'COMMENTS', 'VIEWS']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    df[ROW_ID_COLUMN] = np.arange(n_rows)
+    df.attrs["dataset_version"] = f"synthetic:{n_rows}:{seed}"
+    return df
+
+
+def _measure(func, repeat, trace_memory):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    peak_mb = None
+    if trace_memory:
+        # Separate traced run: tracemalloc overhead must not pollute the latency numbers
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / (1024 * 1024)
+    return result, timings, peak_mb
+
+
+def _summarize(timings, peaks):
+    peaks = [p for p in peaks if p is not None]
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "samples": len(timings),
+        "peak_memory_mb": round(max(peaks), 3) if peaks else None,
+    }
+
+
+def run_benchmark(sizes, repeat=5, include_viz=True, trace_memory=True, seed=0):
+    # Every repetition must run the full search, not a result-cache hit
+    result_cache.RESULT_CACHE_MAX_BYTES = 0
+    results = {}
+    for n_rows in sizes:
+        print(f"[benchmark] generating {n_rows:,} rows...")
+        df = generate_synthetic_data(n_rows, seed=seed)
+        stage_timings, stage_peaks, query_rows = {}, {}, {}
+
+        for query in QUERY_CORPUS:
+            name = query["name"]
+            matched, timings, peak = _measure(
+                lambda: search_data(df, query["strict_groups"], query["fallback_keywords"], query["dates"]),
+                repeat, trace_memory
+            )
+            stage_timings.setdefault("search_data", []).extend(timings)
+            stage_peaks.setdefault("search_data", []).append(peak)
+            query_rows[name] = len(matched)
+            if matched.empty:
+                continue
+
+            _, timings, peak = _measure(lambda: generate_structured_context_from_data(matched), repeat, trace_memory)
+            stage_timings.setdefault("structured_context", []).extend(timings)
+            stage_peaks.setdefault("structured_context", []).append(peak)
+
+            if include_viz:
+                for stage_name, render in VISUALIZATION_STAGES:
+                    _, timings, peak = _measure(lambda: render(matched.copy()), repeat, trace_memory)
+                    stage_timings.setdefault(stage_name, []).extend(timings)
+                    stage_peaks.setdefault(stage_name, []).append(peak)
+
+        results[str(n_rows)] = {
+            "rows": n_rows,
+            "matched_rows": query_rows,
+            "stages": {stage: _summarize(t, stage_peaks[stage]) for stage, t in stage_timings.items()},
+        }
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_reports(current, baseline):
+    """Prints the p50/p95 change per stage between two benchmark reports."""
+    print(f"\nComparison vs {baseline.get('revision') or 'baseline'}:")
+    for size, run in current["results"].items():
+        base_run = baseline.get("results", {}).get(size)
+        if not base_run:
+            continue
+        for stage, stats in run["stages"].items():
+            base_stats = base_run["stages"].get(stage)
+            if not base_stats:
+                continue
+            delta = (stats["p50_ms"] - base_stats["p50_ms"]) / base_stats["p50_ms"] * 100 if base_stats["p50_ms"] else 0
+            print(f"  {size:>9} {stage:<22} p50 {base_stats['p50_ms']:>10.2f} -> {stats['p50_ms']:>10.2f} ms ({delta:+.1f}%)")
+
+
+def print_report(report):
+    for size, run in report["results"].items():
+        print(f"\n=== {int(size):,} rows ===")
+        print(f"{'stage':<22}{'p50 ms':>12}{'p95 ms':>12}{'peak MB':>12}")
+        for stage, stats in run["stages"].items():
+            peak = f"{stats['peak_memory_mb']:.2f}" if stats["peak_memory_mb"] is not None else "-"
+            print(f"{stage:<22}{stats['p50_ms']:>12.2f}{stats['p95_ms']:>12.2f}{peak:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search / analytics pipeline.")
+    parser.add_argument("--sizes", default="10k,100k", help="Comma separated row counts (10k, 100k, 1m, 5m or integers).")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query and stage.")
+    parser.add_argument("--no-viz", action="store_true", help="Skip the visualization stages.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory pass.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against.")
+    args = parser.parse_args()
+
+    # Streamlit calls run in "bare mode" here; silence its missing-runtime warnings
+    for name in [n for n in logging.root.manager.loggerDict if n.startswith("streamlit")] + ["streamlit"]:
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeat": args.repeat,
+        "results": run_benchmark(
+            [parse_size(s) for s in args.sizes.split(",")], repeat=args.repeat,
+            include_viz=not args.no_viz, trace_memory=not args.no_memory, seed=args.seed
+        ),
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_reports(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+# columns.py
+"""Column names shared across modules; kept free of Streamlit/OpenAI imports so light modules can use them."""
+
+# Stable master row identifier kept on every search result (the row's position in the master dataset)
+ROW_ID_COLUMN = 'ROW ID'
+
+# Side label of a comparison result; part of a row's identity there, since one master row can appear on several sides
+LABEL_COLUMN = 'PERBANDINGAN'
@@ -0,0 +1,192 @@
+# comparison.py
+"""
+Comparison mode for prompts like "bandingkan Prabowo vs Bahlil" or "agustus vs september".
+
+The classifier returns one search plan per side under "comparisons". Every side is searched as
+its own worker job, so the sides run concurrently against the shared indexes and result cache.
+Aligned aggregates for all sides (post count, sentiment share, average engagement rate, daily
+volume) are then computed in one grouped pass over the concatenated columns, and the LLM only
+receives a compact per-side summary plus the differences instead of one context per side.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from columns import LABEL_COLUMN
+from workers import WORKER_JOB_TIMEOUT, wait_result
+
+load_dotenv()
+
+# Each side is one worker job, so keep this at or below WORKER_MAX_PER_SESSION
+COMPARE_MAX_PLANS = int(os.getenv("COMPARE_MAX_PLANS", "4"))
+
+def _plan_label(plan):
+    keywords = plan["fallback_keywords"] or [kw for group in plan["strict_groups"] for kw in group]
+    if keywords:
+        return " / ".join(keywords)
+    return " s.d. ".join(plan["dates"]) or "Semua data"
+
+
+def normalize_plans(raw):
+    """Keeps well-formed plans (at most COMPARE_MAX_PLANS); every plan gets a label."""
+    if not isinstance(raw, list):
+        return []
+    plans = []
+    for item in raw[:COMPARE_MAX_PLANS]:
+        if not isinstance(item, dict):
+            continue
+        plan = {
+            "strict_groups": [[str(kw) for kw in group] for group in item.get("strict_groups") or [] if isinstance(group, list)],
+            "fallback_keywords": [str(kw) for kw in item.get("fallback_keywords") or []],
+            "dates": [str(d) for d in item.get("dates") or []],
+        }
+        label = str(item.get("label") or "").strip() or _plan_label(plan)
+        # Labels index the aggregates, so they must be unique
+        taken = {p["label"] for p in plans}
+        plan["label"] = label if label not in taken else f"{label} ({len(plans) + 1})"
+        plans.append(plan)
+    return plans
+
+
+def resolve_plans(plans, last_search, dates):
+    """
+    Fills what a side leaves open from the conversation: "agustus vs september" keeps the
+    current keywords, "Prabowo vs Bahlil" uses the prompt's dates or the current date range.
+    """
+    last_search = last_search or {}
+    resolved = []
+    for plan in plans:
+        plan = dict(plan)
+        if not plan["strict_groups"] and not plan["fallback_keywords"]:
+            plan["strict_groups"] = last_search.get("strict_groups", [])
+            plan["fallback_keywords"] = last_search.get("fallback_keywords", [])
+        plan["dates"] = plan["dates"] or dates or last_search.get("dates") or []
+        resolved.append(plan)
+    return resolved
+
+
+def run_plans(pool, session_id, search_fn, dataframe, plans):
+    """
+    Searches every side as a separate job on the worker pool and waits for all of them. The sides
+    are admitted together (WorkerBusyError before any is queued), so a refusal never leaves some
+    sides running for nobody.
+    """
+    futures = pool.submit_many(session_id, [
+        (search_fn, (dataframe, plan["strict_groups"], plan["fallback_keywords"], plan["dates"]), {})
+        for plan in plans
+    ])
+    try:
+        return [wait_result(future, WORKER_JOB_TIMEOUT) for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()  # Sides still queued are dropped instead of holding session slots
+        raise
+
+
+def combine_results(results, plans):
+    """
+    One DataFrame with every side's rows, tagged with LABEL_COLUMN (for the raw-data cards).
+    A post matching several sides appears once per side, so rows are identified by
+    (LABEL_COLUMN, ROW ID) and the index is rebuilt instead of keeping duplicate master labels.
+    """
+    frames = [result.assign(**{LABEL_COLUMN: plan["label"]}) for result, plan in zip(results, plans) if not result.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _numeric(df, column):
+    if column not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+
+def aligned_aggregates(results, plans):
+    """
+    Per-side aggregates on shared axes. Sides over the same dates are aligned by calendar day;
+    sides over different periods ("agustus vs september") are aligned by day number within
+    their own period, so the daily volume lines can be overlaid.
+    """
+    labels = [plan["label"] for plan in plans]
+    sizes = np.array([len(result) for result in results], dtype=np.int64)
+    side = np.repeat(np.arange(len(results)), sizes)
+    columns = ['TANGGAL PUBLIKASI', 'SENTIMEN', 'ENGAGEMENTS', 'VIEWS']
+    combined = pd.concat([result.reindex(columns=columns) for result in results], ignore_index=True)
+
+    # Sentiment share: one bincount over (side, sentiment) pairs
+    sentiment_codes, sentiments = pd.factorize(combined['SENTIMEN'], sort=True)
+    valid = sentiment_codes >= 0
+    counts = np.bincount(side[valid] * len(sentiments) + sentiment_codes[valid],
+                         minlength=len(labels) * len(sentiments)).reshape(len(labels), len(sentiments))
+    sentiment_share = pd.DataFrame(counts / np.maximum(sizes, 1)[:, None], index=labels, columns=list(sentiments))
+
+    # Average engagement rate per side
+    engagements, views = _numeric(combined, 'ENGAGEMENTS'), _numeric(combined, 'VIEWS')
+    engagement_rate = np.divide(engagements, views, out=np.zeros(len(combined)), where=views > 0)
+    avg_engagement_rate = np.bincount(side, weights=engagement_rate, minlength=len(labels)) / np.maximum(sizes, 1)
+
+    # Daily volume on a shared day axis
+    publish_days = pd.to_datetime(combined['TANGGAL PUBLIKASI'], errors='coerce').dt.normalize()
+    same_period = len({tuple(plan["dates"]) for plan in plans}) == 1
+    if same_period:
+        starts = np.full(len(labels), publish_days.min(), dtype='datetime64[ns]')
+    else:
+        starts = np.array([
+            pd.to_datetime(plan["dates"][0]) if plan["dates"] else publish_days[side == i].min()
+            for i, plan in enumerate(plans)
+        ], dtype='datetime64[ns]')
+    if len(combined) and publish_days.notna().any():
+        offsets = ((publish_days.to_numpy() - starts[side]) // np.timedelta64(1, 'D'))
+        dated = publish_days.notna().to_numpy() & (offsets >= 0)
+        n_days = int(offsets[dated].max()) + 1 if dated.any() else 0
+        per_day = np.bincount(side[dated] * n_days + offsets[dated].astype(np.int64),
+                              minlength=len(labels) * n_days).reshape(len(labels), n_days)
+    else:
+        n_days, per_day = 0, np.zeros((len(labels), 0), dtype=np.int64)
+    if same_period and n_days:
+        day_axis = pd.date_range(pd.Timestamp(starts[0]), periods=n_days, freq='D').strftime('%Y-%m-%d')
+    else:
+        day_axis = [f"Hari {d + 1}" for d in range(n_days)]
+    daily_volume = pd.DataFrame(per_day.T, index=list(day_axis), columns=labels)
+
+    return {
+        "labels": labels,
+        "plans": plans,
+        "total_posts": dict(zip(labels, sizes.tolist())),
+        "sentiment_share": sentiment_share,
+        "avg_engagement_rate": dict(zip(labels, avg_engagement_rate.tolist())),
+        "daily_volume": daily_volume,
+        "aligned_by": "date" if same_period else "day_of_period",
+    }
+
+
+def comparison_context(aggregates):
+    """Compact JSON-ready summary for the LLM: one block per side plus differences to the first side."""
+    labels = aggregates["labels"]
+    share = aggregates["sentiment_share"]
+    volume = aggregates["daily_volume"]
+    sides = {}
+    for label, plan in zip(labels, aggregates["plans"]):
+        has_days = not volume.empty and volume[label].sum() > 0
+        sides[label] = {
+            "dates": plan["dates"],
+            "keywords": plan["fallback_keywords"],
+            "total_posts": aggregates["total_posts"][label],
+            "average_engagement_rate": round(aggregates["avg_engagement_rate"][label], 5),
+            "sentiment_share": {s: round(v, 3) for s, v in share.loc[label].items()},
+            "peak_day": volume[label].idxmax() if has_days else None,
+            "peak_count": int(volume[label].max()) if has_days else 0,
+        }
+
+    base = labels[0]
+    differences = {}
+    for label in labels[1:]:
+        differences[f"{label} vs {base}"] = {
+            "total_posts": sides[label]["total_posts"] - sides[base]["total_posts"],
+            "average_engagement_rate": round(sides[label]["average_engagement_rate"] - sides[base]["average_engagement_rate"], 5),
+            "sentiment_share_points": {
+                s: round((share.loc[label, s] - share.loc[base, s]) * 100, 1) for s in share.columns
+            },
+        }
+    return {"aligned_by": aggregates["aligned_by"], "sides": sides, "differences": differences}
@@ -1,8 +1,19 @@
 import streamlit as st
 import pandas as pd
 import math
+import os
+import time
 from datetime import datetime
 import history_service # <-- This import was already in the original code
+import metrics
+import comparison
+import entity_aliases
+import export
+import json
+import near_duplicates
+from urllib.parse import urlencode
+from keyword_matcher import build_matcher
+from ranking import SCORE_COLUMN
 
 # Di file components.py
 
@@ -252,7 +263,70 @@ def apply_chatinput_css():
     """, unsafe_allow_html=True)
 
 
-def display_raw_data_bubbles(df):
+# Interval (detik) antar frame saat streaming jawaban AI ke UI.
+# Token yang datang di antara dua frame digabung menjadi satu update websocket.
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL_MS", "75")) / 1000
+
+
+def render_streaming_response(placeholder, response_stream, flush_interval=None):
+    """
+    Streams an AI response into a placeholder, coalescing tokens into time-based frames.
+    Returns the full response text once the stream is exhausted.
+    """
+    if flush_interval is None:
+        flush_interval = STREAM_FLUSH_INTERVAL
+
+    # Incremental buffers: each chunk is converted to HTML once, never the whole string again
+    text_parts = []
+    html_parts = []
+    pending = False
+    last_flush = time.monotonic()
+
+    def flush():
+        placeholder.markdown(
+            f'<div class="chat-bubble chat-ai">{"".join(html_parts)}</div>',
+            unsafe_allow_html=True
+        )
+
+    for chunk in response_stream:
+        if not chunk:
+            continue
+        text_parts.append(chunk)
+        html_parts.append(chunk.replace("\n", "<br>"))
+        pending = True
+
+        now = time.monotonic()
+        if now - last_flush >= flush_interval:
+            flush()
+            pending = False
+            last_flush = now
+
+    # Final frame so the tail of the answer is never left unrendered
+    if pending or not html_parts:
+        flush()
+
+    return "".join(text_parts)
+
+
+def _escape_html(text):
+    return text.replace("<", "&lt;").replace(">", "&gt;")
+
+
+def highlight_keywords(text, matcher):
+    """Escapes text for the card HTML and wraps every keyword hit in <mark>."""
+    if matcher is None or matcher.highlight_pattern is None:
+        return _escape_html(text)
+    parts = []
+    last_end = 0
+    for m in matcher.highlight_pattern.finditer(text):
+        parts.append(_escape_html(text[last_end:m.start()]))
+        parts.append(f"<mark>{_escape_html(m.group(0))}</mark>")
+        last_end = m.end()
+    parts.append(_escape_html(text[last_end:]))
+    return "".join(parts)
+
+
+def display_raw_data_bubbles(df, search_query=None, collapse=False):
     if df.empty:
         st.info("Belum ada data untuk ditampilkan. Silakan lakukan pencarian terlebih dahulu.")
         return
@@ -262,7 +336,8 @@ def display_raw_data_bubbles(df):
         df['TANGGAL PUBLIKASI'] = pd.to_datetime(df['TANGGAL PUBLIKASI'], errors='coerce')
         df.dropna(subset=['TANGGAL PUBLIKASI'], inplace=True)
 
-    df_with_virality = df.copy()
+    # Reposts of one article (near-duplicate cluster) become a single card with summed metrics
+    df_with_virality = near_duplicates.collapse(df) if collapse else df.copy()
     if 'ENGAGEMENTS' in df_with_virality.columns and 'FOLLOWERS' in df_with_virality.columns:
         df_with_virality['VIRALITY RATE'] = df_with_virality.apply(
             lambda row: row['ENGAGEMENTS'] / row['FOLLOWERS'] if row['FOLLOWERS'] > 0 else 0, axis=1
@@ -286,6 +361,9 @@ def display_raw_data_bubbles(df):
         filtered_df = filtered_df[filtered_df['SENTIMEN'].isin(selected_sentiments)]
     if selected_topics:
         filtered_df = filtered_df[filtered_df['TOPIK'].isin(selected_topics)]
+    # Most relevant posts first when the search produced relevance scores
+    if SCORE_COLUMN in filtered_df.columns:
+        filtered_df = filtered_df.sort_values(by=SCORE_COLUMN, ascending=False, kind='stable')
 
     ITEMS_PER_PAGE = 20
     total_items = len(filtered_df)
@@ -316,19 +394,26 @@ def display_raw_data_bubbles(df):
     if paginated_df.empty:
         st.warning("No posts match the current filter criteria.")
 
+    # Keyword hits of the current search are highlighted in each card
+    matcher = build_matcher(*entity_aliases.expand_plan(
+        search_query.get("strict_groups", []), search_query.get("fallback_keywords", [])
+    )) if search_query else None
+
     for _, row in paginated_df.iterrows():
         sentiment = str(row.get('SENTIMEN', 'Neutral')).lower()
-        content = str(row.get('KONTEN', 'N/A')).replace("<", "&lt;").replace(">", "&gt;")
+        content = highlight_keywords(str(row.get('KONTEN', 'N/A')), matcher)
         
         date_val = row.get('TANGGAL PUBLIKASI', pd.NaT)
         date_str = date_val.strftime('%d %b %Y') if pd.notna(date_val) else "N/A"
+        copies = int(row.get(near_duplicates.DUPLICATES_COLUMN, 1))
+        copies_str = f" · :repeat: {copies - 1} repost" if copies > 1 else ""
 
         # GANTI BLOK KODE LAMA ANDA DENGAN YANG INI
         html_card = f"""
         <div class="sentiment-card {sentiment}-card">
             <div class="card-header">
                 <div class="card-author">:bust_in_silhouette: {row.get('AKUN', 'N/A')}</div>
-                <div class="card-date">:date: {date_str}</div>
+                <div class="card-date">:date: {date_str}{copies_str}</div>
             </div>
             <div class="card-content">{content}</div>
             <div class="card-metrics">
@@ -349,6 +434,43 @@ def display_raw_data_bubbles(df):
         """
         st.markdown(html_card, unsafe_allow_html=True)
 
+# Base URL of the API (uvicorn api:app); when set, exports are offered as streamed download links
+EXPORT_API_URL = os.getenv("EXPORT_API_URL", "").rstrip("/")
+
+
+def display_export_options(dataframe, matched_data, last_search=None, collapse=False):
+    """Download of all matched rows (not only the current page) as CSV, Parquet or XLSX."""
+    if matched_data.empty:
+        return
+    data = near_duplicates.collapse(matched_data) if collapse else matched_data
+    fmt_col, button_col = st.columns([2, 1])
+    fmt = fmt_col.radio("Format export", list(export.FORMATS), horizontal=True, label_visibility="collapsed")
+
+    # Deferred: the file is only encoded (chunk by chunk) when the button is clicked
+    frame, positions = export.result_source(dataframe, data)
+    button_col.download_button(
+        ":material/download: Export",
+        data=lambda: b"".join(export.stream_export(fmt, frame, positions)),
+        file_name=export.file_name("hasil_pencarian", fmt), mime=export.FORMATS[fmt][0],
+        on_click="ignore", use_container_width=True,
+        help="XLSX baru mulai diunduh setelah semua baris selesai ditulis; untuk hasil besar CSV atau Parquet lebih cepat."
+        if fmt == "xlsx" else None,
+    )
+
+    # The API streams the file to the browser instead of building it in this process
+    # A comparison has one plan per side, so it has no single API link
+    if EXPORT_API_URL and last_search and comparison.LABEL_COLUMN not in matched_data.columns:
+        plan = {
+            "strict_groups": last_search.get("strict_groups", []),
+            "fallback_keywords": last_search.get("fallback_keywords", []),
+            "dates": last_search.get("dates") or [],
+            "filters": last_search.get("filters") or {},
+            "collapse_duplicates": collapse,
+        }
+        query = urlencode({"format": fmt, "plan": json.dumps(plan)})
+        st.caption(f"[Unduh langsung dari API]({EXPORT_API_URL}/export?{query})")
+
+
 def display_header_logo():
     st.image("logo_ai.png", use_container_width=True)
     st.markdown("</div>", unsafe_allow_html=True)
@@ -364,7 +486,7 @@ def display_header_logo():
  
 from collections import defaultdict
 
-def display_history():
+def display_history(dataframe=None):
     history_list = history_service.load_chat_sessions()
 
     if not history_list:
@@ -448,15 +570,47 @@ def display_history():
                     key=f"load_{session_id}",
                     help="Load chat"
                 ):
-                    session_data = history_service.load_specific_session(session_id)
+                    session_data = history_service.load_specific_session(session_id, dataframe)
                     if session_data:
                         st.session_state.messages = session_data["messages"]
                         st.session_state.matched_data = session_data["matched_data"]
                         st.session_state.last_search = session_data["last_search"]
                         st.session_state.search_performed = session_data["search_performed"]
+                        st.session_state.comparison = None
                         st.rerun()
 
             with col2:
                 if st.button("🗑", key=f"delete_{session_id}", help="Delete chat"):
                     history_service.delete_chat_session(session_id)
                     st.rerun()
+
+
+def is_admin():
+    """Admin features are unlocked with ?admin=<ADMIN_TOKEN> when ADMIN_TOKEN is configured."""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    return bool(admin_token) and st.query_params.get("admin") == admin_token
+
+
+def display_performance_panel():
+    """Admin-only sidebar panel with latency percentiles for recent pipeline stages."""
+    if not is_admin():
+        return
+
+    with st.expander("⏱️ Performance (admin)", expanded=False):
+        current_gauges = metrics.gauges()
+        if current_gauges:
+            st.caption(" • ".join(f"{name}: {value}" for name, value in current_gauges.items()))
+
+        summary = metrics.percentiles()
+        if not summary:
+            st.caption("Belum ada data timing.")
+            return
+
+        table = pd.DataFrame.from_dict(summary, orient='index')
+        st.dataframe(table.round(1), use_container_width=True)
+
+        stream_spans = metrics.recent_spans("llm.stream")
+        rates = [s["attributes"].get("tokens_per_sec") for s in stream_spans]
+        rates = [r for r in rates if r]
+        if rates:
+            st.caption(f"LLM streaming: median {pd.Series(rates).median():.1f} tokens/s over {len(rates)} responses")
@@ -0,0 +1,114 @@
+# drilldown.py
+"""
+Drill-down filters for follow-up prompts ("yang negatif saja", "dari akun X", "engagement di atas 1000").
+
+The classifier returns them as a `filters` object next to the search plan:
+    {"SENTIMEN": ["Negatif"], "AKUN": ["detikcom"], "min": {"ENGAGEMENTS": 1000}, "max": {"FOLLOWERS": 50000}}
+They are applied locally as vectorized masks over the current result, so narrowing never needs
+a new keyword search or a bigger LLM prompt.
+
+Filters accumulate over follow-ups. An empty value removes a filter again ("tampilkan semua
+sentimen lagi" -> {"SENTIMEN": []}, a threshold -> {"min": {"ENGAGEMENTS": null}}).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Categorical columns matched case-insensitively against a list of values
+CATEGORY_FILTERS = ['SENTIMEN', 'TOPIK', 'GRUP', 'AKUN', 'SUMBER', 'LOKASI']
+# Numeric columns usable in "min" / "max" thresholds
+METRIC_FILTERS = ['ENGAGEMENTS', 'VIEWS', 'FOLLOWERS', 'LIKES', 'COMMENTS', 'SHARES', 'REACTIONS']
+
+
+def _fold(value):
+    # Accounts are often written with a leading "@"
+    return str(value).strip().lstrip("@").casefold()
+
+
+def normalize_filters(raw):
+    """
+    Keeps only known columns and well-formed values; returns {} for anything unusable.
+    An explicitly empty value is kept as a clear marker ([] for a column, None for a threshold).
+    """
+    if not isinstance(raw, dict):
+        return {}
+    filters = {}
+    for column in CATEGORY_FILTERS:
+        if column not in raw:
+            continue
+        values = raw[column]
+        if values is None or isinstance(values, str):
+            values = [values] if values else []
+        if isinstance(values, list):
+            filters[column] = [str(v).strip() for v in values if v is not None and str(v).strip()]
+    for bound in ("min", "max"):
+        thresholds = {}
+        raw_thresholds = raw.get(bound) if isinstance(raw.get(bound), dict) else {}
+        for column, value in raw_thresholds.items():
+            column = str(column).upper()
+            if column not in METRIC_FILTERS:
+                continue
+            if value is None or value == "":
+                thresholds[column] = None
+                continue
+            try:
+                thresholds[column] = float(value)
+            except (TypeError, ValueError):
+                continue
+        if thresholds:
+            filters[bound] = thresholds
+    return filters
+
+
+def merge_filters(current, new):
+    """
+    Drill-downs accumulate: a new value for a column replaces the old one, other columns stay,
+    and an empty value removes the column's filter.
+    """
+    merged = {k: (dict(v) if isinstance(v, dict) else list(v)) for k, v in (current or {}).items()}
+    for key, value in normalize_filters(new).items():
+        if key in ("min", "max"):
+            thresholds = merged.setdefault(key, {})
+            for column, threshold in value.items():
+                if threshold is None:
+                    thresholds.pop(column, None)
+                else:
+                    thresholds[column] = threshold
+            if not thresholds:
+                del merged[key]
+        elif value:
+            merged[key] = value
+        else:
+            merged.pop(key, None)
+    return merged
+
+
+def filter_mask(df, filters):
+    """Boolean array over the rows of df that satisfy every filter."""
+    mask = np.ones(len(df), dtype=bool)
+    for column in CATEGORY_FILTERS:
+        if filters.get(column) and column in df.columns:
+            wanted = {_fold(v) for v in filters[column]}
+            # Fold each distinct value once instead of every row
+            codes, uniques = pd.factorize(df[column])
+            allowed = np.array([_fold(u) in wanted for u in uniques] + [False])
+            mask &= allowed[codes]  # code -1 (missing) maps to the trailing False
+    for bound, compare in (("min", np.greater_equal), ("max", np.less_equal)):
+        for column, threshold in filters.get(bound, {}).items():
+            if threshold is not None and column in df.columns:
+                mask &= compare(pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64), threshold)
+    return mask
+
+
+def apply_filters(df, filters):
+    if df.empty or not filters:
+        return df
+    return df[filter_mask(df, filters)]
+
+
+def describe_filters(filters):
+    """Short human-readable summary, e.g. for the LLM context."""
+    parts = [f"{column} = {', '.join(filters[column])}" for column in CATEGORY_FILTERS if filters.get(column)]
+    parts += [f"{column} >= {value:g}" for column, value in filters.get("min", {}).items() if value is not None]
+    parts += [f"{column} <= {value:g}" for column, value in filters.get("max", {}).items() if value is not None]
+    return "; ".join(parts)
@@ -0,0 +1,84 @@
+# entity_aliases.py
+"""
+Entity alias table used to expand search plans locally and deterministically.
+
+The table (ENTITY_ALIASES_PATH, a CSV with `entity,alias` rows) is read once at import and
+compiled into a case-insensitive lookup. A keyword that equals an entity is expanded with each of
+its aliases: in strict groups the keyword is substituted, producing extra groups (OR), and in the
+fallback list the aliases are appended. Expansion is one level deep; aliases are not expanded again.
+"""
+
+import os
+import csv
+import logging
+from itertools import product
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ENTITY_ALIASES_PATH = os.getenv("ENTITY_ALIASES_PATH", "entity_aliases.csv")
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(term):
+    return " ".join(str(term).split()).casefold()
+
+
+class AliasTable:
+    def __init__(self, pairs=()):
+        self._aliases = {}  # normalized entity -> aliases in table order
+        for entity, alias in pairs:
+            if not _normalize(entity) or not _normalize(alias):
+                continue
+            aliases = self._aliases.setdefault(_normalize(entity), [])
+            if _normalize(alias) not in map(_normalize, aliases):
+                aliases.append(alias.strip())
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def expand_term(self, term):
+        """The term followed by its aliases."""
+        return [term] + self._aliases.get(_normalize(term), [])
+
+    def expand_plan(self, strict_groups, fallback_keywords):
+        """Returns (strict_groups, fallback_keywords) with every known entity expanded, without duplicates."""
+        groups, seen_groups = [], set()
+        for group in strict_groups:
+            for variant in product(*(self.expand_term(k) for k in group)):
+                key = tuple(sorted({_normalize(k) for k in variant}))
+                if key not in seen_groups:
+                    seen_groups.add(key)
+                    groups.append(list(variant))
+
+        keywords, seen_keywords = [], set()
+        for keyword in fallback_keywords:
+            for term in self.expand_term(keyword):
+                if _normalize(term) not in seen_keywords:
+                    seen_keywords.add(_normalize(term))
+                    keywords.append(term)
+        return groups, keywords
+
+
+def load_aliases(path=ENTITY_ALIASES_PATH):
+    """Reads an `entity,alias` CSV; a missing file yields an empty table."""
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = [(row.get("entity", ""), row.get("alias", "")) for row in csv.DictReader(f)]
+    except FileNotFoundError:
+        logger.warning("Entity alias table %s not found; searches run without alias expansion", path)
+        return AliasTable()
+    return AliasTable(rows)
+
+
+_table = load_aliases()
+
+
+def get_aliases():
+    return _table
+
+
+def expand_plan(strict_groups, fallback_keywords):
+    return _table.expand_plan(strict_groups, fallback_keywords)
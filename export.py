@@ -0,0 +1,241 @@
+# export.py
+"""
+Streaming export of search results as CSV, Parquet or XLSX.
+
+A result is exported by master row position (its ROW IDs): rows are taken from the master
+DataFrame EXPORT_CHUNK_ROWS at a time and encoded chunk by chunk, so memory stays flat whatever
+the result size and the first bytes can be sent before the file is complete. XLSX goes through a
+write-only openpyxl workbook (rows are spooled to its temporary sheet file), and the zip container
+is streamed out while it is being written. That container can only be written once every row is
+in the workbook, so an XLSX export sends its first byte after all rows are encoded; CSV and
+Parquet start with the first chunk. Parquet needs the optional pyarrow package.
+"""
+
+import io
+import os
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from columns import ROW_ID_COLUMN
+
+load_dotenv()
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+# format -> (MIME type, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+# Bookkeeping columns added by load_data / search that are not part of the exported data
+INTERNAL_COLUMNS = [ROW_ID_COLUMN, 'CLUSTER ID']
+
+_STREAM_END = object()
+_XLSX_FLUSH_BYTES = 64 * 1024
+# How often a blocked XLSX writer thread checks whether the download was abandoned
+_XLSX_PUT_POLL_SECONDS = 0.5
+
+
+class ExportError(Exception):
+    """Raised when an export cannot be produced (unknown format, missing optional dependency)."""
+
+
+def export_columns(dataframe):
+    return [c for c in dataframe.columns if c not in INTERNAL_COLUMNS]
+
+
+def result_source(master, result):
+    """
+    (frame, positions) to export a search result from: the master rows by ROW ID when the result
+    comes from the loaded dataset version and has no columns of its own (relevance score,
+    collapsed duplicates), otherwise the result frame itself.
+    """
+    same_dataset = master is not None and not result.empty and ROW_ID_COLUMN in result.columns \
+        and result.attrs.get("dataset_version") == master.attrs.get("dataset_version") \
+        and result.columns.isin(master.columns).all()
+    if same_dataset:
+        return master, result[ROW_ID_COLUMN].to_numpy(dtype=np.int64)
+    return result, np.arange(len(result))
+
+
+def _chunks(frame, positions, columns):
+    column_positions = frame.columns.get_indexer(columns)
+    for start in range(0, len(positions), EXPORT_CHUNK_ROWS):
+        yield frame.iloc[positions[start:start + EXPORT_CHUNK_ROWS], column_positions]
+
+
+# --- CSV ---
+def iter_csv(frame, positions, columns):
+    # UTF-8 BOM so Excel opens Indonesian text correctly
+    yield pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8-sig")
+    for chunk in _chunks(frame, positions, columns):
+        yield chunk.to_csv(index=False, header=False, date_format='%Y-%m-%d %H:%M:%S').encode("utf-8")
+
+
+# --- PARQUET ---
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that collects bytes until they are drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _normalize_for_arrow(chunk):
+    # Object columns can mix types between chunks; export them as text so the schema stays fixed
+    object_columns = [c for c in chunk.columns if chunk[c].dtype == object]
+    return chunk.astype({c: "string" for c in object_columns}) if object_columns else chunk
+
+
+def iter_parquet(frame, positions, columns):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # pyarrow is optional
+        raise ExportError("Export Parquet membutuhkan paket pyarrow.")
+
+    def generate():
+        schema = pa.Schema.from_pandas(_normalize_for_arrow(frame.iloc[:0][columns]), preserve_index=False)
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        for chunk in _chunks(frame, positions, columns):
+            # One row group per chunk
+            writer.write_table(pa.Table.from_pandas(_normalize_for_arrow(chunk), schema=schema, preserve_index=False))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    return generate()
+
+
+# --- XLSX ---
+class _ExportCancelled(Exception):
+    """Raised in the XLSX writer thread once the consumer of the stream has gone away."""
+
+
+def _put(out, item, cancelled):
+    """Queue put that gives up (raises _ExportCancelled) when the consumer stops reading."""
+    while True:
+        try:
+            out.put(item, timeout=_XLSX_PUT_POLL_SECONDS)
+            return
+        except queue.Full:
+            if cancelled.is_set():
+                raise _ExportCancelled()
+
+
+class _QueueWriter(io.RawIOBase):
+    """Non-seekable file object that hands its bytes to a queue in blocks of _XLSX_FLUSH_BYTES."""
+
+    def __init__(self, out, cancelled):
+        super().__init__()
+        self._out = out
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self._cancelled.is_set():
+            return len(data)  # Nobody reads anymore (e.g. ZipFile.__del__ closing the container)
+        self._buffer += data
+        if len(self._buffer) >= _XLSX_FLUSH_BYTES:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            chunk = bytes(self._buffer)
+            self._buffer.clear()
+            _put(self._out, chunk, self._cancelled)
+
+
+def iter_xlsx(frame, positions, columns):
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def generate():
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Data")
+        sheet.append(columns)
+        for chunk in _chunks(frame, positions, columns):
+            # Control characters are not allowed in XLSX cells
+            chunk = chunk.assign(**{
+                column: chunk[column].astype(str).str.replace(ILLEGAL_CHARACTERS_RE, "", regex=True)
+                .where(chunk[column].notna(), None)
+                for column in chunk.columns if chunk[column].dtype == object
+            })
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+                sheet.append(row)
+
+        # The zip container is written by workbook.save(); stream it from a helper thread
+        out = queue.Queue(maxsize=16)
+        # Set when the generator is closed early (client disconnected), so save() stops blocking
+        cancelled = threading.Event()
+
+        def save():
+            try:
+                writer = _QueueWriter(out, cancelled)
+                workbook.save(writer)
+                writer.flush()
+                _put(out, _STREAM_END, cancelled)
+            except _ExportCancelled:
+                pass
+            except BaseException as e:
+                try:
+                    _put(out, e, cancelled)
+                except _ExportCancelled:
+                    pass
+
+        threading.Thread(target=save, name="xlsx-export", daemon=True).start()
+        try:
+            while True:
+                item = out.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+    return generate()
+
+
+_WRITERS = {"csv": iter_csv, "parquet": iter_parquet, "xlsx": iter_xlsx}
+
+
+def stream_export(fmt, frame, positions, columns=None):
+    """
+    Byte chunks of the export. Unknown formats and missing dependencies raise ExportError here,
+    before any bytes are produced.
+    """
+    if fmt not in _WRITERS:
+        raise ExportError(f"Format export tidak dikenal: {fmt}. Pilihan: {', '.join(FORMATS)}.")
+    columns = columns or export_columns(frame)
+    return _WRITERS[fmt](frame, np.asarray(positions, dtype=np.int64), columns)
+
+
+def file_name(base, fmt):
+    return f"{base}.{FORMATS[fmt][1]}"
@@ -1,10 +1,14 @@
 # history_service.py
 
+import io
 import os
 import json
 import uuid
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from columns import LABEL_COLUMN, ROW_ID_COLUMN
+from ranking import SCORE_COLUMN
 
 # The directory where chat history files will be stored
 HISTORY_DIR = "chat_history"
@@ -36,12 +40,22 @@ def save_chat_session(session_state):
     # Convert the pandas DataFrame to a JSON string to store it
     data_json = matched_data.to_json(orient='split', date_format='iso') if not matched_data.empty else None
 
+    # Row IDs (+ dataset version) let the session be rebuilt from the loaded dataset without parsing data_json;
+    # comparison results also need their side labels, so they are rebuilt from data_json
+    has_row_ids = not matched_data.empty and ROW_ID_COLUMN in matched_data.columns \
+        and LABEL_COLUMN not in matched_data.columns
+    row_ids = matched_data[ROW_ID_COLUMN].astype(int).tolist() if has_row_ids else None
+    scores = matched_data[SCORE_COLUMN].tolist() if has_row_ids and SCORE_COLUMN in matched_data.columns else None
+
     session_data = {
         "id": session_id,
         "summary": summary,
         "timestamp": timestamp,
         "messages": messages,
         "data_json": data_json,
+        "row_ids": row_ids,
+        "relevance_scores": scores,
+        "dataset_version": matched_data.attrs.get("dataset_version"),
         "last_search": last_search
     }
     
@@ -77,8 +91,12 @@ def load_chat_sessions():
     sessions.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
     return sessions
 
-def load_specific_session(session_id):
-    """Loads the full state of a single chat session from its file."""
+def load_specific_session(session_id, dataframe=None):
+    """
+    Loads the full state of a single chat session from its file.
+    When the session was saved against the same dataset version as `dataframe`, the results are
+    taken from it by row ID instead of being re-parsed from data_json.
+    """
     setup_history()
     filepath = os.path.join(HISTORY_DIR, f"{session_id}.json")
     if not os.path.exists(filepath):
@@ -87,9 +105,17 @@ def load_specific_session(session_id):
     with open(filepath, 'r', encoding='utf-8') as f:
         session_data = json.load(f)
     
+    row_ids = session_data.get("row_ids")
+    same_dataset = dataframe is not None and not dataframe.empty \
+        and session_data.get("dataset_version") == dataframe.attrs.get("dataset_version")
+    if row_ids and same_dataset:
+        # ROW ID is the row's position in the master dataset
+        matched_data = dataframe.iloc[row_ids]
+        if session_data.get("relevance_scores") is not None:
+            matched_data = matched_data.assign(**{SCORE_COLUMN: session_data["relevance_scores"]})
     # Reconstruct the DataFrame from its JSON representation
-    if session_data.get("data_json"):
-        matched_data = pd.read_json(session_data["data_json"], orient='split')
+    elif session_data.get("data_json"):
+        matched_data = pd.read_json(io.StringIO(session_data["data_json"]), orient='split')
     else:
         matched_data = pd.DataFrame()
         
@@ -100,6 +126,30 @@ def load_specific_session(session_id):
         "search_performed": not matched_data.empty
     }
 
+def load_session_rows(session_id, dataframe=None):
+    """
+    (frame, positions) of a saved session's results for streaming export, without building the
+    result DataFrame: the master rows by row ID when the dataset version matches, otherwise the
+    rows parsed from data_json. None when the session does not exist.
+    """
+    setup_history()
+    filepath = os.path.join(HISTORY_DIR, f"{session_id}.json")
+    if not os.path.exists(filepath):
+        return None
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        session_data = json.load(f)
+
+    row_ids = session_data.get("row_ids")
+    same_dataset = dataframe is not None and not dataframe.empty \
+        and session_data.get("dataset_version") == dataframe.attrs.get("dataset_version")
+    if row_ids and same_dataset:
+        return dataframe, np.asarray(row_ids, dtype=np.int64)
+    if session_data.get("data_json"):
+        frame = pd.read_json(io.StringIO(session_data["data_json"]), orient='split')
+        return frame, np.arange(len(frame))
+    return pd.DataFrame(), np.empty(0, dtype=np.int64)
+
 def delete_chat_session(session_id):
     """Deletes a chat session file."""
     setup_history()
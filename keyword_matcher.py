@@ -0,0 +1,137 @@
+# keyword_matcher.py
+"""
+Multi-pattern keyword matcher used by search_data.
+
+All keywords of a query (strict AND groups + fallback OR list) are compiled once into an
+Aho–Corasick automaton over case-folded text, so each post is scanned a single time and the
+set of keywords it contains decides every group at once. Keywords are matched literally, never
+as regular expressions.
+
+pyahocorasick is used when installed. Otherwise an equivalent scanner is built on one compiled
+regex: a lookahead alternation of the escaped keywords (longest first) reports, at every text
+position, the longest keyword starting there; shorter keywords contained in a hit are implied
+through a precomputed containment closure, which yields the same hit sets as the automaton.
+"""
+
+import re
+
+import numpy as np
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional
+    ahocorasick = None
+
+
+# Joins posts into one scan buffer; keywords containing it are dropped
+_SEPARATOR = "\x00"
+
+
+def _normalize(keyword):
+    return str(keyword).replace(_SEPARATOR, "").strip().casefold()
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = sorted({_normalize(k) for k in keywords if _normalize(k)}, key=len, reverse=True)
+        self._index = {k: i for i, k in enumerate(self.keywords)}
+
+        if not self.keywords:
+            self._automaton = None
+            self._pattern = None
+        elif ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for i, keyword in enumerate(self.keywords):
+                self._automaton.add_word(keyword, i)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in self.keywords) + "))")
+            # implied[i]: every keyword that occurs inside keyword i (including itself)
+            self._implied = [
+                frozenset(j for j, other in enumerate(self.keywords) if other in keyword)
+                for keyword in self.keywords
+            ]
+            self._implied_matrix = np.zeros((len(self.keywords), len(self.keywords)), dtype=np.int32)
+            for i, implied in enumerate(self._implied):
+                self._implied_matrix[i, list(implied)] = 1
+
+        # Case-insensitive pattern on the original text, for highlighting display output
+        self.highlight_pattern = re.compile(
+            "|".join(re.escape(k) for k in self.keywords), re.IGNORECASE
+        ) if self.keywords else None
+
+    def hits(self, text):
+        """Returns the set of keyword indices (into self.keywords) that occur in text."""
+        if not self.keywords or not isinstance(text, str):
+            return frozenset()
+        folded = text.casefold()
+        if self._automaton is not None:
+            return frozenset(i for _, i in self._automaton.iter(folded))
+        found = set()
+        for m in self._pattern.finditer(folded):
+            found |= self._implied[self._index[m.group(1)]]
+        return frozenset(found)
+
+    def hit_keywords(self, text):
+        """Returns the keywords (case-folded) found in text, e.g. for highlighting."""
+        return sorted(self.keywords[i] for i in self.hits(text))
+
+    def _scan(self, folded):
+        """Yields (start offset, keyword index) for every keyword occurrence in folded text."""
+        if self._automaton is not None:
+            for end, i in self._automaton.iter(folded):
+                yield end - len(self.keywords[i]) + 1, i
+        else:
+            for m in self._pattern.finditer(folded):
+                yield m.start(), self._index[m.group(1)]
+
+    def hit_matrix(self, texts):
+        """
+        Scans all texts in one pass and returns a boolean matrix [row, keyword index].
+        The texts are joined with a separator no keyword contains, so the scan runs over a single
+        buffer and match offsets are mapped back to rows with searchsorted.
+        """
+        n = len(texts)
+        matrix = np.zeros((n, len(self.keywords)), dtype=bool)
+        if not self.keywords or n == 0:
+            return matrix
+
+        folded = [t.casefold() if isinstance(t, str) else "" for t in texts]
+        lengths = np.fromiter(map(len, folded), dtype=np.int64, count=n)
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(lengths[:-1] + 1, out=starts[1:])
+
+        found = np.fromiter(
+            (v for pair in self._scan(_SEPARATOR.join(folded)) for v in pair), dtype=np.int64
+        ).reshape(-1, 2)
+        if len(found):
+            rows = np.searchsorted(starts, found[:, 0], side="right") - 1
+            matrix[rows, found[:, 1]] = True
+            if self._automaton is None:
+                # Longest-match scanning only reports the outermost keyword; add contained ones
+                matrix = (matrix.astype(np.int32) @ self._implied_matrix) > 0
+        return matrix
+
+    def evaluate(self, texts, strict_groups, fallback_keywords):
+        """
+        Scans every text once and evaluates all groups together.
+        Returns (one boolean mask per strict group, fallback boolean mask).
+        Empty strict groups get an all-False mask.
+        """
+        matrix = self.hit_matrix(texts)
+        n = len(texts)
+
+        group_masks = []
+        for group in strict_groups:
+            ids = sorted({self._index[_normalize(k)] for k in group if _normalize(k)}) if group else []
+            group_masks.append(matrix[:, ids].all(axis=1) if ids else np.zeros(n, dtype=bool))
+
+        fallback_ids = sorted({self._index[_normalize(k)] for k in fallback_keywords if _normalize(k)})
+        fallback_mask = matrix[:, fallback_ids].any(axis=1) if fallback_ids else np.zeros(n, dtype=bool)
+        return group_masks, fallback_mask
+
+
+def build_matcher(strict_groups, fallback_keywords):
+    """One matcher covering every keyword of a search plan."""
+    return KeywordMatcher([k for group in strict_groups for k in group] + list(fallback_keywords))
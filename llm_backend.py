@@ -0,0 +1,213 @@
+# llm_backend.py
+
+import os
+import abc
+import json
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+
+import llm_client
+
+load_dotenv()
+
+# "openai" (default) or "stub" for offline benchmarking / load testing
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# When set, the OpenAI backend appends every response to this JSON Lines file so the stub can replay it
+LLM_RECORD_FIXTURES = os.getenv("LLM_RECORD_FIXTURES")
+LLM_STUB_FIXTURES = os.getenv("LLM_STUB_FIXTURES")
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+LLM_STUB_TOKENS_PER_SEC = float(os.getenv("LLM_STUB_TOKENS_PER_SEC", "60"))
+LLM_STUB_RESPONSE_TOKENS = int(os.getenv("LLM_STUB_RESPONSE_TOKENS", "150"))
+
+
+def _fixture_key(messages):
+    """Fixtures are keyed on the last user message, which holds the prompt(s) being answered."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content", "")
+    return ""
+
+
+def _load_fixtures(path):
+    """
+    Reads a fixture file: either one JSON document {"classify": {...}, "chat": {...}} or the
+    JSON Lines written by recording (one {"operation", "key", "content"} per line; later lines win).
+    """
+    fixtures = {"classify": {}, "chat": {}}
+    if not path or not os.path.exists(path):
+        return fixtures
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        document = json.loads(text) if text.strip() else {}
+    except json.JSONDecodeError:
+        document = None
+    if isinstance(document, dict):
+        return {"classify": document.get("classify", {}), "chat": document.get("chat", {})}
+    for line in text.splitlines():
+        if line.strip():
+            record = json.loads(line)
+            fixtures[record["operation"]][record["key"]] = record["content"]
+    return fixtures
+
+
+class LLMBackend(abc.ABC):
+    """Interface for the two LLM operations used by the dashboard."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def classify(self, messages):
+        """Runs a JSON-mode completion and returns the raw JSON string."""
+
+    @abc.abstractmethod
+    def stream_chat(self, messages):
+        """Yields the answer text chunk by chunk."""
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self, model=LLM_MODEL, record_path=LLM_RECORD_FIXTURES):
+        self.model = model
+        self.record_path = record_path
+        self._record_lock = threading.Lock()
+
+    def _record(self, operation, messages, content):
+        if not self.record_path:
+            return
+        # One appended line per response, so recording stays O(1) per call however large the file gets
+        line = json.dumps({"operation": operation, "key": _fixture_key(messages), "content": content}, ensure_ascii=False)
+        with self._record_lock:
+            with open(self.record_path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    def classify(self, messages):
+        response = llm_client.get_client().create_chat_completion(
+            model=self.model, messages=messages,
+            temperature=0.0, response_format={"type": "json_object"}
+        )
+        content = response.choices[0].message.content
+        self._record("classify", messages, content)
+        return content
+
+    def stream_chat(self, messages):
+        chunks = []
+        for chunk in llm_client.get_client().stream_chat_completion(model=self.model, messages=messages):
+            chunks.append(chunk)
+            yield chunk
+        self._record("chat", messages, "".join(chunks))
+
+
+# Month names the stub recognises when no fixture matches a classification request
+_MONTHS = {
+    "januari": 1, "februari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6, "juli": 7,
+    "agustus": 8, "september": 9, "oktober": 10, "november": 11, "desember": 12,
+}
+_STOPWORDS = {
+    "data", "tentang", "soal", "bulan", "tanggal", "dong", "coba", "cari", "seluruh", "full",
+    "analisis", "bagaimana", "dengan", "yang", "dan", "di", "ke", "dari", "untuk", "nya",
+    "saja", "aja", "hanya", "cuma", "post", "berita", "bandingkan", "perbandingan",
+    "tampilkan", "semua", "lagi", "sentimen",
+}
+# Sentiment words become a drill-down filter instead of a keyword
+_SENTIMENTS = {"negatif": "Negatif", "positif": "Positif", "netral": "Netral"}
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend. Replays recorded fixtures when available; otherwise derives
+    a plausible classification from the prompt and streams synthetic text at a fixed token rate.
+    """
+
+    name = "stub"
+
+    def __init__(self, fixtures_path=LLM_STUB_FIXTURES, latency_ms=LLM_STUB_LATENCY_MS,
+                 tokens_per_sec=LLM_STUB_TOKENS_PER_SEC, response_tokens=LLM_STUB_RESPONSE_TOKENS):
+        self.fixtures = _load_fixtures(fixtures_path)
+        self.latency = latency_ms / 1000
+        self.token_interval = 1 / tokens_per_sec if tokens_per_sec > 0 else 0
+        self.response_tokens = response_tokens
+
+    @staticmethod
+    def _parse_plan(text):
+        words = re.findall(r"[a-z0-9]+", text)
+        months = [_MONTHS[w] for w in words if w in _MONTHS]
+        sentiments = [_SENTIMENTS[w] for w in words if w in _SENTIMENTS]
+        # "semua sentimen" lifts the sentiment filter again
+        clear_sentiment = "semua" in words and "sentimen" in words
+        keywords = [w for w in words if w not in _MONTHS and w not in _STOPWORDS and w not in _SENTIMENTS
+                    and not w.isdigit()]
+
+        dates = []
+        if months:
+            # Month-only prompts cover the whole month, mirroring rule 9 of the real classifier
+            start = date(2025, months[0], 1)
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            dates = [start.isoformat(), end.isoformat()]
+
+        keyword = " ".join(keywords)
+        return {
+            "dates": dates,
+            "strict_groups": [[keyword]] if keyword else [],
+            "fallback_keywords": keywords,
+            "filters": {"SENTIMEN": sentiments} if sentiments or clear_sentiment else {},
+        }
+
+    def _classify_heuristic(self, key):
+        current = key.split("Current Prompt:")[-1].strip().strip('"').lower()
+        sides = re.split(r"\s+(?:vs\.?|versus)\s+", current)
+        if len(sides) > 1:
+            plans = [self._parse_plan(side) for side in sides]
+            for plan, side in zip(plans, sides):
+                plan["label"] = " ".join(plan["fallback_keywords"]) or \
+                    " ".join(w for w in re.findall(r"[a-z0-9]+", side) if w not in _STOPWORDS)
+            return json.dumps({
+                "type": "Comparison",
+                "dates": next((plan["dates"] for plan in plans if plan["dates"]), []),
+                "strict_groups": [],
+                "fallback_keywords": [],
+                "comparisons": plans,
+            })
+
+        plan = self._parse_plan(current)
+        return json.dumps({"type": "New Topic" if plan["fallback_keywords"] else "Follow-Up", **plan})
+
+    def classify(self, messages):
+        time.sleep(self.latency)
+        key = _fixture_key(messages)
+        if key in self.fixtures["classify"]:
+            return self.fixtures["classify"][key]
+        return self._classify_heuristic(key)
+
+    def stream_chat(self, messages):
+        key = _fixture_key(messages)
+        text = self.fixtures["chat"].get(key)
+        if text is None:
+            text = " ".join(f"token{i}" for i in range(self.response_tokens))
+        tokens = re.findall(r"\S+\s*", text)
+
+        time.sleep(self.latency)
+        for token in tokens:
+            yield token
+            if self.token_interval:
+                time.sleep(self.token_interval)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the process-wide backend selected by the LLM_BACKEND environment variable."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = StubBackend() if LLM_BACKEND == "stub" else OpenAIBackend()
+    return _backend
@@ -0,0 +1,216 @@
+# llm_client.py
+
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- CONFIGURATION (overridable through .env) ---
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # Point to a local stub server for testing
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "20"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("OPENAI_CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("OPENAI_CIRCUIT_RESET_SECONDS", "30"))
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM service cannot be reached (circuit open, busy, or retries exhausted)."""
+
+
+class CircuitBreaker:
+    """
+    Minimal closed/open/half-open circuit breaker.
+    After `failure_threshold` consecutive failures, calls are rejected for `reset_seconds`,
+    then a single trial call is let through.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Ends a trial call without a verdict (unexpected error), so the next call can retry."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True  # APITimeoutError is a subclass of APIConnectionError
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+def _retry_after(error):
+    """Returns the server-requested delay (seconds) from a Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """
+    Shared OpenAI client with a pooled HTTP transport, per-call timeouts, bounded concurrency,
+    jittered exponential-backoff retries on 429/5xx/connection errors, and a circuit breaker.
+    """
+
+    def __init__(self, api_key, base_url=OPENAI_BASE_URL, timeout=OPENAI_TIMEOUT,
+                 max_retries=OPENAI_MAX_RETRIES, max_concurrency=OPENAI_MAX_CONCURRENCY,
+                 pool_size=OPENAI_POOL_SIZE, breaker=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(timeout, connect=OPENAI_CONNECT_TIMEOUT),
+        )
+        # Retries are handled here (with jitter and the breaker), so the SDK's own retries are disabled
+        self._client = openai.OpenAI(
+            api_key=api_key, base_url=base_url, max_retries=0, http_client=self._http_client
+        )
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = breaker or CircuitBreaker()
+
+    def _acquire_slot(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise LLMUnavailableError("Layanan AI sedang sibuk. Silakan coba beberapa saat lagi.")
+
+    def _backoff(self, attempt, error):
+        delay = _retry_after(error)
+        if delay is None:
+            # Full jitter: spreads retries from concurrent sessions instead of synchronising them
+            delay = random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * (2 ** attempt)))
+        time.sleep(min(delay, OPENAI_BACKOFF_MAX))
+
+    def _call_with_retries(self, request):
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise LLMUnavailableError("Layanan AI sementara tidak tersedia. Silakan coba beberapa saat lagi.")
+            try:
+                result = request()
+            except openai.APIError as e:
+                if not _is_retryable(e):
+                    # The service answered (e.g. a 400): it is up, only this request was rejected
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                last_error = e
+                if attempt < self.max_retries:
+                    self._backoff(attempt, e)
+                continue
+            except BaseException:
+                # Never leave a half-open trial unsettled, or every later call would be rejected
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return result
+        raise LLMUnavailableError(f"Layanan AI tidak merespons setelah {self.max_retries + 1} percobaan.") from last_error
+
+    def create_chat_completion(self, timeout=None, **kwargs):
+        """Runs a non-streaming chat completion and returns the SDK response object."""
+        timeout = timeout or self.timeout
+        self._acquire_slot(timeout)
+        try:
+            return self._call_with_retries(
+                lambda: self._client.chat.completions.create(timeout=timeout, **kwargs)
+            )
+        finally:
+            self._slots.release()
+
+    def stream_chat_completion(self, timeout=None, **kwargs):
+        """
+        Runs a streaming chat completion and yields the text deltas.
+        Retries only happen before the first chunk arrives, so partial answers are never duplicated.
+        """
+        timeout = timeout or self.timeout
+        self._acquire_slot(timeout)
+        try:
+            stream = self._call_with_retries(
+                lambda: self._client.chat.completions.create(stream=True, timeout=timeout, **kwargs)
+            )
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except openai.APIError:
+                self.breaker.record_failure()
+                raise
+            finally:
+                stream.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._http_client.close()
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide LLMClient, creating it on first use. Shared by all Streamlit sessions."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise LLMUnavailableError("OpenAI API key not found. Please create a .env file with your key.")
+                _shared_client = LLMClient(api_key)
+    return _shared_client
@@ -0,0 +1,125 @@
+# metrics.py
+
+import os
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of recent spans kept in memory for the performance panel
+METRICS_BUFFER_SIZE = int(os.getenv("METRICS_BUFFER_SIZE", "5000"))
+# Optional JSONL file receiving every span (OpenTelemetry-style records)
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+
+_spans = deque(maxlen=METRICS_BUFFER_SIZE)
+_spans_lock = threading.Lock()
+_gauges = {}
+_export_lock = threading.Lock()
+
+
+def _export(record):
+    if not METRICS_EXPORT_PATH:
+        return
+    line = json.dumps(record, default=str)
+    with _export_lock:
+        with open(METRICS_EXPORT_PATH, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+def record(name, duration_ms, start_time=None, **attributes):
+    """Stores one finished span in the ring buffer (and the exporter, if configured)."""
+    end_time = time.time()
+    start_time = start_time if start_time is not None else end_time - duration_ms / 1000
+    span_record = {
+        "name": name,
+        "start_time_unix_nano": int(start_time * 1e9),
+        "end_time_unix_nano": int(end_time * 1e9),
+        "duration_ms": duration_ms,
+        "attributes": attributes,
+    }
+    with _spans_lock:
+        _spans.append(span_record)
+    _export(span_record)
+
+
+def set_gauge(name, value):
+    """Stores the latest value of a point-in-time measurement (e.g. queue depth)."""
+    with _spans_lock:
+        _gauges[name] = value
+
+
+def gauges():
+    with _spans_lock:
+        return dict(sorted(_gauges.items()))
+
+
+@contextmanager
+def span(name, **attributes):
+    """Times the enclosed block and records it under `name`."""
+    start_time = time.time()
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record(name, (time.perf_counter() - start) * 1000, start_time=start_time, **attributes)
+
+
+def timed(name):
+    """Decorator form of span() for pipeline functions."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_stream(stream, name):
+    """
+    Wraps a token generator, recording time to first token, total duration and tokens/s
+    once the stream finishes (or is abandoned).
+    """
+    start_time = time.time()
+    start = time.perf_counter()
+    first_token_at = None
+    tokens = 0
+    try:
+        for chunk in stream:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                record(f"{name}.first_token", (first_token_at - start) * 1000, start_time=start_time)
+            tokens += 1
+            yield chunk
+    finally:
+        end = time.perf_counter()
+        streaming_seconds = end - first_token_at if first_token_at is not None else 0
+        record(
+            name, (end - start) * 1000, start_time=start_time, tokens=tokens,
+            tokens_per_sec=round(tokens / streaming_seconds, 2) if streaming_seconds > 0 else None
+        )
+
+
+def recent_spans(name=None):
+    with _spans_lock:
+        spans = list(_spans)
+    return [s for s in spans if name is None or s["name"] == name]
+
+
+def percentiles(quantiles=(50, 95, 99)):
+    """Summarises the ring buffer as {span name: {count, p50, p95, p99}} in milliseconds."""
+    grouped = {}
+    for s in recent_spans():
+        grouped.setdefault(s["name"], []).append(s["duration_ms"])
+    summary = {}
+    for name, durations in sorted(grouped.items()):
+        values = np.percentile(durations, quantiles)
+        summary[name] = {"count": len(durations), **{f"p{q}": float(v) for q, v in zip(quantiles, values)}}
+    return summary
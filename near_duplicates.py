@@ -0,0 +1,221 @@
+# near_duplicates.py
+"""
+Optional near-duplicate clustering of KONTEN (enabled with NEAR_DUPLICATES=1), so syndicated
+copies of one article count once.
+
+At ingestion (load_data) every post gets a MinHash signature (DEDUP_NUM_PERM values) of its
+word 3-shingles. Locality-sensitive hashing over DEDUP_BANDS bands of the signature yields the
+candidate pairs; a pair is linked when its estimated Jaccard similarity is at least
+DEDUP_MIN_JACCARD, and the connected groups become clusters. CLUSTER_ID_COLUMN holds the ROW ID
+of the cluster's first post (a post without copies is its own cluster).
+
+Signatures are computed once per distinct text and kept on disk (DEDUP_INDEX_DIR) by content
+hash, so a reloaded dataset only hashes new texts.
+
+collapse() folds the clusters of a result into one representative row (the first one in result
+order) with summed engagement metrics and the number of copies in DUPLICATES_COLUMN. In a
+comparison result the sides are collapsed separately.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from columns import LABEL_COLUMN
+from search_index import tokenize
+
+load_dotenv()
+
+# Opt-in like SEMANTIC_SEARCH: ingestion then writes the signatures to DEDUP_INDEX_DIR
+NEAR_DUPLICATES = os.getenv("NEAR_DUPLICATES", "0") == "1"
+DEDUP_INDEX_DIR = os.getenv("DEDUP_INDEX_DIR", "dedup_index")
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))  # DEDUP_NUM_PERM / DEDUP_BANDS values per band
+DEDUP_MIN_JACCARD = float(os.getenv("DEDUP_MIN_JACCARD", "0.6"))
+# Band buckets larger than this are only compared with their nearest DEDUP_MAX_BUCKET neighbours
+DEDUP_MAX_BUCKET = int(os.getenv("DEDUP_MAX_BUCKET", "64"))
+DEDUP_BATCH_ROWS = int(os.getenv("DEDUP_BATCH_ROWS", "100000"))
+
+CLUSTER_ID_COLUMN = 'CLUSTER ID'
+DUPLICATES_COLUMN = 'DUPLICATES'
+# Metrics summed over the copies of a post when a cluster is collapsed (FOLLOWERS is a property of the account)
+SUMMED_METRICS = ['ENGAGEMENTS', 'VIEWS', 'LIKES', 'COMMENTS', 'SHARES', 'REACTIONS']
+
+_SHINGLE = 3
+_EMPTY = np.iinfo(np.uint32).max  # Signature value of texts without words
+# Fixed random hash functions h_i(x) = high 32 bits of (a_i * x + b_i) mod 2^64
+_rng = np.random.default_rng(20250801)
+_PERM_A = _rng.integers(1, 2 ** 63, size=DEDUP_NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_lock = threading.Lock()
+
+
+# --- MINHASH ---
+def _shingle_hashes(texts):
+    """(row position, uint64 hash) of the word 3-shingles of each text; short texts use their words."""
+    words = tokenize(texts)
+    if words.empty:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    rows = words.index.to_numpy()
+    values = words.to_numpy(dtype=object)
+    n = len(values)
+    same_row = np.zeros(n, dtype=bool)
+    if n >= _SHINGLE:
+        # Words of a text are consecutive, so equal rows two apart mean all three are from one text
+        same_row[:n - _SHINGLE + 1] = rows[:n - _SHINGLE + 1] == rows[_SHINGLE - 1:]
+    starts = np.flatnonzero(same_row)
+    shingles = values[starts]
+    for k in range(1, _SHINGLE):
+        shingles = shingles + " " + values[starts + k]
+    shingle_rows = rows[starts]
+
+    # Texts with fewer than three words fall back to their single words
+    lengths = np.bincount(rows, minlength=int(rows.max()) + 1)
+    short = lengths[rows] < _SHINGLE
+    all_rows = np.concatenate([shingle_rows, rows[short]])
+    all_values = np.concatenate([shingles, values[short]]) if short.any() else shingles
+    return all_rows, pd.util.hash_array(all_values.astype(object))
+
+
+def minhash(texts):
+    """MinHash signature [len(texts), DEDUP_NUM_PERM] (uint32); all _EMPTY for texts without words."""
+    n = len(texts)
+    signatures = np.full((n, DEDUP_NUM_PERM), _EMPTY, dtype=np.uint32)
+    rows, hashes = _shingle_hashes(texts)
+    if len(rows) == 0:
+        return signatures
+    order = np.argsort(rows, kind="stable")
+    rows, hashes = rows[order], hashes[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    for i in range(DEDUP_NUM_PERM):
+        permuted = ((hashes * _PERM_A[i] + _PERM_B[i]) >> np.uint64(32)).astype(np.uint32)
+        signatures[rows[starts], i] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+# --- STORAGE ---
+def _content_hashes(dataframe):
+    return pd.util.hash_pandas_object(dataframe['KONTEN'].fillna("").astype(str), index=False).to_numpy()
+
+
+def _store_path(path):
+    return os.path.join(path, "minhash.npz")
+
+
+def _load_store(path):
+    empty = np.empty(0, dtype=np.uint64), np.empty((0, DEDUP_NUM_PERM), dtype=np.uint32)
+    if not os.path.exists(_store_path(path)):
+        return empty
+    with np.load(_store_path(path)) as store:
+        if store["signatures"].shape[1] != DEDUP_NUM_PERM:
+            return empty
+        return store["content_hashes"], store["signatures"]
+
+
+def _save_store(path, content_hashes, signatures):
+    os.makedirs(path, exist_ok=True)
+    tmp_path = _store_path(path) + ".tmp.npz"
+    np.savez(tmp_path, content_hashes=content_hashes, signatures=signatures)
+    os.replace(tmp_path, _store_path(path))
+
+
+def compute_signatures(dataframe, path=DEDUP_INDEX_DIR):
+    """MinHash signature per row, hashing only distinct texts that are not stored yet."""
+    content = _content_hashes(dataframe)
+    unique_hashes, first_rows, inverse = np.unique(content, return_index=True, return_inverse=True)
+    with _lock:
+        stored_hashes, stored_signatures = _load_store(path)
+        slots = np.minimum(np.searchsorted(stored_hashes, unique_hashes), max(len(stored_hashes) - 1, 0))
+        known = stored_hashes[slots] == unique_hashes if len(stored_hashes) else np.zeros(len(unique_hashes), dtype=bool)
+
+        unique_signatures = np.empty((len(unique_hashes), DEDUP_NUM_PERM), dtype=np.uint32)
+        unique_signatures[known] = stored_signatures[slots[known]]
+        missing = np.flatnonzero(~known)
+        texts = dataframe['KONTEN'].to_numpy()
+        for start in range(0, len(missing), DEDUP_BATCH_ROWS):
+            batch = missing[start:start + DEDUP_BATCH_ROWS]
+            unique_signatures[batch] = minhash(texts[first_rows[batch]])
+        if len(missing):
+            _save_store(path, unique_hashes, unique_signatures)
+    return unique_signatures[inverse.ravel()]
+
+
+# --- CLUSTERING ---
+def _candidate_pairs(signatures):
+    """Row pairs whose signatures are identical on at least one band."""
+    pairs = []
+    for band in np.array_split(np.arange(DEDUP_NUM_PERM), DEDUP_BANDS):
+        keys = pd.util.hash_pandas_object(pd.DataFrame(signatures[:, band]), index=False).to_numpy()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        for offset in range(1, DEDUP_MAX_BUCKET + 1):
+            same = np.flatnonzero(sorted_keys[offset:] == sorted_keys[:-offset])
+            if len(same) == 0:
+                break  # Keys are sorted: no equal pair at this distance means none further apart
+            pairs.append(np.stack([order[same], order[same + offset]]))
+    if not pairs:
+        return np.empty((2, 0), dtype=np.int64)
+    return np.unique(np.sort(np.concatenate(pairs, axis=1), axis=0), axis=1)
+
+
+def _connected_components(n, left, right):
+    """Smallest member per component, by min-label propagation with pointer jumping."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        labels = labels[labels]
+        if (labels[left] == labels[right]).all():
+            return labels[labels]
+
+
+def cluster_ids(signatures):
+    """Cluster label per row (position of the cluster's first row); rows without text are singletons."""
+    n = len(signatures)
+    has_text = np.flatnonzero(signatures[:, 0] != _EMPTY)
+    with_text = signatures[has_text]
+    left, right = _candidate_pairs(with_text)
+    similarity = (with_text[left] == with_text[right]).mean(axis=1) if len(left) else np.empty(0)
+    close = similarity >= DEDUP_MIN_JACCARD
+    labels = np.arange(n)
+    if close.any():
+        labels[has_text] = has_text[_connected_components(len(has_text), left[close], right[close])]
+    return labels
+
+
+def ensure_clusters(dataframe, path=DEDUP_INDEX_DIR):
+    """Ingestion hook: adds CLUSTER_ID_COLUMN (in ROW ID terms, i.e. master positions)."""
+    if dataframe.empty or 'KONTEN' not in dataframe.columns:
+        return dataframe
+    dataframe[CLUSTER_ID_COLUMN] = cluster_ids(compute_signatures(dataframe, path))
+    return dataframe
+
+
+def collapse(df):
+    """
+    One row per cluster: the cluster's first row in df's order, with SUMMED_METRICS summed over
+    the cluster's rows in df and DUPLICATES_COLUMN set to their number. When df carries
+    LABEL_COLUMN (a comparison), clusters are per (side, cluster), so sides are never merged.
+    """
+    if df.empty or CLUSTER_ID_COLUMN not in df.columns or DUPLICATES_COLUMN in df.columns:
+        return df
+    keys, clusters = pd.factorize(df[CLUSTER_ID_COLUMN])
+    if LABEL_COLUMN in df.columns:
+        sides, _ = pd.factorize(df[LABEL_COLUMN])
+        keys = sides.astype(np.int64) * len(clusters) + keys
+    codes, _ = pd.factorize(keys)  # numbered in order of first appearance
+    counts = np.bincount(codes)
+    first = np.unique(codes, return_index=True)[1]
+    collapsed = df.iloc[first].copy()
+    collapsed[DUPLICATES_COLUMN] = counts
+    if len(first) < len(df):
+        for column in SUMMED_METRICS:
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+                sums = np.bincount(codes, weights=values)
+                collapsed[column] = sums.astype(df[column].dtype) if df[column].dtype.kind in "iuf" else sums
+    return collapsed
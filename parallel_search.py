@@ -0,0 +1,202 @@
+# parallel_search.py
+"""
+Process-pool keyword matching over a shared-memory copy of the KONTEN column.
+
+The master dataset's KONTEN text is encoded once into shared memory (UTF-8 bytes + row offsets),
+so worker processes can scan any subset of rows without the DataFrame being pickled per query.
+search_data() switches to this path for large date windows; results are identical to the serial
+path because workers evaluate the rows with the same KeywordMatcher.
+
+This module must stay importable without Streamlit: worker processes are spawned and import it.
+"""
+
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from keyword_matcher import build_matcher
+
+PARALLEL_SEARCH_PROCESSES = int(os.getenv("PARALLEL_SEARCH_PROCESSES", str(os.cpu_count() or 1)))
+# Below this many date-filtered rows, process start-up and IPC cost more than they save
+PARALLEL_SEARCH_MIN_ROWS = int(os.getenv("PARALLEL_SEARCH_MIN_ROWS", "200000"))
+CHUNKS_PER_PROCESS = 4
+
+_executor = None
+_buffers = {}  # dataset key -> [SharedTextBuffer, queries using it]
+_current_key = None
+_lock = threading.Lock()
+
+
+class SharedTextBuffer:
+    """KONTEN of one DataFrame, stored as UTF-8 bytes plus offsets in shared memory."""
+
+    def __init__(self, texts):
+        encoded = [t.encode("utf-8") if isinstance(t, str) else b"" for t in texts]
+        valid = np.fromiter((isinstance(t, str) for t in texts), dtype=np.uint8, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        self.n_rows = len(encoded)
+        self.text = self._share(b"".join(encoded) or b"\0")
+        self.offsets = self._share(offsets.tobytes())
+        self.valid = self._share(valid.tobytes() or b"\0")
+
+    @staticmethod
+    def _share(data):
+        shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+        return shm
+
+    def names(self):
+        return self.text.name, self.offsets.name, self.valid.name, self.n_rows
+
+    def close(self):
+        for shm in (self.text, self.offsets, self.valid):
+            shm.close()
+            shm.unlink()
+
+
+# --- WORKER SIDE ---
+_attached = {}
+
+
+def _attach(names):
+    """Attaches (once per worker process) to the shared buffers of a dataset."""
+    if names not in _attached:
+        text_name, offsets_name, valid_name, n_rows = names
+        blocks = []
+        for name in (text_name, offsets_name, valid_name):
+            # Spawned workers share the parent's resource tracker, and the parent unlinks the blocks
+            blocks.append(shared_memory.SharedMemory(name=name))
+        offsets = np.ndarray((n_rows + 1,), dtype=np.int64, buffer=blocks[1].buf)
+        valid = np.ndarray((n_rows,), dtype=np.uint8, buffer=blocks[2].buf)
+        _attached.clear()  # Only the current dataset is ever needed
+        _attached[names] = (blocks, blocks[0].buf, offsets, valid)
+    return _attached[names]
+
+
+def _match_chunk(names, positions, strict_groups, fallback_keywords):
+    """Evaluates one chunk of rows; returns (indices into `positions` per strict group, fallback indices)."""
+    _, text, offsets, valid = _attach(names)
+    texts = [
+        bytes(text[offsets[pos]:offsets[pos + 1]]).decode("utf-8") if valid[pos] else None
+        for pos in positions
+    ]
+    group_masks, fallback_mask = build_matcher(strict_groups, fallback_keywords).evaluate(
+        texts, strict_groups, fallback_keywords
+    )
+    return [np.flatnonzero(mask) for mask in group_masks], np.flatnonzero(fallback_mask)
+
+
+# --- PARENT SIDE ---
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # "spawn" avoids forking the multi-threaded Streamlit server
+        _executor = ProcessPoolExecutor(
+            max_workers=PARALLEL_SEARCH_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def _acquire(master_df):
+    """
+    (key, buffer names, executor) for master_df, building its shared buffer when the dataset
+    changes. The buffer counts as in use until _release(key), so a newer dataset version never
+    unlinks it under a query whose worker processes have not attached yet.
+    """
+    global _current_key
+    # load_data() stamps a dataset version; Streamlit's cache hands out a fresh copy per rerun,
+    # so object identity alone would rebuild the buffer on every query
+    key = (master_df.attrs.get("dataset_version", id(master_df)), len(master_df))
+    with _lock:
+        if key not in _buffers:
+            _buffers[key] = [SharedTextBuffer(master_df['KONTEN'].tolist()), 0]
+        if key != _current_key:
+            previous, _current_key = _current_key, key
+            _close_unused_locked(previous)
+        _buffers[key][1] += 1
+        return key, _buffers[key][0].names(), _get_executor()
+
+
+def _release(key):
+    with _lock:
+        _buffers[key][1] -= 1
+        _close_unused_locked(key)
+
+
+def _close_unused_locked(key):
+    """Unlinks the buffer of an outdated dataset version once no query uses it anymore."""
+    entry = _buffers.get(key)
+    if entry is not None and entry[1] == 0 and key != _current_key:
+        entry[0].close()
+        del _buffers[key]
+
+
+def is_applicable(positions):
+    return PARALLEL_SEARCH_PROCESSES > 1 and len(positions) >= PARALLEL_SEARCH_MIN_ROWS
+
+
+def _warm_worker(names):
+    _attach(names)
+
+
+def prepare(master_df):
+    """Builds the shared buffer and starts the worker processes ahead of the first query."""
+    key, names, executor = _acquire(master_df)
+    futures = []
+    try:
+        # One job per process: each spawns, imports this module and attaches to the buffer
+        futures = [executor.submit(_warm_worker, names) for _ in range(PARALLEL_SEARCH_PROCESSES)]
+        for future in futures:
+            future.result()
+    finally:
+        wait(futures)
+        _release(key)
+
+
+def match_groups(master_df, master_positions, strict_groups, fallback_keywords):
+    """
+    Evaluates the strict groups (AND) and fallback keywords (OR) over the given master rows
+    in parallel. Returns (one array per strict group, fallback array) of ascending offsets into
+    master_positions, exactly as the serial matcher selects them.
+    """
+    key, names, executor = _acquire(master_df)
+    futures = []
+    try:
+        n_chunks = max(PARALLEL_SEARCH_PROCESSES * CHUNKS_PER_PROCESS, 1)
+        bounds = np.linspace(0, len(master_positions), n_chunks + 1, dtype=np.int64)
+        futures = [
+            (start, executor.submit(_match_chunk, names, master_positions[start:end], strict_groups, fallback_keywords))
+            for start, end in zip(bounds[:-1], bounds[1:]) if end > start
+        ]
+
+        # Merge per-chunk results; chunks are in order, so concatenation keeps positions sorted
+        group_parts = [[] for _ in strict_groups]
+        fallback_parts = []
+        for start, future in futures:
+            chunk_groups, chunk_fallback = future.result()
+            for parts, local_hits in zip(group_parts, chunk_groups):
+                parts.append(local_hits + start)
+            fallback_parts.append(chunk_fallback + start)
+    finally:
+        # Chunks of a failed query may still be attaching; keep the buffer until they are done
+        wait([future for _, future in futures])
+        _release(key)
+
+    merge = lambda parts: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    return [merge(parts) for parts in group_parts], merge(fallback_parts)
+
+
+@atexit.register
+def _shutdown():
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    for buffer, _ in _buffers.values():
+        buffer.close()
+    _buffers.clear()
@@ -0,0 +1,167 @@
+# profiling.py
+"""
+Opt-in profiling of single Streamlit script runs.
+
+Enable with PROFILE_RUNS=1 or by opening the dashboard with ?profile=1. Each profiled run writes a
+trace (pyinstrument HTML if pyinstrument is installed, otherwise a cProfile .prof file plus a text
+summary) and a small JSON file with the prompt, last_search and result row count to PROFILE_DIR.
+Only the newest PROFILE_MAX_RUNS runs are kept.
+
+Search, classification and LLM streaming run on the shared worker threads (workers.py), which a
+profiler on the script thread cannot see. Jobs submitted by a profiled run are therefore profiled
+on their own thread (profile_job) and merged into the run's trace.
+"""
+
+import os
+import io
+import json
+import time
+import uuid
+import cProfile
+import pstats
+import threading
+from datetime import datetime
+
+import streamlit as st
+from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:  # pyinstrument is optional
+    SamplingProfiler = None
+
+load_dotenv()
+
+PROFILE_RUNS = os.getenv("PROFILE_RUNS", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_RUNS = int(os.getenv("PROFILE_MAX_RUNS", "50"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+
+def is_enabled():
+    return PROFILE_RUNS or st.query_params.get("profile") == "1"
+
+
+def _new_profiler(kind):
+    if kind == "pyinstrument":
+        profiler = SamplingProfiler(interval=PROFILE_INTERVAL)
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(kind, profiler):
+    if kind == "pyinstrument":
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+def _stop(handle):
+    with handle["lock"]:
+        handle["finished"] = True
+    _stop_profiler(handle["kind"], handle["profiler"])
+
+
+def start_run():
+    """Starts profiling the current script run if profiling is enabled. Returns a handle or None."""
+    # A run cut short by st.rerun()/st.stop() elsewhere never reached finish_run; discard it
+    previous = st.session_state.get("_profile_run")
+    if previous and not previous.get("finished"):
+        _stop(previous)
+    if not is_enabled():
+        return None
+    kind = "pyinstrument" if SamplingProfiler is not None else "cprofile"
+    handle = {
+        "profiler": _new_profiler(kind), "kind": kind, "started": time.perf_counter(),
+        "jobs": [], "lock": threading.Lock(),
+    }
+    st.session_state["_profile_run"] = handle
+    return handle
+
+
+def active_run():
+    """The handle of the script run being profiled on this thread, or None (also outside Streamlit)."""
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    handle = st.session_state.get("_profile_run")
+    return handle if handle and not handle.get("finished") else None
+
+
+def profile_job(handle, fn, *args, **kwargs):
+    """Runs fn on the current (worker) thread under its own profiler and adds the trace to the run."""
+    profiler = _new_profiler(handle["kind"])
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _stop_profiler(handle["kind"], profiler)
+        with handle["lock"]:
+            if not handle.get("finished"):
+                handle["jobs"].append(profiler)
+
+
+def _rotate():
+    """Deletes the oldest runs so that at most PROFILE_MAX_RUNS remain."""
+    runs = sorted(
+        (f for f in os.listdir(PROFILE_DIR) if f.endswith(".meta.json")),
+        key=lambda f: os.path.getmtime(os.path.join(PROFILE_DIR, f))
+    )
+    for meta_file in runs[:max(len(runs) - PROFILE_MAX_RUNS, 0)]:
+        run_id = meta_file[:-len(".meta.json")]
+        for f in os.listdir(PROFILE_DIR):
+            if f.startswith(run_id):
+                os.remove(os.path.join(PROFILE_DIR, f))
+
+
+def finish_run(handle, prompt=None, last_search=None, row_count=None):
+    """Stops the profiler started by start_run() and writes the trace plus run metadata."""
+    if handle is None or handle.get("finished"):
+        return
+    _stop(handle)
+    profiler = handle["profiler"]
+    duration_ms = (time.perf_counter() - handle["started"]) * 1000
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    base_path = os.path.join(PROFILE_DIR, run_id)
+
+    with handle["lock"]:
+        jobs = list(handle["jobs"])
+
+    if handle["kind"] == "pyinstrument":
+        from pyinstrument.renderers import HTMLRenderer
+        from pyinstrument.session import Session
+        session = profiler.last_session
+        for job in jobs:
+            if job.last_session is not None:
+                session = Session.combine(session, job.last_session)
+        trace_file = f"{base_path}.html"
+        with open(trace_file, 'w', encoding='utf-8') as f:
+            f.write(HTMLRenderer().render(session))
+    else:
+        stats = pstats.Stats(profiler, *jobs)
+        trace_file = f"{base_path}.prof"
+        stats.dump_stats(trace_file)
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats("cumulative").print_stats(40)
+        with open(f"{base_path}.txt", 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+
+    meta = {
+        "id": run_id,
+        "timestamp": datetime.now().isoformat(),
+        "profiler": handle["kind"],
+        "duration_ms": round(duration_ms, 2),
+        "worker_jobs": len(jobs),
+        "prompt": prompt,
+        "last_search": last_search,
+        "row_count": row_count,
+        "trace_file": os.path.basename(trace_file),
+    }
+    with open(f"{base_path}.meta.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4, default=str)
+    _rotate()
@@ -0,0 +1,78 @@
+# ranking.py
+"""
+Relevance scoring for search results: BM25 over KONTEN (corpus statistics from search_index),
+plus the number of distinct search keywords a post contains and a log-scaled engagement boost.
+Everything is computed column-wise on the matched rows only.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from keyword_matcher import build_matcher
+from search_index import get_index, tokenize, TOKEN_PATTERN
+
+load_dotenv()
+
+# Maximum rows kept per keyword search (0 = keep everything), truncated by relevance score
+SEARCH_RESULT_CAP = int(os.getenv("SEARCH_RESULT_CAP", "0"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RANK_HIT_WEIGHT = float(os.getenv("RANK_HIT_WEIGHT", "1.0"))
+RANK_ENGAGEMENT_WEIGHT = float(os.getenv("RANK_ENGAGEMENT_WEIGHT", "0.5"))
+RANK_SEMANTIC_WEIGHT = float(os.getenv("RANK_SEMANTIC_WEIGHT", "10.0"))
+
+SCORE_COLUMN = 'RELEVANCE SCORE'
+
+
+def _query_terms(keywords):
+    return sorted({t for k in keywords for t in re.findall(TOKEN_PATTERN, str(k).casefold())})
+
+
+def score_results(master_df, results_df, strict_groups, fallback_keywords):
+    """Returns one relevance score per row of results_df (higher is more relevant)."""
+    n = len(results_df)
+    keywords = [k for group in strict_groups for k in group] + list(fallback_keywords)
+    index = get_index(master_df)
+    terms = _query_terms(keywords)
+
+    # --- BM25 ---
+    tokens = tokenize(results_df['KONTEN'])
+    doc_lengths = np.bincount(tokens.index.to_numpy(), minlength=n).astype(np.float64)
+    term_tokens = tokens[tokens.isin(terms)]
+    tf = np.zeros((n, len(terms)))
+    if not term_tokens.empty:
+        term_columns = pd.Index(terms).get_indexer(term_tokens.to_numpy())
+        np.add.at(tf, (term_tokens.index.to_numpy(), term_columns), 1)
+    idf = np.array([index.idf(t) for t in terms])
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / (index.avg_doc_length or 1))
+    bm25 = (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1) if terms else np.zeros(n)
+
+    # --- Keyword hits and engagement ---
+    hit_counts = build_matcher(strict_groups, fallback_keywords).hit_matrix(results_df['KONTEN'].tolist()).sum(axis=1)
+    engagement = np.log1p(results_df['ENGAGEMENTS'].clip(lower=0).to_numpy(dtype=np.float64)) \
+        if 'ENGAGEMENTS' in results_df.columns else np.zeros(n)
+    if engagement.max(initial=0) > 0:
+        engagement = engagement / engagement.max()
+
+    return bm25 + RANK_HIT_WEIGHT * hit_counts + RANK_ENGAGEMENT_WEIGHT * engagement
+
+
+def rank_results(master_df, results_df, strict_groups, fallback_keywords, cap=SEARCH_RESULT_CAP, extra_scores=None):
+    """
+    Adds the relevance score column and keeps the `cap` best rows (all rows when cap is 0).
+    extra_scores (e.g. semantic similarity per row, in [0, 1]) is added with RANK_SEMANTIC_WEIGHT.
+    """
+    if results_df.empty:
+        return results_df
+    results_df = results_df.copy()
+    scores = score_results(master_df, results_df, strict_groups, fallback_keywords)
+    if extra_scores is not None:
+        scores = scores + RANK_SEMANTIC_WEIGHT * np.asarray(extra_scores, dtype=np.float64)
+    results_df[SCORE_COLUMN] = scores
+    if cap and len(results_df) > cap:
+        results_df = results_df.nlargest(cap, SCORE_COLUMN, keep='first')
+    return results_df
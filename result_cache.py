@@ -0,0 +1,140 @@
+# result_cache.py
+"""
+Process-wide LRU cache of search results, shared by every session.
+
+Entries are keyed on the dataset version plus the canonical search parameters (keywords
+case-folded and sorted, dates normalised) and store only master row positions and relevance
+scores, so a cached result is rebuilt with one iloc. The cache is bounded by the bytes of the
+stored arrays (RESULT_CACHE_MAX_BYTES); the least recently used entries are evicted first.
+Hit rate and size are published as metrics gauges.
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# 0 disables the cache
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# narrowable: the result may be filtered down to a narrower date window (see utils.search_data)
+CachedResult = namedtuple("CachedResult", ["positions", "score_column", "scores", "narrowable"])
+# search: everything but the dates (dataset, keywords, settings); entries with an equal search
+# differ only in their date window, which is what find_wider() relies on
+CacheKey = namedtuple("CacheKey", ["search", "dates"])
+
+_entries = OrderedDict()  # key -> CachedResult
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "narrowed": 0, "bytes": 0}
+
+
+def _canonical_terms(terms):
+    return tuple(sorted({str(t).strip().casefold() for t in terms if str(t).strip()}))
+
+
+def make_key(dataframe, strict_groups, fallback_keywords, dates, *extra):
+    """
+    Canonical CacheKey, or None for DataFrames without a dataset version (they cannot be
+    told apart safely). Keyword matching is case-insensitive and the strict groups are OR-ed,
+    so neither case nor order changes the result. `extra` carries settings that do.
+    """
+    version = dataframe.attrs.get("dataset_version")
+    if version is None:
+        return None
+    groups = tuple(sorted({_canonical_terms(group) for group in strict_groups}))
+    day_list = tuple(sorted(pd.to_datetime(d).date().isoformat() for d in dates or []))
+    return CacheKey((version, len(dataframe), groups, _canonical_terms(fallback_keywords)) + extra, day_list)
+
+
+def _publish():
+    lookups = _stats["hits"] + _stats["misses"]
+    metrics.set_gauge("result_cache.hit_rate", round(_stats["hits"] / lookups, 3) if lookups else 0.0)
+    metrics.set_gauge("result_cache.entries", len(_entries))
+    metrics.set_gauge("result_cache.narrowed", _stats["narrowed"])
+    metrics.set_gauge("result_cache.mb", round(_stats["bytes"] / 1024 / 1024, 2))
+
+
+def get(key):
+    if key is None:
+        return None
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+        else:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+        _publish()
+        return entry
+
+
+def find_wider(key, contains):
+    """
+    Most recently used narrowable entry for the same search with another date window that
+    contains the window of `key`, i.e. contains(entry dates, key dates) is true; None if there is none.
+    """
+    if key is None:
+        return None
+    with _lock:
+        for other in reversed(_entries):
+            if other.search == key.search and other.dates != key.dates and _entries[other].narrowable \
+                    and contains(other.dates, key.dates):
+                _entries.move_to_end(other)
+                _stats["narrowed"] += 1
+                _publish()
+                return _entries[other]
+    return None
+
+
+def _size(entry):
+    return entry.positions.nbytes + (entry.scores.nbytes if entry.scores is not None else 0)
+
+
+def put(key, dataframe, result_df, score_column, narrowable=False):
+    """Stores result_df (rows of dataframe) as master positions in result order."""
+    if key is None or RESULT_CACHE_MAX_BYTES <= 0:
+        return
+    positions = dataframe.index.get_indexer(result_df.index) if not result_df.empty else np.empty(0, dtype=np.int64)
+    has_scores = score_column in result_df.columns
+    entry = CachedResult(
+        positions,
+        score_column if has_scores else None,
+        result_df[score_column].to_numpy() if has_scores else None,
+        narrowable and len(positions) > 0,
+    )
+    size = _size(entry)
+    if size > RESULT_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        if key in _entries:
+            _stats["bytes"] -= _size(_entries.pop(key))
+        _entries[key] = entry
+        _stats["bytes"] += size
+        while _stats["bytes"] > RESULT_CACHE_MAX_BYTES:
+            _, evicted = _entries.popitem(last=False)
+            _stats["bytes"] -= _size(evicted)
+        _publish()
+
+
+def materialize(dataframe, entry):
+    """Rebuilds a cached result from the master DataFrame."""
+    if len(entry.positions) == 0:
+        return dataframe.iloc[:0]  # Same columns as an uncached empty result
+    result_df = dataframe.iloc[entry.positions]
+    if entry.score_column is not None:
+        result_df = result_df.assign(**{entry.score_column: entry.scores})
+    return result_df
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _stats["bytes"] = 0
+        _publish()
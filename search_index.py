@@ -0,0 +1,52 @@
+# search_index.py
+"""
+Per-dataset text statistics over KONTEN, built once per dataset version and shared by all
+sessions: token document frequencies, per-row document lengths and the average length used by
+BM25 ranking.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+TOKEN_PATTERN = r"\w+"
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def tokenize(texts):
+    """Case-folded word tokens per text, as an exploded Series indexed by row position."""
+    tokens = pd.Series(texts).reset_index(drop=True).fillna("").astype(str).str.casefold().str.findall(TOKEN_PATTERN)
+    return tokens.explode().dropna()
+
+
+class CorpusIndex:
+    def __init__(self, dataframe):
+        tokens = tokenize(dataframe['KONTEN'])
+        self.n_docs = len(dataframe)
+        self.doc_lengths = np.bincount(tokens.index.to_numpy(), minlength=self.n_docs).astype(np.float64)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.n_docs else 0.0
+        # Each (row, token) pair counts once towards the token's document frequency
+        unique_pairs = pd.DataFrame({"row": tokens.index, "token": tokens.to_numpy()}).drop_duplicates()
+        self.doc_freq = unique_pairs['token'].value_counts().to_dict()
+
+    def idf(self, term):
+        """BM25 (Robertson–Spärck Jones) idf, floored at zero."""
+        n_t = self.doc_freq.get(term, 0)
+        return max(np.log((self.n_docs - n_t + 0.5) / (n_t + 0.5) + 1), 0.0)
+
+
+def dataset_key(dataframe):
+    return dataframe.attrs.get("dataset_version", id(dataframe)), len(dataframe)
+
+
+def get_index(dataframe):
+    """Returns the CorpusIndex of a master dataset, building it on first use."""
+    key = dataset_key(dataframe)
+    with _lock:
+        if key not in _indexes:
+            _indexes.clear()  # Only the current dataset version is kept
+            _indexes[key] = CorpusIndex(dataframe)
+        return _indexes[key]
@@ -0,0 +1,299 @@
+# semantic_index.py
+"""
+Optional semantic retrieval tier over KONTEN (enabled with SEMANTIC_SEARCH=1).
+
+Posts are embedded as hashed TF-IDF vectors: case-folded words plus their character trigrams
+(so "menkeu", "menteri keuangan" and typos share features) are hashed, idf-weighted and folded
+with a signed hash into a small dense vector. The vectors are stored on disk in an IVF index
+(spherical k-means coarse lists, float16, memory-mapped), so a query only scans the few lists
+closest to it.
+
+Embeddings are computed at ingestion (load_data) and reused for unchanged posts when the dataset
+file is updated; at query time only the query text itself is embedded.
+"""
+
+import os
+import json
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from search_index import dataset_key, tokenize
+
+load_dotenv()
+
+SEMANTIC_SEARCH = os.getenv("SEMANTIC_SEARCH", "0") == "1"
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", "semantic_index")
+SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", "512"))
+SEMANTIC_NPROBE = int(os.getenv("SEMANTIC_NPROBE", "8"))
+# Date windows up to this many rows are scored exhaustively instead of through the IVF lists
+SEMANTIC_EXACT_MAX_ROWS = int(os.getenv("SEMANTIC_EXACT_MAX_ROWS", "50000"))
+SEMANTIC_TOP_K = int(os.getenv("SEMANTIC_TOP_K", "200"))
+SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE", "0.2"))
+SEMANTIC_BATCH_ROWS = int(os.getenv("SEMANTIC_BATCH_ROWS", "50000"))
+
+_HASH_BUCKETS = 1 << 20   # idf table size
+_IDF_SAMPLE_ROWS = 100000  # idf is estimated on an evenly spaced sample of posts
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE_PER_LIST = 32
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+# --- EMBEDDING ---
+def _features(texts):
+    """(row position, feature hash) pairs for the words of each text and their character trigrams."""
+    words = tokenize(texts)
+    if words.empty:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    rows = words.index.to_numpy()
+    words = pd.Series(words.to_numpy(dtype=object))
+
+    feature_rows = [rows]
+    feature_values = [("w:" + words).to_numpy(dtype=object)]
+    padded = "#" + words + "#"
+    lengths = padded.str.len().to_numpy()
+    for start in range(int(lengths.max()) - 2):
+        keep = lengths >= start + 3
+        feature_rows.append(rows[keep])
+        feature_values.append(padded[keep].str.slice(start, start + 3).to_numpy(dtype=object))
+
+    return np.concatenate(feature_rows), pd.util.hash_array(np.concatenate(feature_values))
+
+
+def _estimate_idf(texts):
+    rows, hashes = _features(texts)
+    buckets = (hashes & np.uint64(_HASH_BUCKETS - 1)).astype(np.int64)
+    # Each (row, bucket) pair counts once towards the document frequency
+    pairs = np.unique(rows * _HASH_BUCKETS + buckets)
+    doc_freq = np.bincount(pairs % _HASH_BUCKETS, minlength=_HASH_BUCKETS)
+    return (np.log((1 + len(texts)) / (1 + doc_freq)) + 1).astype(np.float32)
+
+
+def embed(texts, idf, dim=SEMANTIC_DIM):
+    """L2-normalised float32 vectors [len(texts), dim]; texts without words get a zero vector."""
+    n = len(texts)
+    rows, hashes = _features(texts)
+    weights = idf[(hashes & np.uint64(_HASH_BUCKETS - 1)).astype(np.int64)]
+    # Signed feature hashing: one bit picks the sign, higher bits pick the output dimension
+    signs = np.where(hashes >> np.uint64(63), 1.0, -1.0)
+    dims = ((hashes >> np.uint64(32)) % np.uint64(dim)).astype(np.int64)
+    vectors = np.bincount(rows * dim + dims, weights=weights * signs, minlength=n * dim)
+    vectors = vectors.reshape(n, dim).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def _content_hashes(dataframe):
+    return pd.util.hash_pandas_object(dataframe['KONTEN'].fillna("").astype(str), index=False).to_numpy()
+
+
+# --- IVF INDEX ---
+class SemanticIndex:
+    """A memory-mapped IVF index stored in one directory."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.dim = self.meta["dim"]
+        self.idf = np.load(os.path.join(path, "idf.npy"))
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        self.row_ids = np.load(os.path.join(path, "row_ids.npy"), mmap_mode="r")
+        self.row_hashes = np.load(os.path.join(path, "row_hashes.npy"), mmap_mode="r")
+        self.vectors = np.memmap(os.path.join(path, "vectors.f16"), dtype=np.float16, mode="r",
+                                 shape=(self.meta["n_rows"], self.dim))
+        self._slots = None
+
+    def vectors_by_row(self):
+        """Maps a master row to its slot in the list-ordered vectors."""
+        if self._slots is None:
+            slots = np.empty(len(self.row_ids), dtype=np.int64)
+            slots[self.row_ids] = np.arange(len(self.row_ids))
+            self._slots = slots
+        return self._slots
+
+    def search(self, query_text, positions=None, top_k=SEMANTIC_TOP_K, min_score=SEMANTIC_MIN_SCORE):
+        """
+        Returns (master positions, cosine scores) of the posts most similar to query_text, best first.
+        When `positions` is given, only those master rows are eligible.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = embed([query_text], self.idf, self.dim)[0]
+        if not query.any() or self.meta["n_rows"] == 0:
+            return empty
+
+        if positions is not None and len(positions) <= SEMANTIC_EXACT_MAX_ROWS:
+            # Narrow windows (e.g. one month) are scanned exactly: the probed lists could miss them
+            rows = np.asarray(positions, dtype=np.int64)
+            slots = self.vectors_by_row()[rows]
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:SEMANTIC_NPROBE]
+            slots = np.concatenate([np.arange(self.list_offsets[l], self.list_offsets[l + 1]) for l in probe])
+            rows = np.asarray(self.row_ids[slots])
+            if positions is not None:
+                allowed = np.zeros(self.meta["n_rows"], dtype=bool)
+                allowed[positions] = True
+                slots, rows = slots[allowed[rows]], rows[allowed[rows]]
+        if len(slots) == 0:
+            return empty
+
+        scores = np.asarray(self.vectors[slots], dtype=np.float32) @ query
+        keep = np.flatnonzero(scores >= min_score)
+        best = keep[np.argsort(-scores[keep], kind="stable")[:top_k]]
+        return rows[best], scores[best]
+
+
+def _train_centroids(sample, n_lists, seed=0):
+    """Spherical k-means on a sample of normalised vectors."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+    for _ in range(_KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their previous centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return centroids.astype(np.float32)
+
+
+def _load_existing(path):
+    try:
+        index = SemanticIndex(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return index if index.dim == SEMANTIC_DIM else None
+
+
+def _build(dataframe, path):
+    """
+    Writes the index of dataframe to `path`. Vectors of posts whose KONTEN is unchanged since the
+    previous index are reused; the idf table and centroids are kept unless the dataset has more
+    than doubled since they were trained, in which case everything is rebuilt.
+    """
+    n = len(dataframe)
+    texts = dataframe['KONTEN']
+    hashes = _content_hashes(dataframe)
+    previous = _load_existing(path)
+    if previous is not None and n > 2 * previous.meta["trained_rows"]:
+        previous = None
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    if previous is not None:
+        idf, centroids, trained_rows = previous.idf, previous.centroids, previous.meta["trained_rows"]
+        # Previous row holding the same KONTEN (-1 when the post is new or changed)
+        old_hashes = pd.Index(np.asarray(previous.row_hashes))
+        first_rows = np.flatnonzero(~old_hashes.duplicated())
+        matches = old_hashes[first_rows].get_indexer(hashes)
+        reuse_rows = np.where(matches >= 0, first_rows[matches], -1)
+        old_slots = previous.vectors_by_row()
+    else:
+        sample = np.unique(np.linspace(0, n - 1, min(n, _IDF_SAMPLE_ROWS)).astype(np.int64)) if n else []
+        idf = _estimate_idf(texts.iloc[sample]) if n else np.ones(_HASH_BUCKETS, dtype=np.float32)
+        centroids, trained_rows, reuse_rows = None, n, np.full(n, -1)
+
+    # Vectors in master row order (scratch file), embedding only new or changed posts
+    by_row = np.lib.format.open_memmap(os.path.join(tmp_path, "by_row.npy"), mode="w+",
+                                       dtype=np.float16, shape=(n, SEMANTIC_DIM))
+    reused = reuse_rows >= 0
+    if reused.any():
+        by_row[np.flatnonzero(reused)] = previous.vectors[old_slots[reuse_rows[reused]]]
+    to_embed = np.flatnonzero(~reused)
+    for start in range(0, len(to_embed), SEMANTIC_BATCH_ROWS):
+        batch = to_embed[start:start + SEMANTIC_BATCH_ROWS]
+        by_row[batch] = embed(texts.iloc[batch], idf)
+
+    if centroids is None:
+        n_lists = int(np.clip(np.sqrt(n), 1, 1024)) if n else 1
+        sample_rows = np.random.default_rng(0).choice(n, min(n, n_lists * _KMEANS_SAMPLE_PER_LIST), replace=False) if n else []
+        sample = np.asarray(by_row[np.sort(sample_rows)], dtype=np.float32) if n else np.zeros((1, SEMANTIC_DIM), np.float32)
+        centroids = _train_centroids(sample, min(n_lists, len(sample)))
+
+    # Coarse assignment, then lay the vectors out list by list
+    assign = np.empty(n, dtype=np.int64)
+    for start in range(0, n, SEMANTIC_BATCH_ROWS):
+        assign[start:start + SEMANTIC_BATCH_ROWS] = np.argmax(
+            np.asarray(by_row[start:start + SEMANTIC_BATCH_ROWS], dtype=np.float32) @ centroids.T, axis=1
+        )
+    order = np.argsort(assign, kind="stable")
+    list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assign, minlength=len(centroids)), out=list_offsets[1:])
+
+    vectors = np.memmap(os.path.join(tmp_path, "vectors.f16"), dtype=np.float16, mode="w+",
+                        shape=(max(n, 1), SEMANTIC_DIM))
+    for start in range(0, n, SEMANTIC_BATCH_ROWS):
+        vectors[start:start + SEMANTIC_BATCH_ROWS] = by_row[order[start:start + SEMANTIC_BATCH_ROWS]]
+    vectors.flush()
+    del vectors, by_row
+    os.remove(os.path.join(tmp_path, "by_row.npy"))
+
+    np.save(os.path.join(tmp_path, "idf.npy"), idf)
+    np.save(os.path.join(tmp_path, "centroids.npy"), centroids)
+    np.save(os.path.join(tmp_path, "list_offsets.npy"), list_offsets)
+    np.save(os.path.join(tmp_path, "row_ids.npy"), order)
+    np.save(os.path.join(tmp_path, "row_hashes.npy"), hashes)
+    meta = {
+        "dataset_version": dataframe.attrs.get("dataset_version"),
+        "n_rows": n,
+        "dim": SEMANTIC_DIM,
+        "n_lists": len(centroids),
+        "trained_rows": trained_rows,
+        "reused_rows": int(reused.sum()),
+    }
+    # meta.json is written last: a directory without it is never loaded
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    del previous
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def ensure_index(dataframe, path=SEMANTIC_INDEX_DIR):
+    """Ingestion hook: builds or incrementally updates the on-disk index for dataframe."""
+    key = dataset_key(dataframe)
+    with _lock:
+        index = _load_existing(path)
+        if index is None or index.meta.get("dataset_version") != dataframe.attrs.get("dataset_version") \
+                or index.meta["n_rows"] != len(dataframe):
+            _indexes.clear()
+            _build(dataframe, path)
+            index = SemanticIndex(path)
+        _indexes.clear()  # Only the current dataset version is kept
+        _indexes[key] = index
+        return index
+
+
+def get_index(dataframe):
+    """The loaded index for dataframe's version, or None when it has not been built at ingestion."""
+    key = dataset_key(dataframe)
+    with _lock:
+        if key not in _indexes:
+            index = _load_existing(SEMANTIC_INDEX_DIR)
+            if index is None or index.meta.get("dataset_version") != dataframe.attrs.get("dataset_version") \
+                    or index.meta["n_rows"] != len(dataframe):
+                return None
+            _indexes.clear()
+            _indexes[key] = index
+        return _indexes[key]
+
+
+def search(dataframe, query_text, positions=None):
+    """Semantic tier for search_data: (master positions, scores), empty when no index is available."""
+    index = get_index(dataframe)
+    if index is None:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return index.search(query_text, positions)
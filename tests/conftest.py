@@ -0,0 +1,37 @@
+# tests/conftest.py
+import os
+import sys
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from columns import ROW_ID_COLUMN
+
+_WORDS = ["bahlil", "prabowo", "menteri", "keuangan", "purbaya", "harga", "beras", "energi", "bbm", "dan", "yang", "ini"]
+
+
+@pytest.fixture
+def master_df():
+    """Small master dataset shaped like load_data() output: Aug-Sep 2025, dataset version, ROW ID."""
+    rng = np.random.default_rng(7)
+    n = 600
+    texts = [" ".join(rng.choice(_WORDS, size=rng.integers(1, 10))) for _ in range(n)]
+    texts[::41] = [None] * len(texts[::41])
+    df = pd.DataFrame({
+        "TANGGAL PUBLIKASI": pd.Timestamp("2025-08-01") + pd.to_timedelta(rng.integers(0, 61 * 24, size=n), unit="h"),
+        "KONTEN": texts,
+        "SENTIMEN": rng.choice(["Positif", "Netral", "Negatif"], size=n),
+        "ENGAGEMENTS": rng.integers(0, 5000, size=n),
+        "VIEWS": rng.integers(1, 50000, size=n),
+        "FOLLOWERS": rng.integers(10, 10 ** 6, size=n),
+        "AKUN": rng.choice(["@kompas", "@detik", "@warga1", "@warga2"], size=n),
+        "TOPIK": rng.choice(["Ekonomi", "Energi", "Politik"], size=n),
+        "GRUP": rng.choice(["Media", "Publik"], size=n),
+    }).sort_values("TANGGAL PUBLIKASI", ignore_index=True)
+    df[ROW_ID_COLUMN] = np.arange(n)
+    df.attrs["dataset_version"] = f"test:{n}"
+    return df
@@ -0,0 +1,21 @@
+# tests/test_drilldown.py
+import pandas as pd
+
+import drilldown
+
+
+def test_empty_value_clears_filter():
+    filters = drilldown.merge_filters({}, {"SENTIMEN": ["Negatif"], "min": {"ENGAGEMENTS": 1000}})
+    filters = drilldown.merge_filters(filters, {"SENTIMEN": []})
+    assert filters == {"min": {"ENGAGEMENTS": 1000.0}}
+
+    filters = drilldown.merge_filters(filters, {"min": {"ENGAGEMENTS": None}})
+    assert filters == {}
+
+
+def test_missing_key_keeps_filter():
+    filters = drilldown.merge_filters({"SENTIMEN": ["Negatif"]}, {"SUMBER": "tiktok"})
+    assert filters == {"SENTIMEN": ["Negatif"], "SUMBER": ["tiktok"]}
+
+    df = pd.DataFrame({"SENTIMEN": ["Negatif", "Positif"], "SUMBER": ["tiktok", "tiktok"]})
+    assert drilldown.filter_mask(df, drilldown.merge_filters(filters, {"SENTIMEN": None})).tolist() == [True, True]
@@ -0,0 +1,34 @@
+# tests/test_export.py
+import io
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import export
+
+
+def _xlsx_threads():
+    return [t for t in threading.enumerate() if t.name == "xlsx-export"]
+
+
+def test_abandoned_xlsx_stream_stops_writer(monkeypatch):
+    monkeypatch.setattr(export, "_XLSX_FLUSH_BYTES", 1)  # Many small blocks, so the queue fills up
+    monkeypatch.setattr(export, "_XLSX_PUT_POLL_SECONDS", 0.05)
+    frame = pd.DataFrame({"KONTEN": [f"post {i} " * 20 for i in range(2000)]})
+    chunks = export.stream_export("xlsx", frame, np.arange(len(frame)))
+    next(chunks)
+    assert _xlsx_threads()
+
+    chunks.close()
+    deadline = time.monotonic() + 10
+    while _xlsx_threads() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _xlsx_threads()
+
+
+def test_xlsx_stream_is_complete():
+    frame = pd.DataFrame({"KONTEN": ["a", "b"], "ENGAGEMENTS": [1, 2]})
+    data = b"".join(export.stream_export("xlsx", frame, np.arange(len(frame))))
+    assert pd.read_excel(io.BytesIO(data)).to_dict("list") == {"KONTEN": ["a", "b"], "ENGAGEMENTS": [1, 2]}
@@ -0,0 +1,69 @@
+# tests/test_keyword_matcher.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import keyword_matcher
+from keyword_matcher import build_matcher
+
+TEXTS = [
+    "Menteri Keuangan Purbaya bicara soal APBN",
+    "menteri keuangan",
+    "Harga BBM (Pertalite) naik 5.5%",
+    "harga bbm turun",
+    "c++ dan C# bukan bahasa resmi",
+    None,
+    "",
+    "Purbaya: MENTERI baru",
+]
+KEYWORDS = ["menteri keuangan", "menteri", "Purbaya", "bbm (pertalite)", "5.5%", "c++", "bahasa resmi", "tidak ada"]
+
+
+def _contains(keyword):
+    """Old search semantics: case-insensitive substring test, NaN never matches."""
+    return pd.Series(TEXTS, dtype=object).str.contains(keyword, case=False, na=False, regex=False).to_numpy()
+
+
+@pytest.fixture(params=["automaton", "regex"])
+def matcher_kind(request, monkeypatch):
+    if request.param == "regex":
+        monkeypatch.setattr(keyword_matcher, "ahocorasick", None)
+    elif keyword_matcher.ahocorasick is None:
+        pytest.skip("pyahocorasick is not installed")
+    return request.param
+
+
+def test_hit_matrix_matches_substring_search(matcher_kind):
+    matcher = build_matcher([], KEYWORDS)
+    matrix = matcher.hit_matrix(TEXTS)
+    for keyword in KEYWORDS:
+        column = matcher.keywords.index(keyword.casefold())
+        assert matrix[:, column].tolist() == _contains(keyword).tolist(), keyword
+
+
+def test_evaluate_groups_and_fallback(matcher_kind):
+    strict_groups = [["menteri", "purbaya"], [], ["harga", "BBM"]]
+    fallback_keywords = ["c++", "5.5%"]
+    group_masks, fallback_mask = build_matcher(strict_groups, fallback_keywords).evaluate(
+        TEXTS, strict_groups, fallback_keywords
+    )
+    assert group_masks[0].tolist() == (_contains("menteri") & _contains("purbaya")).tolist()
+    assert not group_masks[1].any()  # Empty strict groups match nothing
+    assert group_masks[2].tolist() == (_contains("harga") & _contains("bbm")).tolist()
+    assert fallback_mask.tolist() == (_contains("c++") | _contains("5.5%")).tolist()
+
+
+def test_regex_fallback_equals_automaton(monkeypatch):
+    if keyword_matcher.ahocorasick is None:
+        pytest.skip("pyahocorasick is not installed")
+    rng = np.random.default_rng(3)
+    words = ["ab", "abc", "bc", "c", "abcab", "x y", "y"]
+    texts = ["".join(rng.choice(["a", "b", "c", "x", " ", "y"], size=rng.integers(0, 30))) for _ in range(300)]
+    def hits_by_keyword():
+        matcher = build_matcher([], words)
+        matrix = matcher.hit_matrix(texts)
+        return {k: matrix[:, i].tolist() for i, k in enumerate(matcher.keywords)}
+
+    automaton = hits_by_keyword()
+    monkeypatch.setattr(keyword_matcher, "ahocorasick", None)
+    assert hits_by_keyword() == automaton
@@ -0,0 +1,35 @@
+# tests/test_llm_backend.py
+import json
+
+import pytest
+
+import llm_backend
+
+
+def test_incomplete_backend_fails_at_instantiation():
+    class ClassifyOnly(llm_backend.LLMBackend):
+        def classify(self, messages):
+            return "{}"
+
+    with pytest.raises(TypeError):
+        ClassifyOnly()
+
+
+def test_recorded_responses_are_appended_and_replayed(tmp_path):
+    path = tmp_path / "fixtures.jsonl"
+    backend = llm_backend.OpenAIBackend(record_path=str(path))
+    backend._record("classify", [{"role": "user", "content": "berita bahlil"}], '{"type": "New Topic"}')
+    backend._record("chat", [{"role": "user", "content": "berita bahlil"}], "Jawaban pertama")
+    backend._record("chat", [{"role": "user", "content": "berita bahlil"}], "Jawaban kedua")
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    stub = llm_backend.StubBackend(fixtures_path=str(path), latency_ms=0, tokens_per_sec=0)
+    messages = [{"role": "user", "content": "berita bahlil"}]
+    assert stub.classify(messages) == '{"type": "New Topic"}'
+    assert "".join(stub.stream_chat(messages)) == "Jawaban kedua"
+
+
+def test_json_fixture_document_is_still_read(tmp_path):
+    path = tmp_path / "fixtures.json"
+    path.write_text(json.dumps({"classify": {"a": "{}"}, "chat": {"a": "b"}}), encoding="utf-8")
+    assert llm_backend._load_fixtures(str(path)) == {"classify": {"a": "{}"}, "chat": {"a": "b"}}
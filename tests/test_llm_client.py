@@ -0,0 +1,54 @@
+# tests/test_llm_client.py
+import time
+
+import httpx
+import openai
+import pytest
+
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailableError
+
+
+def _status_error(cls, status_code):
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    return cls("error", response=httpx.Response(status_code, request=request), body=None)
+
+
+def _raise(error):
+    def request():
+        raise error
+    return request
+
+
+@pytest.fixture
+def client():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    client = LLMClient(api_key="test", max_retries=0, breaker=breaker)
+    yield client
+    client.close()
+
+
+def test_non_retryable_error_settles_half_open_trial(client):
+    # One 500 opens the breaker
+    with pytest.raises(LLMUnavailableError):
+        client._call_with_retries(_raise(_status_error(openai.InternalServerError, 500)))
+    assert client.breaker.state == "open"
+
+    # The half-open trial gets a 400: the service answered, so the breaker closes
+    time.sleep(0.06)
+    with pytest.raises(openai.BadRequestError):
+        client._call_with_retries(_raise(_status_error(openai.BadRequestError, 400)))
+    assert client.breaker.state == "closed"
+    assert client._call_with_retries(lambda: "ok") == "ok"
+
+
+def test_unexpected_error_releases_half_open_trial(client):
+    with pytest.raises(LLMUnavailableError):
+        client._call_with_retries(_raise(_status_error(openai.InternalServerError, 500)))
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        client._call_with_retries(_raise(ValueError("boom")))
+
+    # The trial slot is free again, so the next call is let through
+    assert client.breaker.state == "half-open"
+    assert client._call_with_retries(lambda: "ok") == "ok"
+    assert client.breaker.state == "closed"
@@ -0,0 +1,39 @@
+# tests/test_near_duplicates.py
+import pandas as pd
+
+import near_duplicates
+from columns import LABEL_COLUMN
+
+ARTICLE = ("Menteri Keuangan Purbaya menyampaikan bahwa defisit anggaran tahun ini tetap terjaga "
+           "di bawah tiga persen dari produk domestik bruto meski belanja negara meningkat")
+
+
+def _posts():
+    return pd.DataFrame({
+        "KONTEN": [ARTICLE, "Harga beras di pasar induk kembali turun pekan ini", ARTICLE + " (repost)"],
+        "ENGAGEMENTS": [10, 5, 7],
+        "VIEWS": [100, 50, 70],
+        "FOLLOWERS": [1000, 500, 700],
+    })
+
+
+def test_reposts_share_a_cluster(tmp_path):
+    df = near_duplicates.ensure_clusters(_posts(), path=str(tmp_path))
+    assert df[near_duplicates.CLUSTER_ID_COLUMN].tolist() == [0, 1, 0]
+
+
+def test_collapse_sums_metrics_per_cluster(tmp_path):
+    collapsed = near_duplicates.collapse(near_duplicates.ensure_clusters(_posts(), path=str(tmp_path)))
+    assert collapsed["KONTEN"].tolist() == [ARTICLE, "Harga beras di pasar induk kembali turun pekan ini"]
+    assert collapsed[near_duplicates.DUPLICATES_COLUMN].tolist() == [2, 1]
+    assert collapsed["ENGAGEMENTS"].tolist() == [17, 5]
+    assert collapsed["VIEWS"].tolist() == [170, 50]
+    assert collapsed["FOLLOWERS"].tolist() == [1000, 500]  # Not summed: a property of the account
+
+
+def test_collapse_keeps_comparison_sides_apart(tmp_path):
+    df = near_duplicates.ensure_clusters(_posts(), path=str(tmp_path))
+    df[LABEL_COLUMN] = ["A", "A", "B"]
+    collapsed = near_duplicates.collapse(df)
+    assert collapsed[LABEL_COLUMN].tolist() == ["A", "A", "B"]
+    assert collapsed["ENGAGEMENTS"].tolist() == [10, 5, 7]
@@ -0,0 +1,58 @@
+# tests/test_parallel_search.py
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parallel_search
+from keyword_matcher import build_matcher
+
+WORDS = ["bahlil", "prabowo", "menteri keuangan", "purbaya", "harga beras", "tiktok", "Energi", "BBM"]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(parallel_search, "PARALLEL_SEARCH_PROCESSES", 2)
+    monkeypatch.setattr(parallel_search, "PARALLEL_SEARCH_MIN_ROWS", 10)
+    monkeypatch.setattr(parallel_search, "_executor", None)
+    monkeypatch.setattr(parallel_search, "_buffers", {})
+    monkeypatch.setattr(parallel_search, "_current_key", None)
+    yield
+    parallel_search._shutdown()
+
+
+def _dataset(version, n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    texts = [" ".join(rng.choice(WORDS + ["dan", "yang", "ini"], size=rng.integers(0, 8))) for _ in range(n)]
+    texts[::37] = [None] * len(texts[::37])  # NaN KONTEN
+    df = pd.DataFrame({"KONTEN": texts})
+    df.attrs["dataset_version"] = version
+    return df
+
+
+def test_parallel_matches_serial_matcher(pool):
+    df = _dataset("v1")
+    rng = np.random.default_rng(1)
+    positions = np.sort(rng.choice(len(df), size=300, replace=False))
+    assert parallel_search.is_applicable(positions)
+    texts = df['KONTEN'].to_numpy()[positions].tolist()
+    for _ in range(10):
+        strict_groups = [list(rng.choice(WORDS, size=rng.integers(1, 3), replace=False)) for _ in range(rng.integers(0, 3))]
+        fallback_keywords = list(rng.choice(WORDS, size=rng.integers(0, 4), replace=False))
+        groups, fallback = parallel_search.match_groups(df, positions, strict_groups, fallback_keywords)
+        group_masks, fallback_mask = build_matcher(strict_groups, fallback_keywords).evaluate(
+            texts, strict_groups, fallback_keywords
+        )
+        assert [g.tolist() for g in groups] == [np.flatnonzero(m).tolist() for m in group_masks]
+        assert fallback.tolist() == np.flatnonzero(fallback_mask).tolist()
+
+
+def test_new_dataset_version_keeps_buffer_of_running_query(pool):
+    old_key, old_names, _ = parallel_search._acquire(_dataset("v1"))  # a query still in flight
+    parallel_search.match_groups(_dataset("v2", seed=2), np.arange(50), [["bahlil"]], [])
+
+    shared_memory.SharedMemory(name=old_names[0]).close()  # still attachable
+    parallel_search._release(old_key)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=old_names[0])
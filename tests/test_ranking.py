@@ -0,0 +1,46 @@
+# tests/test_ranking.py
+import numpy as np
+import pandas as pd
+
+from ranking import SCORE_COLUMN, rank_results
+
+
+def _master(texts, engagements=None):
+    df = pd.DataFrame({"KONTEN": texts, "ENGAGEMENTS": engagements if engagements is not None else [0] * len(texts)})
+    df.attrs["dataset_version"] = f"ranking:{len(texts)}"
+    return df
+
+
+def test_more_keyword_matches_rank_higher():
+    df = _master([
+        "bahlil energi",                     # both keywords
+        "bahlil bahlil bahlil rapat",        # one keyword, often
+        "bahlil rapat kabinet hari ini",     # one keyword, once, longer post
+        "harga beras naik",
+    ])
+    ranked = rank_results(df, df.iloc[:3], [], ["bahlil", "energi"], cap=0)
+    scores = ranked[SCORE_COLUMN].tolist()
+    assert scores[0] > scores[1] > scores[2]
+    assert ranked.index.tolist() == [0, 1, 2]  # Scoring keeps the row order
+
+
+def test_engagement_breaks_ties():
+    df = _master(["bahlil rapat", "bahlil rapat", "bahlil rapat"], engagements=[10, 1000, 0])
+    scores = rank_results(df, df, [], ["bahlil"], cap=0)[SCORE_COLUMN]
+    assert scores.idxmax() == 1 and scores.idxmin() == 2
+
+
+def test_cap_keeps_best_scored_rows():
+    rng = np.random.default_rng(5)
+    texts = [" ".join(rng.choice(["bahlil", "energi", "rapat", "kabinet", "harga"], size=rng.integers(1, 8))) for _ in range(50)]
+    df = _master(texts, engagements=rng.integers(0, 100, size=50).tolist())
+    full = rank_results(df, df, [["bahlil", "energi"]], ["bahlil"], cap=0)
+    capped = rank_results(df, df, [["bahlil", "energi"]], ["bahlil"], cap=10)
+    assert len(capped) == 10
+    assert sorted(capped.index) == sorted(full[SCORE_COLUMN].nlargest(10, keep='first').index)
+    assert rank_results(df, df.iloc[:5], [], ["bahlil"], cap=10).index.tolist() == [0, 1, 2, 3, 4]
+
+
+def test_empty_result_is_returned_unchanged():
+    df = _master(["bahlil"])
+    assert rank_results(df, df.iloc[:0], [], ["bahlil"]).empty
@@ -0,0 +1,78 @@
+# tests/test_result_cache.py
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import result_cache
+import utils
+
+AUGUST = ["2025-08-01", "2025-08-31"]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    result_cache.clear()
+    monkeypatch.setitem(result_cache._stats, "narrowed", 0)
+
+
+def _narrowed_equals_fresh(df, strict_groups, fallback_keywords, dates):
+    narrowed = utils.search_data(df, strict_groups, fallback_keywords, dates)
+    fresh, _ = utils._run_search(df, strict_groups, fallback_keywords, dates)
+    pd.testing.assert_frame_equal(narrowed, fresh)
+    return narrowed
+
+
+@pytest.mark.parametrize("plan", [
+    ([["bahlil"]], ["bahlil"]),
+    ([["menteri", "keuangan"], ["purbaya"]], []),
+    ([], []),
+])
+def test_range_inside_range_is_narrowed_exactly(master_df, plan):
+    utils.search_data(master_df, *plan, AUGUST)
+    narrowed = _narrowed_equals_fresh(master_df, *plan, ["2025-08-10", "2025-08-20"])
+    assert result_cache._stats["narrowed"] == 1
+    assert not narrowed.empty
+
+
+def test_day_list_inside_range_is_narrowed_exactly(master_df):
+    utils.search_data(master_df, [["harga", "beras"]], ["beras"], AUGUST)
+    _narrowed_equals_fresh(master_df, [["harga", "beras"]], ["beras"], ["2025-08-03", "2025-08-09", "2025-08-21"])
+    assert result_cache._stats["narrowed"] == 1
+
+
+def test_range_is_not_narrowed_from_day_list(master_df):
+    utils.search_data(master_df, [["bahlil"]], [], ["2025-08-03", "2025-08-09", "2025-08-21"])
+    _narrowed_equals_fresh(master_df, [["bahlil"]], [], ["2025-08-03", "2025-08-09"])
+    assert result_cache._stats["narrowed"] == 0
+
+
+def test_capped_result_is_not_narrowed(master_df, monkeypatch):
+    monkeypatch.setattr(utils, "SEARCH_RESULT_CAP", 5)
+    monkeypatch.setattr(utils, "rank_results", functools.partial(utils.rank_results, cap=5))
+    utils.search_data(master_df, [["bahlil"]], [], AUGUST)
+    _narrowed_equals_fresh(master_df, [["bahlil"]], [], ["2025-08-10", "2025-08-20"])
+    assert result_cache._stats["narrowed"] == 0
+
+
+def test_semantic_result_is_not_narrowed(master_df, monkeypatch):
+    calls = []
+
+    def semantic_search(dataframe, query_text, date_positions):
+        calls.append(query_text)
+        return date_positions[:20], np.linspace(1, 0.5, len(date_positions[:20]))
+    monkeypatch.setattr(utils.semantic_index, "SEMANTIC_SEARCH", True)
+    monkeypatch.setattr(utils.semantic_index, "search", semantic_search)
+
+    utils.search_data(master_df, [], ["tidak ada di data"], AUGUST)
+    utils.search_data(master_df, [], ["tidak ada di data"], ["2025-08-01", "2025-08-05"])
+    assert result_cache._stats["narrowed"] == 0
+    assert len(calls) == 2  # The narrower window ran its own semantic search
+
+
+def test_key_separates_dates_from_search(master_df):
+    key = result_cache.make_key(master_df, [["Bahlil"]], ["bahlil"], ["2025-08-31", "2025-08-01"], 0, False)
+    other = result_cache.make_key(master_df, [["bahlil"]], ["BAHLIL"], ["2025-08-10"], 0, False)
+    assert key.dates == ("2025-08-01", "2025-08-31")
+    assert key.search == other.search
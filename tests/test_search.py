@@ -0,0 +1,81 @@
+# tests/test_search.py
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import result_cache
+import utils
+from columns import ROW_ID_COLUMN
+from ranking import SCORE_COLUMN
+
+AUGUST = ["2025-08-01", "2025-08-31"]
+WORDS = ["bahlil", "prabowo", "menteri", "keuangan", "purbaya", "harga", "beras", "energi", "bbm", "tidak ada"]
+
+
+@pytest.fixture(autouse=True)
+def no_aliases(monkeypatch):
+    # Compare against the plain keyword semantics; alias expansion is a separate layer
+    monkeypatch.setattr(utils.entity_aliases, "expand_plan", lambda groups, keywords: (groups, keywords))
+    result_cache.clear()
+
+
+def _old_search_row_ids(df, strict_groups, fallback_keywords, dates):
+    """The original str.contains search (before the matcher rewrite), as a set of ROW IDs."""
+    dated = df[utils._date_mask(df['TANGGAL PUBLIKASI'], dates)] if dates else df
+    if not strict_groups and not fallback_keywords:
+        return set(dated[ROW_ID_COLUMN])
+    contains = lambda keyword: dated['KONTEN'].str.contains(keyword, case=False, na=False, regex=False)
+    strict = set()
+    for group in strict_groups:
+        if group:
+            strict |= set(dated[np.logical_and.reduce([contains(k) for k in group])][ROW_ID_COLUMN])
+    if strict or not fallback_keywords:
+        return strict
+    return set(dated[np.logical_or.reduce([contains(k) for k in fallback_keywords])][ROW_ID_COLUMN])
+
+
+def _plans():
+    rng = np.random.default_rng(11)
+    plans = [
+        ([], ["bahlil"]),
+        ([[]], ["bahlil"]),                           # Empty strict group
+        ([["tidak ada"]], ["harga", "beras"]),        # Tier 2 only because tier 1 is empty
+        ([["bahlil"]], ["harga"]),                    # Tier 1 found rows: fallback is not added
+        ([["menteri", "keuangan"], ["purbaya"]], []),  # Union of AND groups
+        ([["tidak ada"]], ["tidak ada"]),             # Nothing at all
+        ([], []),
+    ]
+    for _ in range(20):
+        groups = [list(rng.choice(WORDS, size=rng.integers(0, 3), replace=False)) for _ in range(rng.integers(0, 3))]
+        plans.append((groups, list(rng.choice(WORDS, size=rng.integers(0, 3), replace=False))))
+    return plans
+
+
+@pytest.mark.parametrize("plan", _plans())
+@pytest.mark.parametrize("dates", [AUGUST, ["2025-09-05"], ["2025-08-02", "2025-08-15", "2025-09-20"], []])
+def test_row_ids_match_old_search(master_df, plan, dates):
+    result, narrowable = utils._run_search(master_df, *plan, dates)
+    assert set(result[ROW_ID_COLUMN]) == _old_search_row_ids(master_df, *plan, dates)
+    assert len(result) == result[ROW_ID_COLUMN].nunique()
+    assert result['TANGGAL PUBLIKASI'].is_monotonic_increasing
+    assert narrowable
+
+
+def test_no_rows_in_window_keeps_columns(master_df):
+    result, _ = utils._run_search(master_df, [["bahlil"]], [], ["2024-01-01"])
+    assert result.empty and list(result.columns) == list(master_df.columns)
+
+
+def test_result_cap_keeps_best_rows_and_is_not_narrowable(master_df, monkeypatch):
+    monkeypatch.setattr(utils, "SEARCH_RESULT_CAP", 10)
+    monkeypatch.setattr(utils, "rank_results", functools.partial(utils.rank_results, cap=10))
+    result, narrowable = utils._run_search(master_df, [], ["bahlil"], AUGUST)
+    assert len(result) == 10 and not narrowable
+    assert result['TANGGAL PUBLIKASI'].is_monotonic_increasing
+
+    monkeypatch.setattr(utils, "rank_results", functools.partial(utils.rank_results, cap=0))
+    full, _ = utils._run_search(master_df, [], ["bahlil"], AUGUST)
+    best = full.set_index(ROW_ID_COLUMN)[SCORE_COLUMN].nlargest(10, keep='first')
+    assert set(result[ROW_ID_COLUMN]) == set(best.index)
@@ -0,0 +1,20 @@
+# tests/test_structured_context.py
+import utils
+
+
+def test_context_is_memoized_and_copied(master_df, monkeypatch):
+    builds = []
+    build = utils._build_structured_context
+    monkeypatch.setattr(utils, "_build_structured_context", lambda df: builds.append(len(df)) or build(df))
+    utils._context_cache.clear()
+    result = master_df.iloc[10:200]
+
+    first = utils.generate_structured_context_from_data(result)
+    expected = repr(first)
+    first["top_viral_posts"].append("diubah oleh pemanggil")
+    first["daily_trends"]["trend_data"].clear()
+
+    second = utils.generate_structured_context_from_data(result)
+    assert builds == [190]  # Served from the cache, not rebuilt
+    assert repr(second) == expected
+    assert second is not first
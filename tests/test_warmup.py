@@ -0,0 +1,33 @@
+# tests/test_warmup.py
+import pandas as pd
+import pytest
+
+import warmup
+
+
+@pytest.fixture(autouse=True)
+def fresh_warmup(monkeypatch):
+    monkeypatch.setattr(warmup, "_thread", None)
+    monkeypatch.setattr(warmup, "_state", {"status": "idle", "steps": {}, "error": None, "started_at": None, "finished_at": None})
+    monkeypatch.setattr(warmup, "_import_modules", lambda: None)
+
+
+def test_failed_warmup_is_retried(monkeypatch):
+    calls = []
+
+    def load_empty(data_file):
+        calls.append(data_file)
+        return pd.DataFrame()
+    load_empty.clear = lambda: calls.append("clear")
+
+    warmup.start("data.xlsx", load_empty)
+    assert not warmup.wait(5)
+    assert warmup.status()["status"] == "failed"
+
+    warmup.start("data.xlsx", load_empty)  # Still within WARMUP_RETRY_SECONDS: no-op
+    assert calls == ["data.xlsx", "clear"]
+
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_SECONDS", 0)
+    warmup.start("data.xlsx", load_empty)
+    assert not warmup.wait(5)
+    assert calls == ["data.xlsx", "clear", "data.xlsx", "clear"]
@@ -0,0 +1,102 @@
+# tests/test_workers.py
+import threading
+import time
+
+import pytest
+
+import workers
+
+
+@pytest.fixture
+def pool():
+    return workers.WorkerPool(threads=1, max_queue=8, max_per_session=2, io_threads=2)
+
+
+def test_run_timeout_cancels_queued_job_and_frees_its_slot(pool):
+    release = threading.Event()
+    blocker = pool.submit("s", release.wait)
+    with pytest.raises(workers.WorkerTimeoutError):
+        pool.run("s", lambda: "late", timeout=0.1)  # queued behind the blocker
+    release.set()
+    blocker.result(timeout=5)
+    # Both slots of the session are free again
+    assert pool.run("s", lambda: "ok", timeout=5) == "ok"
+    assert pool.run("s", lambda: "ok", timeout=5) == "ok"
+
+
+def test_stream_timeout_closes_abandoned_stream(pool, monkeypatch):
+    monkeypatch.setattr(workers, "WORKER_JOB_TIMEOUT", 0.2)
+    closed = threading.Event()
+
+    def slow_stream():
+        try:
+            yield "a"
+            time.sleep(0.5)
+            yield "b"
+            yield "c"
+        finally:
+            closed.set()
+
+    chunks = []
+    with pytest.raises(workers.WorkerTimeoutError):
+        for chunk in pool.stream("s", slow_stream()):
+            chunks.append(chunk)
+    assert chunks == ["a"]
+    assert closed.wait(timeout=5)
+
+
+def test_worker_thread_does_not_keep_session_context(pool, monkeypatch):
+    session_ctx = object()
+    monkeypatch.setattr(workers, "get_script_run_ctx", lambda suppress_warning=False: session_ctx)
+    monkeypatch.setattr(workers, "add_script_run_ctx",
+                        lambda thread, ctx: setattr(thread, workers.SCRIPT_RUN_CONTEXT_ATTR_NAME, ctx))
+    seen = pool.run("s", lambda: getattr(threading.current_thread(), workers.SCRIPT_RUN_CONTEXT_ATTR_NAME, None))
+    assert seen is session_ctx
+
+    # A later context-less job (API, warm-up) on the same pooled thread sees no session
+    monkeypatch.setattr(workers, "get_script_run_ctx", lambda suppress_warning=False: None)
+    assert pool.run("s", lambda: getattr(threading.current_thread(), workers.SCRIPT_RUN_CONTEXT_ATTR_NAME, None)) is None
+
+
+def test_submit_many_admits_all_jobs_or_none(pool):
+    release = threading.Event()
+    blocker = pool.submit("s", release.wait)  # e.g. a history save still running
+    with pytest.raises(workers.WorkerBusyError):
+        pool.submit_many("s", [(lambda: "a", (), {}), (lambda: "b", (), {})])
+    release.set()
+    blocker.result(timeout=5)
+
+    # Nothing of the refused batch was queued, so the whole batch fits now
+    futures = pool.submit_many("s", [(lambda: "a", (), {}), (lambda: "b", (), {})])
+    assert [f.result(timeout=5) for f in futures] == ["a", "b"]
+
+
+def test_io_admission_per_session(pool):
+    # io_threads=2 and two I/O jobs per session: one session cannot take more than its two slots
+    release = threading.Event()
+
+    def blocked_stream():
+        release.wait(5)
+        yield "x"
+
+    first = pool.stream("a", blocked_stream())
+    second = pool.stream("a", blocked_stream())
+    with pytest.raises(workers.WorkerBusyError):
+        pool.stream("a", iter(["z"]))
+    with pytest.raises(workers.WorkerBusyError):
+        pool.run_io("a", lambda: "z", timeout=1)
+
+    # Another session is admitted; it waits in the I/O queue until a slot frees up
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(b=pool.run_io("b", lambda: "b", timeout=5)))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while workers.metrics.gauges().get("workers.io_queued") != 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert workers.metrics.gauges()["workers.io_queued"] == 1
+    release.set()
+    assert list(first) == ["x"] and list(second) == ["x"]
+    waiter.join(timeout=5)
+    assert result == {"b": "b"}
+    assert pool.run_io("a", lambda: "ok", timeout=5) == "ok"
+    assert workers.metrics.gauges()["workers.io_queued"] == 0
@@ -2,23 +2,50 @@
 
 import streamlit as st
 import pandas as pd
-import openai
+import numpy as np
 from dotenv import load_dotenv
 import os
+import copy
 import json
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
-import time
+import llm_client
+import llm_backend
+import metrics
+import parallel_search
+import semantic_index
+import anomaly_index
+import near_duplicates
+import entity_aliases
+import result_cache
+import drilldown
+import comparison
+from keyword_matcher import build_matcher
+from ranking import rank_results, SCORE_COLUMN, SEARCH_RESULT_CAP
+from columns import ROW_ID_COLUMN
+
 
 def configure_openai():
     load_dotenv()
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    if not openai.api_key:
-        st.error("OpenAI API key not found. Please create a .env file with your key.")
+    if llm_backend.get_backend().name != "openai":
+        return  # Offline backends need no API key
+    try:
+        llm_client.get_client()
+    except llm_client.LLMUnavailableError as e:
+        st.error(str(e))
         st.stop()
 
 @st.cache_data
 def load_data(file_path="data_full.xlsx"):
     """Memuat, membersihkan, dan menyiapkan dataset."""
+    # Span di dalam fungsi: hanya cache miss (parse sebenarnya) yang tercatat, bukan cache hit tiap rerun
+    with metrics.span("load_data"):
+        return _load_data(file_path)
+
+
+def _load_data(file_path):
     try:
         df = pd.read_excel(file_path)
 
@@ -35,12 +62,33 @@ def load_data(file_path="data_full.xlsx"):
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
+        # ROW ID: posisi stabil baris di dataset master, ikut terbawa ke setiap hasil pencarian
+        df.reset_index(drop=True, inplace=True)
+        df[ROW_ID_COLUMN] = np.arange(len(df))
+
+        # Versi dataset (path + mtime + size) untuk cache dan index turunan; ikut tersalin ke subset DataFrame
+        file_stat = os.stat(file_path)
+        df.attrs["dataset_version"] = f"{os.path.abspath(file_path)}:{file_stat.st_mtime_ns}:{file_stat.st_size}"
+
+        # Cluster near-duplicate (repost/sindikasi) per KONTEN, juga dihitung saat ingest
+        if near_duplicates.NEAR_DUPLICATES:
+            near_duplicates.ensure_clusters(df)
+
+        # Embedding semantik dihitung saat ingest (inkremental), tidak pernah saat query
+        if semantic_index.SEMANTIC_SEARCH:
+            semantic_index.ensure_index(df)
+
+        # Deteksi lonjakan harian (per TOPIK/GRUP, volume & negatif) juga dihitung saat ingest
+        if anomaly_index.ANOMALY_DETECTION:
+            anomaly_index.ensure_index(df)
+
         return df
     except FileNotFoundError:
         st.error(f"Error: File {file_path} tidak ditemukan.")
         return pd.DataFrame()
 
 
+@metrics.timed("classify_prompt_and_extract_entities")
 def classify_prompt_and_extract_entities(current_prompt, previous_prompt=""):
     system_prompt = """
     You are an expert prompt analyzer for a data dashboard. Your goal is to provide a structured and precise search plan.
@@ -61,24 +109,22 @@ def classify_prompt_and_extract_entities(current_prompt, previous_prompt=""):
 
     5.  **Handle Corrections**: If the current prompt seems to be correcting a typo, extract keywords from the **corrected version only**.
 
-    6.  **Apply Specific Expansions**: To ensure comprehensive results for key topics, apply can apply the following expansions as example for broader cases:
-        - If the entity is "Prabowo", you MUST also add "Presiden".
-        - If the entity is "Setneg", you MUST also add "Sekertariat Negara".
-        - If the entity is "Bahlil", you MUST also add his full name "Bahlil Lahadalia".
-        - If the entity is "Menkeu Purbaya", you MUST also add his full tittle "Menteri Keuangan Purbaya".
-
-    7.  **Exclude Non-Searchable Terms**: Do NOT include instructional or conversational words in the keywords. Focus only on the 'who' or 'what'.
+    6.  **Exclude Non-Searchable Terms**: Do NOT include instructional or conversational words in the keywords. Focus only on the 'who' or 'what'.
     
-    8.  **For "Follow-Up" prompts** (that are NOT simple date changes), `strict_groups` and `fallback_keywords` MUST be empty `[]`.
+    7.  **For "Follow-Up" prompts** (that are NOT simple date changes), `strict_groups` and `fallback_keywords` MUST be empty `[]`.
 
-    9.  **Handle Month-Only Queries**: If a user's prompt consists only of a month name (e.g., "agustus", "januari","full september","seluruh apri"), you must interpret this as a date range for the entire month. For example, "agustus" becomes `["2025-08-01", "2025-08-31"]`.
+    8.  **Handle Month-Only Queries**: If a user's prompt consists only of a month name (e.g., "agustus", "januari","full september","seluruh apri"), you must interpret this as a date range for the entire month. For example, "agustus" becomes `["2025-08-01", "2025-08-31"]`.
     
-    10. **Handle Keyword-Only Non-People Topics**:
+    9.  **Handle Keyword-Only Non-People Topics**:
     - If the prompt only mentions a non-person topic (e.g., "ekonomi", "keuangan","kementerian") without any date, classify it as **New Topic**.
     - Generate `strict_groups` and `fallback_keywords` based on the core topic(s).
     - Apply optional expansions for relevance (e.g., "ekonomi" can add "keuangan").
 
-    **Output**: Return a single, minified JSON object with keys "type", "dates", "strict_groups", and "fallback_keywords".
+    10. **Drill-Down Filters**: If a "Follow-Up" prompt narrows the current data by sentiment, topic, group, account, source, location or a metric threshold (e.g., "yang negatif saja", "dari akun detikcom", "engagement di atas 1000"), put them in `filters` with the keys "SENTIMEN" (values "Positif", "Netral", "Negatif"), "TOPIK", "GRUP", "AKUN", "SUMBER", "LOKASI" (lists of values) and "min" / "max" (objects mapping ENGAGEMENTS, VIEWS, FOLLOWERS, LIKES, COMMENTS, SHARES or REACTIONS to a number). To remove a filter again (e.g., "tampilkan semua sentimen lagi", "tanpa batas engagement"), return its key with an empty value: `"SENTIMEN": []`, or `null` for a threshold (`"min": {"ENGAGEMENTS": null}`); filters that are not mentioned stay active. Otherwise `filters` is `{}`.
+
+    11. **Comparisons**: If the prompt compares two or more topics or periods (e.g., "bandingkan Prabowo vs Bahlil", "agustus vs september"), classify it as **"Comparison"** and put one search plan per side in `comparisons`: a list of objects with "label", "dates", "strict_groups" and "fallback_keywords". A side that only changes the period keeps empty keyword lists; a side without its own dates keeps `dates` empty and the shared dates go in the top-level `dates`. For other types `comparisons` is `[]`.
+
+    **Output**: Return a single, minified JSON object with keys "type", "dates", "strict_groups", "fallback_keywords", "filters", and "comparisons".
 
     ---
     **EXAMPLES OF CORRECT BEHAVIOR:**
@@ -88,13 +134,13 @@ def classify_prompt_and_extract_entities(current_prompt, previous_prompt=""):
     Current Prompt: "kalau 23 agustus?"
     Result: {{"type":"Follow-Up","dates":["2025-08-23"],"strict_groups":[],"fallback_keywords":[]}}
 
-    **Example 2 (Prabowo -> Presiden):**
+    **Example 2 (Person With Date):**
     Prompt: "data prabowo 18 agustus"
-    Result: {{"type":"New Topic","dates":["2025-08-18"],"strict_groups":[["prabowo"],["prabowo subianto"],["presiden"]],"fallback_keywords":["Prabowo","Prabowo Subianto","Presiden"]}}
+    Result: {{"type":"New Topic","dates":["2025-08-18"],"strict_groups":[["prabowo"]],"fallback_keywords":["Prabowo"]}}
 
-    **Example 3 (Bahlil -> Bahlil Lahadalia):**
+    **Example 3 (Person Without Date):**
     Prompt: "data tentang Bahlil"
-    Result: {{"type":"New Topic","dates":[],"strict_groups":[["Bahlil"],["Bahlil Lahadalia"]],"fallback_keywords":["Bahlil","Bahlil Lahadalia"]}}
+    Result: {{"type":"New Topic","dates":[],"strict_groups":[["Bahlil"]],"fallback_keywords":["Bahlil"]}}
 
     **Example 4 (Month-Only Follow-Up):**
     Previous Prompt: "data tentang bahlil lahadalia"
@@ -123,169 +169,343 @@ def classify_prompt_and_extract_entities(current_prompt, previous_prompt=""):
     **Example 9 (Initial Query/Follow-Up with Keyword-Only Non-People Topic):**
     Prompt: "Data ekonomi bulan Mei"
     Result: {"type":"New Topic","dates":["2025-05-01","2025-05-31"],"strict_groups":[["Ekonomi"],["Keuangan"]],"fallback_keywords":["Keuangan","Ekonomi"]}
+
+    **Example 10 (Drill-Down Follow-Up):**
+    Previous Prompt: "data bahlil agustus"
+    Current Prompt: "yang negatif saja dari tiktok, engagement di atas 1000"
+    Result: {{"type":"Follow-Up","dates":[],"strict_groups":[],"fallback_keywords":[],"filters":{{"SENTIMEN":["Negatif"],"SUMBER":["Tiktok"],"min":{{"ENGAGEMENTS":1000}}}}}}
+
+    **Example 11 (Removing a Drill-Down Filter):**
+    Previous Prompt: "yang negatif saja dari tiktok, engagement di atas 1000"
+    Current Prompt: "tampilkan semua sentimen lagi"
+    Result: {{"type":"Follow-Up","dates":[],"strict_groups":[],"fallback_keywords":[],"filters":{{"SENTIMEN":[]}}}}
+
+    **Example 12 (Comparison of Two Topics):**
+    Prompt: "bandingkan prabowo vs bahlil bulan agustus"
+    Result: {{"type":"Comparison","dates":["2025-08-01","2025-08-31"],"strict_groups":[],"fallback_keywords":[],"comparisons":[{{"label":"Prabowo","dates":[],"strict_groups":[["Prabowo"]],"fallback_keywords":["Prabowo"]}},{{"label":"Bahlil","dates":[],"strict_groups":[["Bahlil"]],"fallback_keywords":["Bahlil"]}}]}}
+
+    **Example 13 (Comparison of Two Periods):**
+    Previous Prompt: "data bahlil agustus"
+    Current Prompt: "bandingkan agustus vs september"
+    Result: {{"type":"Comparison","dates":[],"strict_groups":[],"fallback_keywords":[],"comparisons":[{{"label":"Agustus","dates":["2025-08-01","2025-08-31"],"strict_groups":[],"fallback_keywords":[]}},{{"label":"September","dates":["2025-09-01","2025-09-30"],"strict_groups":[],"fallback_keywords":[]}}]}}
     --- END OF EXAMPLES ---
     **REMEMBER**: Return ONLY the JSON object. No explanations or additional text.
     """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Previous Prompt: \"{previous_prompt}\"\nCurrent Prompt: \"{current_prompt}\""}
-            ],
-            temperature=0.0, response_format={"type": "json_object"}
-        )
-        result = json.loads(response.choices[0].message.content)
+        response_content = llm_backend.get_backend().classify([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Previous Prompt: \"{previous_prompt}\"\nCurrent Prompt: \"{current_prompt}\""}
+        ])
+        result = json.loads(response_content)
         return {
             "type": result.get("type", "New Topic"),
             "dates": result.get("dates", []),
             "strict_groups": result.get("strict_groups", []),
-            "fallback_keywords": result.get("fallback_keywords", [])
+            "fallback_keywords": result.get("fallback_keywords", []),
+            "filters": drilldown.normalize_filters(result.get("filters", {})),
+            "comparisons": comparison.normalize_plans(result.get("comparisons", []))
         }
+    except llm_client.LLMUnavailableError as e:
+        st.warning(str(e))
+        return {"type": "New Topic", "dates": [], "strict_groups": [[current_prompt]], "fallback_keywords": [current_prompt]}
     except Exception as e:
         st.error(f"Error classifying prompt: {e}")
         return {"type": "New Topic", "dates": [], "strict_groups": [[current_prompt]], "fallback_keywords": [current_prompt]}
 
 
-def search_data(dataframe, strict_groups, fallback_keywords, dates):
+@metrics.timed("search_data")
+def search_data(dataframe, strict_groups, fallback_keywords, dates, collapse=False):
+    """Matching rows, ranked; collapse=True folds near-duplicate clusters into one row each."""
     if dataframe is None:
         return pd.DataFrame()
+    result_df = _cached_search(dataframe, strict_groups, fallback_keywords, dates)
+    return near_duplicates.collapse(result_df) if collapse else result_df
+
+
+def _cached_search(dataframe, strict_groups, fallback_keywords, dates):
+    # Repeated searches (any session) are served from the shared result cache
+    cache_key = result_cache.make_key(
+        dataframe, strict_groups, fallback_keywords, dates, SEARCH_RESULT_CAP, semantic_index.SEMANTIC_SEARCH
+    )
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return result_cache.materialize(dataframe, cached)
+
+    # A narrower date window for the same keywords (e.g. a date follow-up) filters the wider cached result
+    result_df, narrowable = None, False
+    wider = result_cache.find_wider(cache_key, lambda outer, inner: _window_contains(_date_window(outer), _date_window(inner)))
+    if wider is not None:
+        result_df = _narrow_result(dataframe, wider, strict_groups, fallback_keywords, dates)
+        narrowable = result_df is not None
+    if result_df is None:
+        result_df, narrowable = _run_search(dataframe, strict_groups, fallback_keywords, dates)
+    result_cache.put(cache_key, dataframe, result_df, SCORE_COLUMN, narrowable)
+    return result_df
+
+
+def _date_mask(publish_dates, dates):
+    """Boolean array: publication day equals the single date, lies in the [start, end] range, or is in the list."""
+    target_dates = sorted([pd.to_datetime(d).normalize() for d in dates])
+    publish_dates = publish_dates.dt.normalize()
+
+    if len(target_dates) == 1:
+        date_mask = publish_dates == target_dates[0]
+    elif len(target_dates) == 2:
+        start_date, end_date = target_dates[0], target_dates[1]
+        date_mask = (publish_dates >= start_date) & (publish_dates <= end_date)
+    else:
+        date_mask = publish_dates.isin(target_dates)
+    return date_mask.to_numpy()
+
+
+def _date_window(dates):
+    """Days selected by `dates` as (first, last, explicit day set or None for a range); None = no date filter."""
+    if not dates:
+        return None
+    days = sorted(pd.to_datetime(d).normalize() for d in dates)
+    return days[0], days[-1], (set(days) if len(days) > 2 else None)
+
+
+def _window_contains(outer, inner):
+    if outer is None:
+        return True
+    if inner is None:
+        return False
+    outer_first, outer_last, outer_days = outer
+    inner_first, inner_last, inner_days = inner
+    if outer_days is None:
+        return outer_first <= inner_first and inner_last <= outer_last
+    if inner_days is None:
+        inner_days = set(pd.date_range(inner_first, inner_last, freq='D'))
+    return inner_days <= outer_days
+
+
+def _narrow_result(dataframe, wider, strict_groups, fallback_keywords, dates):
+    """
+    Filters a cached result (CachedResult) down to `dates`. Returns None when the outcome could
+    differ from a full search: when none of its rows fall in the new window, the full search might
+    still find rows through a lower tier.
+    """
+    positions = wider.positions[_date_mask(dataframe['TANGGAL PUBLIKASI'].iloc[wider.positions], dates)]
+    if not strict_groups and not fallback_keywords:
+        return dataframe.iloc[positions]
+    if len(positions) == 0:
+        return None
+
+    # Re-scored on the subset (engagement is normalised per result); the date order is kept
+    strict_groups, fallback_keywords = entity_aliases.expand_plan(strict_groups, fallback_keywords)
+    return rank_results(dataframe, dataframe.iloc[positions], strict_groups, fallback_keywords)
+
+
+def _run_search(dataframe, strict_groups, fallback_keywords, dates):
+    """
+    Full search. Returns (result, narrowable): narrowable is False when the result was cut
+    (semantic top-K or result cap), so a subset of it would not match a fresh search.
+    """
+    # Entity aliases (Prabowo -> Presiden, Setneg -> Sekretariat Negara, ...) come from the alias table
+    strict_groups, fallback_keywords = entity_aliases.expand_plan(strict_groups, fallback_keywords)
 
     # --- STEP 1: APPLY DATE FILTER FIRST ---
-    date_filtered_df = dataframe.copy()
+    # Works on master row positions; rows are only materialised once, for the final result
+    date_positions = np.arange(len(dataframe))
     if dates:
-        target_dates = sorted([pd.to_datetime(d).date() for d in dates])
-
-        if len(target_dates) == 1:
-            date_filtered_df = date_filtered_df[date_filtered_df['TANGGAL PUBLIKASI'].dt.date == target_dates[0]]
-        elif len(target_dates) == 2:
-            start_date, end_date = target_dates[0], target_dates[1]
-            date_filtered_df = date_filtered_df[
-                (date_filtered_df['TANGGAL PUBLIKASI'].dt.date >= start_date) &
-                (date_filtered_df['TANGGAL PUBLIKASI'].dt.date <= end_date)
-            ]
-        else:
-            date_filtered_df = date_filtered_df[date_filtered_df['TANGGAL PUBLIKASI'].dt.date.isin(target_dates)]
-
-    if date_filtered_df.empty:
-        return pd.DataFrame()
+        date_positions = np.flatnonzero(_date_mask(dataframe['TANGGAL PUBLIKASI'], dates))
+
+    if len(date_positions) == 0:
+        return dataframe.iloc[:0], False
 
     # --- FIX: If no keywords are provided, return all data for the filtered date range ---
     if not strict_groups and not fallback_keywords:
-        return date_filtered_df.sort_values(by='TANGGAL PUBLIKASI')
+        return dataframe.iloc[date_positions].sort_values(by='TANGGAL PUBLIKASI', kind='stable'), True
 
     # --- STEP 2: NOW, PERFORM KEYWORD SEARCH ONLY ON THE DATE-FILTERED DATA ---
-    # TIER 1: Strict Search
-    strict_results_df = pd.DataFrame()
-    if strict_groups:
-        all_matched_dfs = []
-        for group in strict_groups:
-            if not group: continue
-            temp_df = date_filtered_df.copy()
-            for keyword in group:
-                temp_df = temp_df[temp_df['KONTEN'].str.contains(keyword, case=False, na=False)]
-                if temp_df.empty: break
-            if not temp_df.empty:
-                all_matched_dfs.append(temp_df)
-
-        if all_matched_dfs:
-            strict_results_df = pd.concat(all_matched_dfs).drop_duplicates().reset_index(drop=True)
-
-    final_df = strict_results_df
+    # Both tiers are evaluated in a single pass per post by one multi-pattern matcher.
+    # Large windows are matched across a process pool; results are identical to the serial path.
+    if parallel_search.is_applicable(date_positions):
+        group_hits, fallback_hits = parallel_search.match_groups(
+            dataframe, date_positions, strict_groups, fallback_keywords
+        )
+    else:
+        matcher = build_matcher(strict_groups, fallback_keywords)
+        group_masks, fallback_mask = matcher.evaluate(
+            dataframe['KONTEN'].to_numpy()[date_positions], strict_groups, fallback_keywords
+        )
+        group_hits = [np.flatnonzero(mask) for mask in group_masks]
+        fallback_hits = np.flatnonzero(fallback_mask)
+
+    # TIER 1: Strict Search (union of the groups; AND within a group is resolved by the matcher)
+    final_positions = np.empty(0, dtype=np.int64)
+    if strict_groups and group_hits:
+        final_positions = date_positions[np.unique(np.concatenate(group_hits))]
 
     # TIER 2: Fallback Search (if Tier 1 found nothing)
-    if final_df.empty and fallback_keywords:
-        search_pattern = '|'.join(fallback_keywords)
-        fallback_df = date_filtered_df[date_filtered_df['KONTEN'].str.contains(search_pattern, case=False, na=False)].copy()
-        final_df = fallback_df
+    if len(final_positions) == 0 and fallback_keywords:
+        final_positions = date_positions[fallback_hits]
+
+    # TIER 3: Semantic Search (paraphrases and spelling variants, if both keyword tiers found nothing)
+    semantic_scores = None
+    if len(final_positions) == 0 and semantic_index.SEMANTIC_SEARCH:
+        query_text = " ".join([k for group in strict_groups for k in group] + list(fallback_keywords))
+        final_positions, semantic_scores = semantic_index.search(dataframe, query_text, date_positions)
+
+    narrowable = semantic_scores is None and not (SEARCH_RESULT_CAP and len(final_positions) > SEARCH_RESULT_CAP)
+    final_df = dataframe.iloc[final_positions]
+
+    # Relevance scoring (BM25 + keyword hits + engagement) and optional top-K cap
+    final_df = rank_results(dataframe, final_df, strict_groups, fallback_keywords, extra_scores=semantic_scores)
 
     if not final_df.empty:
-        final_df = final_df.sort_values(by='TANGGAL PUBLIKASI')
+        final_df = final_df.sort_values(by='TANGGAL PUBLIKASI', kind='stable')
 
-    return final_df
+    return final_df, narrowable
 
 # --- NEW: Function to generate structured data for the AI ---
+# Structured contexts of recent results, keyed on the result's fingerprint
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "32"))
+_context_cache = OrderedDict()
+_context_cache_lock = threading.Lock()
+
+
+def _result_fingerprint(df):
+    """Identifies a result by dataset version + its master row IDs; None when that is not possible."""
+    version = df.attrs.get("dataset_version")
+    if version is None or ROW_ID_COLUMN not in df.columns:
+        return None
+    digest = hashlib.blake2b(df[ROW_ID_COLUMN].to_numpy(dtype=np.int64).tobytes(), digest_size=16)
+    if comparison.LABEL_COLUMN in df.columns:
+        # The same rows split differently across comparison sides are a different result
+        digest.update("\0".join(df[comparison.LABEL_COLUMN].astype(str)).encode("utf-8"))
+    if near_duplicates.DUPLICATES_COLUMN in df.columns:
+        # Collapsed rows carry metrics summed over their copies in this particular result
+        summed = [c for c in [near_duplicates.DUPLICATES_COLUMN] + near_duplicates.SUMMED_METRICS if c in df.columns]
+        digest.update(np.ascontiguousarray(df[summed].to_numpy(dtype=np.float64)).tobytes())
+    return version, len(df), digest.hexdigest()
+
+
+@metrics.timed("generate_structured_context_from_data")
 def generate_structured_context_from_data(df):
     """
     Generates a structured dictionary (JSON-like) containing the raw data
     that powers each visualization on the dashboard.
+    Memoized per result, so follow-up questions on the same data reuse it; every caller gets its
+    own copy, so changing it never alters the cached context of other sessions.
     """
     if df.empty:
         return {"error": "No data available."}
 
-    # Create a safe copy for calculations
-    df_copy = df.copy()
+    key = _result_fingerprint(df)
+    with _context_cache_lock:
+        if key is not None and key in _context_cache:
+            _context_cache.move_to_end(key)
+            return copy.deepcopy(_context_cache[key])
 
-    # --- Pre-calculate essential metrics ---
-    if 'ENGAGEMENTS' in df_copy.columns and 'VIEWS' in df_copy.columns:
-        df_copy['ENGAGEMENT RATE'] = df_copy.apply(
-            lambda row: row['ENGAGEMENTS'] / row['VIEWS'] if row['VIEWS'] > 0 else 0, axis=1)
-    else:
-        df_copy['ENGAGEMENT RATE'] = 0
+    structured_context = _build_structured_context(df)
 
-    if 'ENGAGEMENTS' in df_copy.columns and 'FOLLOWERS' in df_copy.columns:
-        df_copy['VIRALITY RATE'] = df_copy.apply(
-            lambda row: row['ENGAGEMENTS'] / row['FOLLOWERS'] if row['FOLLOWERS'] > 0 else 0, axis=1)
-    else:
-        df_copy['VIRALITY RATE'] = 0
+    if key is not None:
+        with _context_cache_lock:
+            _context_cache[key] = copy.deepcopy(structured_context)
+            while len(_context_cache) > CONTEXT_CACHE_SIZE:
+                _context_cache.popitem(last=False)
+    return structured_context
+
+
+def _column_array(df, column):
+    return df[column].to_numpy(dtype=np.float64) if column in df.columns else None
+
+
+def _safe_ratio(numerator, denominator):
+    """numerator / denominator per row, 0 where the denominator is not positive (or either is missing)."""
+    if numerator is None or denominator is None:
+        return None
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+
+def _mean_by_category(values, categories):
+    """Same as Series.groupby(categories).mean().sort_values(ascending=False), via bincount."""
+    codes, uniques = pd.factorize(categories, sort=True)
+    valid = codes >= 0
+    sums = np.bincount(codes[valid], weights=values[valid], minlength=len(uniques))
+    counts = np.bincount(codes[valid], minlength=len(uniques))
+    return pd.Series(sums / np.maximum(counts, 1), index=uniques).sort_values(ascending=False).to_dict()
+
+
+def _lookup_anomalies(df, start, end):
+    store = anomaly_index.get_index(df)
+    if store is None:
+        return []
+    categories = {dim: df[dim].dropna().astype(str).unique() for dim in anomaly_index.DIMENSIONS if dim in df.columns}
+    return store.lookup(start, end, categories)
+
+
+def _build_structured_context(df):
+    # --- Pre-calculate essential metrics (column arrays, no row-wise apply) ---
+    engagements = _column_array(df, 'ENGAGEMENTS')
+    views = _column_array(df, 'VIEWS')
+    followers = _column_array(df, 'FOLLOWERS')
+    n = len(df)
+    engagement_rate = _safe_ratio(engagements, views)
+    virality_rate = _safe_ratio(engagements, followers)
+    engagement_rate = engagement_rate if engagement_rate is not None else np.zeros(n)
+    virality_rate = virality_rate if virality_rate is not None else np.zeros(n)
+    publish_dates = df['TANGGAL PUBLIKASI']
 
     # --- 1. Headline Stats ---
-    total_posts = len(df_copy)
-    total_views = df_copy['VIEWS'].sum() if 'VIEWS' in df_copy.columns else 0
-    avg_engagement_rate = df_copy['ENGAGEMENT RATE'].mean()
-    min_date = df_copy['TANGGAL PUBLIKASI'].min().strftime('%Y-%m-%d')
-    max_date = df_copy['TANGGAL PUBLIKASI'].max().strftime('%Y-%m-%d')
+    total_posts = n
+    total_views = views.sum() if views is not None else 0
+    avg_engagement_rate = engagement_rate.mean()
+    min_date, max_date = publish_dates.min(), publish_dates.max()
 
     # --- 2. Sentiment Distribution ---
-    sentiment_counts = df_copy['SENTIMEN'].value_counts().to_dict() if 'SENTIMEN' in df_copy.columns else {}
+    sentiment_counts = df['SENTIMEN'].value_counts().to_dict() if 'SENTIMEN' in df.columns else {}
 
     # --- 3. Engagement by Category ---
-    engagement_by_topic = {}
-    if 'TOPIK' in df_copy.columns:
-        engagement_by_topic = df_copy.groupby('TOPIK')['ENGAGEMENT RATE'].mean().sort_values(ascending=False).to_dict()
-
-    engagement_by_grup = {}
-    if 'GRUP' in df_copy.columns:
-        engagement_by_grup = df_copy.groupby('GRUP')['ENGAGEMENT RATE'].mean().sort_values(ascending=False).to_dict()
-
-    # --- 4. Time Series Trends ---
-    daily_counts = {}
-    if 'TANGGAL PUBLIKASI' in df_copy.columns:
-        ts_data = df_copy.set_index('TANGGAL PUBLIKASI').resample('D').size()
-        peak_day = ts_data.idxmax()
-        peak_count = ts_data.max()
-        daily_counts = {
-            "peak_day": peak_day.strftime('%Y-%m-%d'),
-            "peak_count": int(peak_count),
-            "trend_data": {d.strftime('%Y-%m-%d'): v for d, v in ts_data.items()}
-        }
+    engagement_by_topic = _mean_by_category(engagement_rate, df['TOPIK']) if 'TOPIK' in df.columns else {}
+    engagement_by_grup = _mean_by_category(engagement_rate, df['GRUP']) if 'GRUP' in df.columns else {}
+
+    # --- 4. Time Series Trends (daily bins from the first day, like resample('D')) ---
+    first_day = min_date.normalize()
+    day_offsets = (publish_dates.dt.normalize() - first_day).dt.days.to_numpy()
+    per_day = np.bincount(day_offsets[day_offsets >= 0])
+    days = pd.date_range(first_day, periods=len(per_day), freq='D')
+    peak = int(np.argmax(per_day))
+    daily_counts = {
+        "peak_day": days[peak].strftime('%Y-%m-%d'),
+        "peak_count": int(per_day[peak]),
+        "trend_data": {d.strftime('%Y-%m-%d'): int(v) for d, v in zip(days, per_day)},
+        # Spikes of this result's own series, and the precomputed ones of its topics/groups in the window
+        "result_spikes": anomaly_index.detect_series(per_day, first_day),
+        "anomalies": _lookup_anomalies(df, min_date, max_date),
+    }
 
-    # --- 5. Top Viral Posts ---
-    top_viral_posts = []
-    if 'VIRALITY RATE' in df_copy.columns and not df_copy.empty:
-        top_5 = df_copy.sort_values(by='VIRALITY RATE', ascending=False).head(5)
-        top_viral_posts = top_5[['AKUN', 'KONTEN', 'VIRALITY RATE', 'ENGAGEMENTS']].to_dict('records')
+    # --- 5. Top Viral Posts (top-5 selection instead of a full sort) ---
+    top_positions = pd.Series(virality_rate).nlargest(5, keep='first').index.to_numpy()
+    top_5 = df.iloc[top_positions]
+    top_viral_posts = [
+        {"AKUN": akun, "KONTEN": konten, "VIRALITY RATE": rate, "ENGAGEMENTS": engagement}
+        for akun, konten, rate, engagement in zip(
+            top_5['AKUN'], top_5['KONTEN'], virality_rate[top_positions],
+            top_5['ENGAGEMENTS'] if 'ENGAGEMENTS' in df.columns else [0] * len(top_positions)
+        )
+    ]
 
     # --- 6. Performance Outliers (Followers vs. Engagement) ---
-    performance_outliers = {}
-    if not df_copy.empty:
-        try:
-            top_er_post = df_copy.loc[df_copy['ENGAGEMENT RATE'].idxmax()]
-            most_followed_post = df_copy.loc[df_copy['FOLLOWERS'].idxmax()]
-            performance_outliers = {
-                "highest_engagement_rate_account": {
-                    "account": top_er_post.get('AKUN', 'N/A'),
-                    "rate": top_er_post.get('ENGAGEMENT RATE', 0)
-                },
-                "most_followers_account": {
-                    "account": most_followed_post.get('AKUN', 'N/A'),
-                    "followers": int(most_followed_post.get('FOLLOWERS', 0)),
-                    "engagement_rate_at_time": most_followed_post.get('ENGAGEMENT RATE', 0)
-                }
+    if followers is None or np.isnan(followers).all():
+        performance_outliers = {"error": "Could not determine outliers."}
+    else:
+        top_er = int(np.argmax(engagement_rate))
+        most_followed = int(np.nanargmax(followers))
+        accounts = df['AKUN'].to_numpy() if 'AKUN' in df.columns else np.full(n, 'N/A', dtype=object)
+        performance_outliers = {
+            "highest_engagement_rate_account": {
+                "account": accounts[top_er],
+                "rate": engagement_rate[top_er]
+            },
+            "most_followers_account": {
+                "account": accounts[most_followed],
+                "followers": int(followers[most_followed]),
+                "engagement_rate_at_time": engagement_rate[most_followed]
             }
-        except (KeyError, ValueError):
-             performance_outliers = {"error": "Could not determine outliers."}
-
+        }
 
     # --- Assemble the final JSON structure ---
     structured_context = {
@@ -293,7 +513,7 @@ def generate_structured_context_from_data(df):
             "total_posts": total_posts,
             "total_views": int(total_views),
             "average_engagement_rate": avg_engagement_rate,
-            "date_range": {"start": min_date, "end": max_date}
+            "date_range": {"start": min_date.strftime('%Y-%m-%d'), "end": max_date.strftime('%Y-%m-%d')}
         },
         "sentiment_distribution": sentiment_counts,
         "engagement_analysis": {
@@ -307,7 +527,8 @@ def generate_structured_context_from_data(df):
     return structured_context
 
 # Di utils.py, ganti juga dengan fungsi ini
-def get_ai_response(prompt, matched_data_df, search_query):
+def get_ai_response(prompt, matched_data_df, search_query, history=None):
+    """Streams the answer; `history` defaults to the Streamlit session's chat messages."""
     strict_keywords = {kw for group in search_query.get('strict_groups', []) for kw in group}
     fallback_keywords = set(search_query.get('fallback_keywords', []))
     all_keywords = sorted(list(strict_keywords | fallback_keywords))
@@ -318,6 +539,10 @@ def get_ai_response(prompt, matched_data_df, search_query):
     else:
         topic_context = "all topics for the selected date"
         context_awareness_instruction = "1.  **CONTEXT AWARENESS:** The data has been filtered by date but NOT by a specific topic. Summarize the key findings for the given date range."
+    active_filters = drilldown.describe_filters(search_query.get('filters') or {})
+    if active_filters:
+        topic_context += f" (filter: {active_filters})"
+        context_awareness_instruction += f" The user has drilled down further; only posts matching these filters are included: {active_filters}."
 
     if matched_data_df.empty:
         context = (
@@ -330,7 +555,9 @@ def get_ai_response(prompt, matched_data_df, search_query):
         )
     else:
         structured_data = generate_structured_context_from_data(matched_data_df)
-        data_as_json_string = json.dumps(structured_data, indent=2)
+        # The LLM gets the flagged spikes instead of the full daily series
+        daily_trends = {k: v for k, v in structured_data["daily_trends"].items() if k != "trend_data"}
+        data_as_json_string = json.dumps({**structured_data, "daily_trends": daily_trends}, indent=2, default=str)
         context = (
             "You are a helpful and expert AI data analyst for a social media dashboard. Your primary language is Indonesian, but keep media-specific domain terms (e.g., 'likes', 'comments', 'post', 'views', 'engagement') in English.\n"
             "You will be given a JSON object containing a summary of the data visualized on the user's screen. "
@@ -344,24 +571,62 @@ def get_ai_response(prompt, matched_data_df, search_query):
             "Based *only* on the JSON data above, answer the user's prompt but remember to keep focus on whats importants and interesting, not only reading the data."
         )
 
-    conversation_history = st.session_state.messages.copy()
+    yield from _stream_answer(context, history)
+
+
+def get_comparison_response(prompt, aggregates, history=None):
+    """Streams the answer for a comparison, from the compact per-side summary and differences."""
+    comparison_json = json.dumps(comparison.comparison_context(aggregates), indent=2, default=str)
+    sides = ", ".join(f"**{label}**" for label in aggregates["labels"])
+    context = (
+        "You are a helpful and expert AI data analyst for a social media dashboard. Your primary language is Indonesian, but keep media-specific domain terms (e.g., 'likes', 'comments', 'post', 'views', 'engagement') in English.\n"
+        f"The user asked to compare {sides}. You will be given a JSON object with one summary per side "
+        "(`sides`) and the differences of each side against the first one (`differences`; sentiment differences are in percentage points). "
+        "When `aligned_by` is `day_of_period`, peak days are day numbers within each side's own period.\n\n"
+        "**CRITICAL INSTRUCTIONS:**\n"
+        "1.  **COMPARE:** Contrast the sides directly: volume, sentiment share, engagement rate and peak days. Point out the most meaningful differences first.\n"
+        "2.  **FORMATTING:** Use standard Markdown for formatting, especially `**text**` for bolding. Do NOT use HTML tags.\n"
+        "3.  **DATA-DRIVEN:** Base your answers *exclusively* on the data in the JSON.\n\n"
+        f"```json\n{comparison_json}\n```\n\n"
+        f"Based *only* on the JSON data above, answer the user's prompt ('{prompt}')."
+    )
+    yield from _stream_answer(context, history)
+
+
+def _stream_answer(context, history=None):
+    conversation_history = list(history if history is not None else st.session_state.messages)
     conversation_history.insert(0, {"role": "system", "content": context})
     try:
-        response_stream = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": m["role"], "content": m["content"]} for m in conversation_history],
-            stream=True
+        yield from metrics.instrument_stream(
+            llm_backend.get_backend().stream_chat(
+                [{"role": m["role"], "content": m["content"]} for m in conversation_history]
+            ),
+            "llm.stream"
         )
-        for chunk in response_stream:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+    except llm_client.LLMUnavailableError as e:
+        st.warning(str(e))
+        yield "Maaf, layanan AI sedang sibuk. Silakan coba beberapa saat lagi."
     except Exception as e:
         st.error(f"Error generating AI response: {e}")
         yield "Maaf, terjadi kesalahan saat memproses permintaan Anda."
         
+def stream_local_response(response_text):
+    """
+    Streams a canned (non-LLM) response through the same generator interface as get_ai_response.
+    The full text is emitted at once so the script thread is never held up by artificial delays.
+    """
+    yield response_text
+
+
+def get_missing_date_response():
+    """Generates a streaming response asking the user for a date range."""
+    return stream_local_response(
+        "Tentu, saya bisa carikan datanya. Mohon informasikan tanggal atau rentang tanggal spesifik yang Anda inginkan."
+    )
+
+
 def get_no_data_suggestion(prompt):
     """Generates a streaming response for when no data is found."""
-    response_text = f"Maaf, saya tidak dapat menemukan data apa pun yang terkait dengan '{prompt}'. Silakan coba kata kunci atau topik lain."
-    for word in response_text.split():
-        yield word + " "
-        time.sleep(0.05)
\ No newline at end of file
+    return stream_local_response(
+        f"Maaf, saya tidak dapat menemukan data apa pun yang terkait dengan '{prompt}'. Silakan coba kata kunci atau topik lain."
+    )
@@ -7,6 +7,8 @@ import plotly.graph_objects as go
 
 # 1. Palet warna kustom yang lebih modern dan cerah
 COLOR_PALETTE = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+# Warna tetap per sentimen, dipakai semua chart sentimen (dashboard, perbandingan, laporan batch)
+SENTIMENT_COLORS = {'Positif': COLOR_PALETTE[2], 'Netral': COLOR_PALETTE[0], 'Negatif': COLOR_PALETTE[3]}
 
 # 2. Fungsi helper untuk menerapkan gaya konsisten ke semua grafik
 # 2. Fungsi helper untuk menerapkan gaya konsisten ke semua grafik
@@ -176,8 +178,7 @@ def plot_sentiment_distribution(df):
     sentiment_counts = df['SENTIMEN'].value_counts().reset_index(name='count')
     sentiment_counts = sentiment_counts.rename(columns={'index': 'SENTIMEN'})
     
-    # FIXED: Changed color map keys to Indonesian
-    color_map = {'Positif': '#2ca02c', 'Netral': '#1f77b4', 'Negatif': '#d62728'}
+    color_map = SENTIMENT_COLORS
 
     # --- Chart 1: Donut Chart ---
     fig_pie = px.pie(sentiment_counts, names='SENTIMEN', values='count', 
@@ -637,4 +638,38 @@ def plot_source_distribution(df):
 
         fig = apply_chart_style(fig, "Distribution by Media Source")
         
-        st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+        st.plotly_chart(fig, use_container_width=True)
+
+def display_comparison(aggregates):
+    """Side-by-side charts for comparison mode, drawn from comparison.aligned_aggregates()."""
+    labels = aggregates["labels"]
+    metric_cols = st.columns(len(labels))
+    for col, label in zip(metric_cols, labels):
+        col.metric(label, f"{aggregates['total_posts'][label]:,} post",
+                   f"ER {aggregates['avg_engagement_rate'][label]:.2%}", delta_color="off")
+
+    share = aggregates["sentiment_share"]
+    if not share.empty and len(share.columns):
+        share_df = share.rename_axis('PERBANDINGAN').reset_index().melt(
+            id_vars='PERBANDINGAN', var_name='SENTIMEN', value_name='share')
+        fig = px.bar(share_df, x='PERBANDINGAN', y='share', color='SENTIMEN', barmode='group', text_auto='.0%',
+                     color_discrete_map=SENTIMENT_COLORS)
+        fig.update_yaxes(title='Share of Posts', tickformat='.0%')
+        fig.update_xaxes(title='')
+        st.plotly_chart(apply_chart_style(fig, "Perbandingan Sentimen"), use_container_width=True)
+
+    er_df = pd.DataFrame({'PERBANDINGAN': labels, 'er': [aggregates["avg_engagement_rate"][l] for l in labels]})
+    fig = px.bar(er_df, x='PERBANDINGAN', y='er', color='PERBANDINGAN', text_auto='.2%',
+                 color_discrete_sequence=COLOR_PALETTE)
+    fig.update_yaxes(title='Average Engagement Rate', tickformat='.2%')
+    fig.update_xaxes(title='')
+    st.plotly_chart(apply_chart_style(fig, "Perbandingan Engagement Rate"), use_container_width=True)
+
+    volume = aggregates["daily_volume"]
+    if not volume.empty:
+        x_title = 'Tanggal' if aggregates["aligned_by"] == "date" else 'Hari ke-'
+        volume_df = volume.rename_axis('day').reset_index().melt(
+            id_vars='day', var_name='PERBANDINGAN', value_name='count')
+        fig = px.line(volume_df, x='day', y='count', color='PERBANDINGAN', markers=True,
+                      color_discrete_sequence=COLOR_PALETTE, labels={'day': x_title, 'count': 'Jumlah Post'})
+        st.plotly_chart(apply_chart_style(fig, "Perbandingan Volume Harian"), use_container_width=True)
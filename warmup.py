@@ -0,0 +1,136 @@
+# warmup.py
+"""
+Warm start: everything the first query would otherwise pay for, done once per process in a
+background thread as soon as the server starts.
+
+Steps, each timed as a "warmup.<step>" span:
+- imports: heavy modules (plotly, openai, ...) and the LLM backend
+- load_data: Excel parse plus the ingestion indexes (near-duplicate clusters, semantic
+  embeddings, daily anomaly rollups)
+- search_index: BM25 corpus statistics of KONTEN
+- parallel_search: shared-memory KONTEN buffer and search worker processes (large datasets only)
+- workers: the shared worker pool
+
+status() reports the progress; the API exposes it as a readiness endpoint so a load balancer
+only routes traffic to the process once it is warm. A failed warm-up is not final: start() runs
+it again once WARMUP_RETRY_SECONDS have passed (the app calls start() on every rerun).
+"""
+
+import os
+import time
+import importlib
+import threading
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# API only: 0 makes server start-up wait for the warm-up instead of running it in the background
+WARMUP_IN_BACKGROUND = os.getenv("WARMUP_IN_BACKGROUND", "1") == "1"
+# Minimum wait before start() retries a failed warm-up
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+WARMUP_MODULES = [m.strip() for m in os.getenv("WARMUP_MODULES", "plotly.express,plotly.graph_objects,openai").split(",") if m.strip()]
+
+_state = {"status": "idle", "steps": {}, "error": None, "started_at": None, "finished_at": None}
+_dataset = {"df": None}
+_done = threading.Event()
+_thread = None
+_lock = threading.Lock()
+
+
+def _step(name, fn, *args):
+    start = time.perf_counter()
+    with metrics.span(f"warmup.{name}"):
+        result = fn(*args)
+    with _lock:
+        _state["steps"][name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _import_modules():
+    for module in WARMUP_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            continue  # Optional modules that are not installed are simply not preloaded
+    import llm_backend
+    llm_backend.get_backend()
+
+
+def _warm_parallel_search(df):
+    import parallel_search
+    if parallel_search.is_applicable(range(len(df))):
+        parallel_search.prepare(df)
+
+
+def _run(data_file, load_fn):
+    try:
+        _step("imports", _import_modules)
+        if load_fn is None:
+            from utils import load_data as load_fn
+        # Called exactly like the app calls it, so both share one st.cache_data entry
+        df = _step("load_data", load_fn, data_file) if data_file else _step("load_data", load_fn)
+        if df is None or df.empty:
+            # st.cache_data would otherwise hand the same empty result to the retry
+            if hasattr(load_fn, "clear"):
+                load_fn.clear()
+            raise RuntimeError(f"Dataset {data_file or ''} kosong atau tidak dapat dimuat.")
+        _dataset["df"] = df
+
+        import search_index
+        import workers
+        _step("search_index", search_index.get_index, df)
+        _step("parallel_search", _warm_parallel_search, df)
+        _step("workers", workers.get_pool)
+        status = "ready"
+    except Exception as e:
+        with _lock:
+            _state["error"] = str(e)
+        status = "failed"
+    with _lock:
+        _state["status"] = status
+        _state["finished_at"] = time.time()
+    _done.set()
+
+
+def start(data_file=None, load_fn=None):
+    """
+    Starts the warm-up thread once per process (later calls are no-ops, except after a failure
+    that is at least WARMUP_RETRY_SECONDS old). `load_fn` defaults to utils.load_data, called with
+    `data_file` (or its own default); the dataset it returns is available from dataset() once ready.
+    """
+    global _thread
+    with _lock:
+        retry = _state["status"] == "failed" and time.time() - _state["finished_at"] >= WARMUP_RETRY_SECONDS
+        if _thread is not None and not retry:
+            return
+        _state.update(status="warming", steps={}, error=None, started_at=time.time(), finished_at=None)
+        _done.clear()
+        _thread = threading.Thread(target=_run, args=(data_file, load_fn), name="warmup", daemon=True)
+    _thread.start()
+
+
+def wait(timeout=None):
+    """Blocks until the warm-up has finished (ready or failed); returns is_ready()."""
+    _done.wait(timeout)
+    return is_ready()
+
+
+def is_ready():
+    with _lock:
+        return _state["status"] == "ready"
+
+
+def dataset():
+    """The dataset loaded by the warm-up, or None while it is still loading."""
+    return _dataset["df"]
+
+
+def status():
+    with _lock:
+        snapshot = {**_state, "steps": dict(_state["steps"])}
+    elapsed_until = snapshot["finished_at"] or time.time()
+    snapshot["elapsed_s"] = round(elapsed_until - snapshot["started_at"], 3) if snapshot["started_at"] else None
+    return snapshot
@@ -0,0 +1,318 @@
+# workers.py
+"""
+Shared worker layer for heavy per-turn work.
+
+All Streamlit sessions in the process submit jobs here instead of running them inline:
+- CPU-bound search / aggregation runs on a bounded thread pool. Jobs are queued per session and
+  dispatched round-robin, so one analyst firing many queries cannot starve the others.
+- LLM I/O runs on a dedicated asyncio loop which pumps response streams into a queue that the
+  session's script thread drains. LLM calls and streams are queued per session as well, with at
+  most WORKER_IO_THREADS in flight.
+Admission control rejects new jobs with WorkerBusyError once the global or per-session queue is
+full, and queue depth / in-flight counts (CPU and I/O) are published as metrics gauges.
+"""
+
+import os
+import asyncio
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:  # Older Streamlit layout
+    SCRIPT_RUN_CONTEXT_ATTR_NAME = "streamlit_script_run_ctx"
+
+import metrics
+import profiling
+
+load_dotenv()
+
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", str(min(8, (os.cpu_count() or 2)))))
+WORKER_MAX_QUEUE = int(os.getenv("WORKER_MAX_QUEUE", "64"))
+WORKER_MAX_PER_SESSION = int(os.getenv("WORKER_MAX_PER_SESSION", "4"))
+WORKER_IO_THREADS = int(os.getenv("WORKER_IO_THREADS", "16"))  # LLM calls / streams in flight
+WORKER_IO_MAX_QUEUE = int(os.getenv("WORKER_IO_MAX_QUEUE", "64"))
+WORKER_IO_MAX_PER_SESSION = int(os.getenv("WORKER_IO_MAX_PER_SESSION", "2"))
+WORKER_JOB_TIMEOUT = float(os.getenv("WORKER_JOB_TIMEOUT", "120"))
+
+_STREAM_END = object()
+_NO_CONTEXT = object()
+
+
+class WorkerBusyError(Exception):
+    """Raised when a job is refused by admission control."""
+
+
+class WorkerTimeoutError(TimeoutError):
+    """Raised when a job or response stream takes longer than WORKER_JOB_TIMEOUT."""
+
+    def __init__(self, message="Permintaan Anda memakan waktu terlalu lama. Silakan coba lagi, misalnya dengan rentang tanggal yang lebih sempit."):
+        super().__init__(message)
+
+
+def wait_result(future, timeout=WORKER_JOB_TIMEOUT):
+    """
+    future.result() with a deadline. On timeout the job is cancelled if it has not started yet
+    (freeing its per-session slot); a job already running cannot be interrupted and finishes unobserved.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise WorkerTimeoutError() from None
+
+
+def _with_script_context(fn):
+    """
+    Carries the submitting session's Streamlit context into the worker thread so that st.error,
+    st.session_state, etc. inside the job still target the right session.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    # A profiled script run also profiles the jobs it hands to worker threads
+    profile_run = profiling.active_run()
+
+    def run(*args, **kwargs):
+        thread = threading.current_thread()
+        # add_script_run_ctx(thread, None) does not clear anything, so restore the attribute itself;
+        # otherwise a pooled thread keeps the last session's context for later context-less jobs
+        previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, _NO_CONTEXT)
+        if ctx is not None:
+            add_script_run_ctx(thread, ctx)
+        try:
+            if profile_run is not None:
+                return profiling.profile_job(profile_run, fn, *args, **kwargs)
+            return fn(*args, **kwargs)
+        finally:
+            if previous is not _NO_CONTEXT:
+                setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+            elif hasattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME):
+                delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+    return run
+
+
+class _FairQueue:
+    """
+    Per-session job queue with admission control. Jobs start fewest-running-session first
+    (round-robin among equals) while fewer than `slots` are running. Callers hold the pool lock.
+    """
+
+    def __init__(self, slots, max_queue, max_per_session, start):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self._start = start            # start(session_id, future, job), called under the lock
+        self._pending = OrderedDict()  # session_id -> deque of (future, job)
+        self._session_counts = {}      # session_id -> queued + running jobs
+        self._session_running = {}     # session_id -> running jobs
+        self.running = 0
+        self.queued = 0
+
+    def admit(self, session_id, jobs):
+        """Queues (future, job) pairs as a unit, or raises WorkerBusyError and queues none."""
+        if self.queued + len(jobs) > self.max_queue:
+            raise WorkerBusyError("Server sedang sibuk. Silakan coba beberapa saat lagi.")
+        if self._session_counts.get(session_id, 0) + len(jobs) > self.max_per_session:
+            raise WorkerBusyError("Masih ada permintaan Anda yang sedang diproses. Mohon tunggu sebentar.")
+        self._pending.setdefault(session_id, deque()).extend(jobs)
+        self._session_counts[session_id] = self._session_counts.get(session_id, 0) + len(jobs)
+        self.queued += len(jobs)
+
+    def dispatch(self):
+        # Fair share: serve the session with the fewest running jobs, round-robin among equals
+        while self.running < self.slots and self._pending:
+            session_id = min(self._pending, key=lambda sid: self._session_running.get(sid, 0))
+            jobs = self._pending[session_id]
+            future, job = jobs.popleft()
+            if jobs:
+                self._pending.move_to_end(session_id)
+            else:
+                del self._pending[session_id]
+            self.queued -= 1
+            if not future.set_running_or_notify_cancel():
+                self._release(session_id)
+                continue
+            self.running += 1
+            self._session_running[session_id] = self._session_running.get(session_id, 0) + 1
+            self._start(session_id, future, job)
+
+    def finish(self, session_id):
+        """Frees the slot of a job started by dispatch()."""
+        self.running -= 1
+        self._session_running[session_id] -= 1
+        if not self._session_running[session_id]:
+            del self._session_running[session_id]
+        self._release(session_id)
+
+    def _release(self, session_id):
+        remaining = self._session_counts.get(session_id, 1) - 1
+        if remaining:
+            self._session_counts[session_id] = remaining
+        else:
+            self._session_counts.pop(session_id, None)
+
+
+class WorkerPool:
+    def __init__(self, threads=WORKER_THREADS, max_queue=WORKER_MAX_QUEUE,
+                 max_per_session=WORKER_MAX_PER_SESSION, io_threads=WORKER_IO_THREADS,
+                 io_max_queue=WORKER_IO_MAX_QUEUE, io_max_per_session=WORKER_IO_MAX_PER_SESSION):
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="worker")
+        self._lock = threading.Lock()
+        self._jobs = _FairQueue(threads, max_queue, max_per_session, self._start_job)
+
+        # Dedicated event loop for LLM I/O; blocking SDK calls are offloaded to its own executor.
+        # Every LLM call or stream holds one of io_threads slots from start to end, admitted and
+        # shared between sessions like the CPU jobs
+        self._io_executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="llm-io")
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._io_executor)
+        threading.Thread(target=self._loop.run_forever, name="llm-io-loop", daemon=True).start()
+        self._io = _FairQueue(io_threads, io_max_queue, io_max_per_session, self._start_io)
+        self._io_streams = 0
+
+    def _publish(self):
+        metrics.set_gauge("workers.queued", self._jobs.queued)
+        metrics.set_gauge("workers.running", self._jobs.running)
+        metrics.set_gauge("workers.io_queued", self._io.queued)
+        metrics.set_gauge("workers.io_running", self._io.running)
+        metrics.set_gauge("workers.llm_streams", self._io_streams)
+
+    # --- CPU JOBS ---
+    def submit(self, session_id, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) for the given session and returns a Future."""
+        return self.submit_many(session_id, [(fn, args, kwargs)])[0]
+
+    def submit_many(self, session_id, calls):
+        """
+        Queues several (fn, args, kwargs) jobs of one session as a unit: either every job is
+        admitted, or WorkerBusyError is raised and none is queued. Returns their Futures in order.
+        """
+        with self._lock:
+            jobs = [(Future(), (_with_script_context(fn), args, kwargs)) for fn, args, kwargs in calls]
+            self._jobs.admit(session_id, jobs)
+            self._jobs.dispatch()
+            self._publish()
+        return [future for future, _ in jobs]
+
+    def _start_job(self, session_id, future, job):
+        self._executor.submit(self._run_job, session_id, future, *job)
+
+    def _run_job(self, session_id, future, fn, args, kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._jobs.finish(session_id)
+                self._jobs.dispatch()
+                self._publish()
+
+    def run(self, session_id, fn, *args, timeout=WORKER_JOB_TIMEOUT, **kwargs):
+        """Submits a job and blocks the calling script thread until its result is available."""
+        return wait_result(self.submit(session_id, fn, *args, **kwargs), timeout)
+
+    # --- LLM I/O ---
+    def _submit_io(self, session_id, coroutine_fn):
+        """Queues an I/O job (coroutine_fn(future) runs on the loop once a slot is free)."""
+        future = Future()
+        with self._lock:
+            self._io.admit(session_id, [(future, coroutine_fn)])
+            self._io.dispatch()
+            self._publish()
+        return future
+
+    def _start_io(self, session_id, future, coroutine_fn):
+        asyncio.run_coroutine_threadsafe(self._run_io_job(session_id, future, coroutine_fn), self._loop)
+
+    async def _run_io_job(self, session_id, future, coroutine_fn):
+        try:
+            future.set_result(await coroutine_fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._io.finish(session_id)
+                self._io.dispatch()
+                self._publish()
+
+    def run_io(self, session_id, fn, *args, timeout=WORKER_JOB_TIMEOUT):
+        """Runs a blocking LLM call on the I/O loop and waits for its result."""
+        fn = _with_script_context(fn)
+
+        async def call():
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: fn(*args))
+        return wait_result(self._submit_io(session_id, call), timeout)
+
+    async def _pump(self, next_chunk, close, out, stop):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._io_streams += 1
+            self._publish()
+        try:
+            while not stop.is_set():
+                chunk = await loop.run_in_executor(None, next_chunk)
+                out.put(chunk)
+                if chunk is _STREAM_END:
+                    break
+        except BaseException as e:
+            out.put(e)
+            out.put(_STREAM_END)
+        finally:
+            if stop.is_set():
+                # The reader gave up (timeout or disconnect): close the response stream here, on the
+                # thread side that drives it, so the LLM request is released
+                await loop.run_in_executor(None, close)
+            with self._lock:
+                self._io_streams -= 1
+                self._publish()
+
+    def stream(self, session_id, response_stream):
+        """
+        Drives a response generator on the I/O loop and returns an iterator over its chunks as
+        they arrive, so a slow LLM never occupies a CPU worker. Admission happens here, so
+        WorkerBusyError is raised by this call rather than by the first chunk.
+        """
+        out = queue.Queue()
+        stop = threading.Event()
+        iterator = iter(response_stream)
+        next_chunk = _with_script_context(lambda: next(iterator, _STREAM_END))
+        close = getattr(iterator, "close", lambda: None)
+        job = self._submit_io(session_id, lambda: self._pump(next_chunk, close, out, stop))
+        return self._read_stream(job, out, stop)
+
+    @staticmethod
+    def _read_stream(job, out, stop):
+        try:
+            while True:
+                try:
+                    chunk = out.get(timeout=WORKER_JOB_TIMEOUT)
+                except queue.Empty:
+                    raise WorkerTimeoutError() from None
+                if chunk is _STREAM_END:
+                    return
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            stop.set()
+            job.cancel()  # Still queued for an I/O slot: drop it
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide WorkerPool shared by every session."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WorkerPool()
+    return _pool